@@ -1,16 +1,100 @@
+import gc
+import os
+import mmap
+import logging
 import contextlib
 
 
 from idb.idapython import IDAPython
 
 
+logger = logging.getLogger(__name__)
+
+
 @contextlib.contextmanager
-def from_file(path):
+def from_file(path, use_mmap=False, index_sidecar=False, cache_dir=None, verify=False, flat_id0=None):
+    '''
+    open and parse the IDA Pro database at the given path.
+
+    Args:
+      path (str): the path to the .idb file.
+      use_mmap (bool): map the file rather than reading it into memory,
+        so that processes that open the same database share its pages.
+      index_sidecar (bool): load the function, segment, name, xref, and head indexes
+        from a sidecar file, when it matches the database.
+        on close, the indexes built while the database was open are written back to the sidecar.
+      cache_dir (str): the directory for sidecar files. by default, next to the database.
+      verify (bool): check the structure of the database and its section checksums before returning it.
+      flat_id0 (str): the path to a flat export of the ID0 b-tree, written by `idb.fileformat.write_flat_index`,
+        to use in place of the b-tree.
+
+    Raises:
+      ValueError: if the database is truncated, or `verify` is set and the database is corrupt.
+    '''
     # break import cycle
+    import idb.analysis
     import idb.fileformat
 
     with open(path, 'rb') as f:
-        buf = memoryview(f.read())
-        db = idb.fileformat.IDB(buf)
-        db.vsParse(buf)
-        yield db
+        m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else None
+        db = None
+        try:
+            buf = memoryview(m) if m is not None else memoryview(f.read())
+            db = idb.fileformat.IDB(buf)
+            db.vsParse(buf)
+            if verify:
+                db.verify()
+
+            with contextlib.ExitStack() as stack:
+                if flat_id0 is not None:
+                    db.set_id0(stack.enter_context(idb.fileformat.FlatIndex(flat_id0)))
+                if index_sidecar:
+                    stack.enter_context(_index_sidecar(db, path, cache_dir))
+                yield db
+        finally:
+            # the cached analysis results refer back to the database, keeping it alive.
+            if db is not None:
+                idb.analysis.get_cache(db).clear()
+            if m is not None:
+                # drop our references, so the map can be closed if the caller dropped theirs, too.
+                db = buf = None
+                _unmap(m)
+
+
+def _unmap(m):
+    # the parsed structures are full of reference cycles, so collect them before closing the map.
+    gc.collect()
+    try:
+        m.close()
+    except BufferError:
+        logger.debug('database is still referenced, leaving it mapped until it is collected')
+
+
+@contextlib.contextmanager
+def _index_sidecar(db, path, cache_dir=None):
+    '''
+    load the indexes of the database from its sidecar, when it matches,
+     and on exit, write back the indexes that were built in the meantime.
+    '''
+    import idb.analysis
+
+    sidecar_path = idb.analysis.get_sidecar_path(path, cache_dir=cache_dir)
+    try:
+        loaded = idb.analysis.load_indexes(db, sidecar_path)
+    except (OSError, ValueError) as e:
+        logger.debug('not using index sidecar %s: %s', sidecar_path, e)
+        loaded = []
+
+    yield
+
+    cache = idb.analysis.get_cache(db)
+    keys = [(nodeid, field) for nodeid, field, _, _ in idb.analysis.SIDECAR_INDEXES]
+    if not any(key in cache and key not in loaded for key in keys):
+        return
+
+    try:
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+        idb.analysis.save_indexes(db, sidecar_path, build=False)
+    except OSError as e:
+        logger.warning('failed to write index sidecar %s: %s', sidecar_path, e)
@@ -1,8 +1,15 @@
+import os
+import sys
+import mmap
+import array
 import types
+import bisect
 import struct
+import hashlib
 import logging
 import binascii
 import datetime
+import fnmatch
 import itertools
 from collections import namedtuple
 
@@ -93,59 +100,69 @@ def unpack_dd(buf, offset=0):
       (int, int): the parsed dword, and the number of bytes consumed.
 
     Raises:
-      KeyError: if the bounds of the region are exceeded.
+      IndexError: if the bounds of the region are exceeded.
     '''
-    if offset != 0:
-        # this isn't particularly fast... but its more readable.
-        buf = buf[offset:]
-
-    header = buf[0]
+    header = buf[offset]
     if header & 0x80 == 0:
         return header, 1
     elif header & 0xC0 != 0xC0:
-        return ((header & 0x7F) << 8) + buf[1], 2
+        return ((header & 0x7F) << 8) + buf[offset + 1], 2
     else:
         if header & 0xE0 == 0xE0:
-            hi = (buf[1] << 8) + buf[2]
-            low = (buf[3] << 8) + buf[4]
+            hi = (buf[offset + 1] << 8) + buf[offset + 2]
+            low = (buf[offset + 3] << 8) + buf[offset + 4]
             size = 5
         else:
-            hi = (((header & 0x3F) << 8) + buf[1])
-            low = (buf[2] << 8) + buf[3]
+            hi = (((header & 0x3F) << 8) + buf[offset + 1])
+            low = (buf[offset + 2] << 8) + buf[offset + 3]
             size = 4
         return (hi << 16) + low, size
 
 
 def unpack_dw(buf, offset=0):
     '''
-    unpack word.
-    '''
-    if offset != 0:
-        buf = buf[offset:]
+    unpack up to 16-bits using the IDA-specific data packing format.
+
+    Returns:
+      (int, int): the parsed word, and the number of bytes consumed.
 
-    header = buf[0]
+    Raises:
+      IndexError: if the bounds of the region are exceeded.
+    '''
+    header = buf[offset]
     if header & 0x80 == 0:
         return header, 1
     elif header & 0xC0 != 0xC0:
-        return ((header << 8) + buf[1]) & 0x7FFF, 2
+        return ((header << 8) + buf[offset + 1]) & 0x7FFF, 2
     else:
-        return (buf[1] << 8) + buf[2], 3
+        return (buf[offset + 1] << 8) + buf[offset + 2], 3
 
 
 def unpack_dq(buf, offset=0):
     '''
-    unpack qword.
-    '''
-    if offset != 0:
-        buf = buf[offset:]
+    unpack up to 64-bits using the IDA-specific data packing format.
+    this is stored as two packed dwords, the low dword first.
+
+    unlike `unpack_dd` and `unpack_dw`, this returns only the value, not the number of bytes consumed.
 
-    dw1 = unpack_dd(buf)
-    dw2 = unpack_dd(buf, offset=0x4)
-    # TODO: check ordering.
-    return (dw1 << 32) + dw2
+    Returns:
+      int: the parsed qword.
+
+    Raises:
+      IndexError: if the bounds of the region are exceeded.
+    '''
+    low, size = unpack_dd(buf, offset=offset)
+    high, _ = unpack_dd(buf, offset=offset + size)
+    return (high << 32) + low
 
 
 def unpack_dds(buf):
+    '''
+    generate the packed dwords from the given region.
+
+    Yields:
+      int: the parsed dwords.
+    '''
     offset = 0
     while offset < len(buf):
         val, size = unpack_dd(buf, offset=offset)
@@ -153,6 +170,94 @@ def unpack_dds(buf):
         offset += size
 
 
+# array typecode large enough to hold a 32-bit unsigned integer.
+DD_TYPECODE = 'I' if array.array('I').itemsize >= 4 else 'L'
+
+
+def _unpack_dds_into(buf, values, offsets, offset=0):
+    '''
+    decode all the packed dwords in the given region into the given arrays.
+    this is the inner loop of `unpack_dds_array`, inlined for speed.
+    '''
+    end = len(buf)
+    append_value = values.append
+    append_offset = offsets.append
+    while offset < end:
+        header = buf[offset]
+        append_offset(offset)
+        if header & 0x80 == 0:
+            append_value(header)
+            offset += 1
+        elif header & 0xC0 != 0xC0:
+            append_value(((header & 0x7F) << 8) | buf[offset + 1])
+            offset += 2
+        elif header & 0xE0 == 0xE0:
+            append_value((buf[offset + 1] << 24) | (buf[offset + 2] << 16) | (buf[offset + 3] << 8) | buf[offset + 4])
+            offset += 5
+        else:
+            append_value(((header & 0x3F) << 24) | (buf[offset + 1] << 16) | (buf[offset + 2] << 8) | buf[offset + 3])
+            offset += 4
+
+
+def unpack_dds_array(buf, offset=0):
+    '''
+    decode all the packed dwords in the given region in a single pass.
+    unlike `unpack_dds`, this doesn't allocate per value.
+
+    Example::
+
+        values, offsets = unpack_dds_array(b'\x01\x81\x02')
+        assert list(values) == [0x1, 0x102]
+        assert list(offsets) == [0x0, 0x1]
+
+    Args:
+      buf (bytes): the region to parse.
+      offset (int): the offset into the region from which to unpack. default: 0.
+
+    Returns:
+      (array.array, array.array): the parsed dwords, and the offset of each into the region.
+
+    Raises:
+      IndexError: if the final value is truncated.
+    '''
+    values = array.array(DD_TYPECODE)
+    offsets = array.array(DD_TYPECODE)
+    _unpack_dds_into(buf, values, offsets, offset=offset)
+    return values, offsets
+
+
+def unpack_dds_batch(bufs):
+    '''
+    decode the packed dwords from many regions, such as all the supvals of `$ segs`.
+    the results are concatenated into flat arrays, with the values of region `i`
+     found at `values[indices[i]:indices[i + 1]]`.
+
+    Example::
+
+        values, offsets, indices = unpack_dds_batch([b'\x01\x02', b'\x03'])
+        assert list(values[indices[1]:indices[2]]) == [0x3]
+
+    Args:
+      bufs (Iterable[bytes]): the regions to parse.
+
+    Returns:
+      (array.array, array.array, array.array): the parsed dwords,
+        the offset of each into its region,
+        and the index of the first value of each region (with a trailing sentinel).
+
+    Raises:
+      IndexError: if the final value of a region is truncated.
+    '''
+    values = array.array(DD_TYPECODE)
+    offsets = array.array(DD_TYPECODE)
+    indices = array.array(DD_TYPECODE)
+    for buf in bufs:
+        indices.append(len(values))
+        _unpack_dds_into(buf, values, offsets)
+    indices.append(len(values))
+    return values, offsets, indices
+
+
 Field = namedtuple('Field', ['name', 'tag', 'index', 'cast'])
 # namedtuple default args.
 # via: https://stackoverflow.com/a/18348004/87207
@@ -174,18 +279,212 @@ NODES = IndexType('nodes')
 VARIABLE_INDEXES = (ALL, ADDRESSES, NUMBERS, NODES)
 
 
+def _sizeof(value, seen=None):
+    '''
+    estimate the number of bytes of memory used by the given value, including referenced containers.
+    this is an approximation, suitable for accounting, but not for precise measurement.
+    '''
+    if seen is None:
+        seen = set([])
+
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+
+    size = sys.getsizeof(value)
+    if isinstance(value, (str, bytes, bytearray, memoryview, int, float)):
+        return size
+
+    if isinstance(value, (vstruct.VStruct, AnalysisCache)):
+        # don't account for the database (or the cache itself) referenced by analyzers.
+        return size
+
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += _sizeof(k, seen)
+            size += _sizeof(v, seen)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for v in value:
+            size += _sizeof(v, seen)
+
+    if hasattr(value, '__dict__'):
+        size += _sizeof(value.__dict__, seen)
+    for slot in getattr(type(value), '__slots__', ()):
+        if hasattr(value, slot):
+            size += _sizeof(getattr(value, slot), seen)
+
+    return size
+
+
+class AnalysisCache(object):
+    '''
+    memoized analysis results for a single database, keyed by (nodeid, field).
+    shared by all the analyzers of the database, so repeated field reads are dict lookups.
+
+    since the database is read-only, entries never go stale on their own;
+    use `.invalidate()` to explicitly drop entries, such as to reclaim memory.
+
+    Example::
+
+        cache = get_cache(db)
+        segs = Segments(db).segments  # parsed from the netnode
+        segs = Segments(db).segments  # fetched from the cache
+        assert ('$ segs', 'segments') in cache
+        cache.invalidate(nodeid='$ segs')
+    '''
+    def __init__(self):
+        # map from (nodeid, field) to value
+        self._values = {}
+        # map from (nodeid, field) to estimated size in bytes.
+        # computed when first requested, unless provided by the caller, since walking a large value is slow.
+        self._sizes = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._values)
+
+    def __contains__(self, key):
+        return key in self._values
+
+    def get(self, nodeid, field):
+        '''
+        fetch the memoized value for the given field.
+
+        Args:
+          nodeid (Union[str, int]): the node id used to identify the netnode.
+          field (str): the name of the field.
+
+        Returns:
+          any: the memoized value.
+
+        Raises:
+          KeyError: if the value has not been memoized.
+        '''
+        try:
+            v = self._values[(nodeid, field)]
+        except KeyError:
+            self.misses += 1
+            raise
+        else:
+            self.hits += 1
+            return v
+
+    def set(self, nodeid, field, value, size=None):
+        '''
+        memoize the value for the given field.
+
+        Args:
+          nodeid (Union[str, int]): the node id used to identify the netnode.
+          field (str): the name of the field.
+          value (any): the value to memoize.
+          size (int): the estimated size of the value in bytes, when already known.
+            by default, it's estimated by `.get_memory_usage()`.
+        '''
+        key = (nodeid, field)
+        self._values[key] = value
+        if size is None:
+            self._sizes.pop(key, None)
+        else:
+            self._sizes[key] = size
+
+    def memoize(self, nodeid, field, build):
+        '''
+        fetch the memoized value for the given field, or build and memoize it when missing.
+
+        Args:
+          nodeid (Union[str, int]): the node id used to identify the netnode.
+          field (str): the name of the field.
+          build (callable[]->any): function that computes the value.
+
+        Returns:
+          any: the memoized value.
+        '''
+        try:
+            return self.get(nodeid, field)
+        except KeyError:
+            v = build()
+            self.set(nodeid, field, v)
+            return v
+
+    def invalidate(self, nodeid=None, field=None):
+        '''
+        drop the memoized values that match the given nodeid and/or field.
+        when neither is provided, drop everything.
+
+        Returns:
+          int: the number of entries dropped.
+        '''
+        keys = [k for k in self._values.keys()
+                if (nodeid is None or k[0] == nodeid) and (field is None or k[1] == field)]
+        for k in keys:
+            del self._values[k]
+            self._sizes.pop(k, None)
+        return len(keys)
+
+    def clear(self):
+        return self.invalidate()
+
+    def get_memory_usage(self, nodeid=None):
+        '''
+        estimate the memory used by the memoized values, optionally only for the given nodeid.
+
+        Returns:
+          int: estimated size in bytes.
+        '''
+        size = 0
+        for k, v in self._values.items():
+            if nodeid is not None and k[0] != nodeid:
+                continue
+            if k not in self._sizes:
+                self._sizes[k] = _sizeof(v)
+            size += self._sizes[k]
+        return size
+
+
+def get_cache(db):
+    '''
+    fetch the analysis cache associated with the given database, creating it when necessary.
+    the cache is stored on the database, since the cached analyzers refer back to it,
+     so the two are collected together.
+
+    Args:
+      db (idb.IDB): the database.
+
+    Returns:
+      AnalysisCache: the cache shared by all analyzers of the database.
+    '''
+    cache = getattr(db, 'analysis_cache', None)
+    if cache is None:
+        cache = AnalysisCache()
+        # vivisect doesn't allow assigning to attributes that are not part of the struct.
+        object.__setattr__(db, 'analysis_cache', cache)
+    return cache
+
+
 class _Analysis(object):
     '''
     this is basically a metaclass for analyzers of IDA Pro netnode namespaces (named nodeid).
     provide set of fields, and parse them from netnodes (nodeid, tag, and optional index) when accessed.
+
+    parsed fields are memoized in the database's `AnalysisCache`,
+     so they are shared among all instances of the analyzer.
     '''
     def __init__(self, db, nodeid, fields):
         self.idb = db
         self.nodeid = nodeid
-        self.netnode = idb.netnode.Netnode(db, nodeid)
         self.fields = fields
+        self.cache = get_cache(db)
 
         self._fields_by_name = {f.name: f for f in self.fields}
+        # lazily resolved, since a memoized field never touches the netnode.
+        self._netnode = None
+
+    @property
+    def netnode(self):
+        if self._netnode is None:
+            self._netnode = idb.netnode.Netnode(self.idb, self.nodeid)
+        return self._netnode
 
     def _is_address(self, index):
         '''
@@ -218,6 +517,7 @@ class _Analysis(object):
         '''
         for the given field name, fetch the value from the appropriate netnode.
         if the field matches multiple indices, then return a mapping from index to value.
+        the result is memoized, so callers should not modify it.
 
         Example::
 
@@ -242,10 +542,13 @@ class _Analysis(object):
         Raises:
           KeyError: if the field does not exist.
         '''
-        if key not in self._fields_by_name:
-            return super(Analysis, self).__getattr__(key)
+        if key.startswith('_') or key not in self._fields_by_name:
+            raise AttributeError(key)
 
         field = self._fields_by_name[key]
+        return self.cache.memoize(self.nodeid, key, lambda: self._get_field(field))
+
+    def _get_field(self, field):
         if field.index in VARIABLE_INDEXES:
 
             if field.index == ADDRESSES:
@@ -278,6 +581,15 @@ class _Analysis(object):
             else:
                 return field.cast(bytes(v))
 
+    def invalidate(self, name=None):
+        '''
+        drop the memoized value for the given field, or all fields of this analyzer.
+
+        Args:
+          name (str): the name of the field to drop. default: all fields.
+        '''
+        return self.cache.invalidate(nodeid=self.nodeid, field=name)
+
     def get_field_tag(self, name):
         '''
         get the tag associated with the given field name.
@@ -334,9 +646,58 @@ Root = Analysis('Root Node', [
     Field('md5',            'S', 1302,  as_md5),
     Field('version_string', 'S', 1303,  idb.netnode.as_string),
     Field('param',          'S', 0x41b94, bytes),
+    Field('idainfo',        'S', 0x41b994, bytes),
 ])
 
 
+# see `idainfo.lflags` in ida.hpp.
+# 32-bit flat memory model.
+LFLG_PC_FLAT = 0x02
+# 64-bit program.
+LFLG_64BIT = 0x04
+
+
+def get_processor(db):
+    '''
+    fetch the name of the processor module and the bitness of the database,
+     from the `idainfo` structure in the root node.
+
+    Example::
+
+        procname, bitness = get_processor(db)
+        assert procname == 'metapc'
+        assert bitness == 32
+
+    Returns:
+      Tuple[str, int]: the processor name, and the bitness: 16, 32, or 64.
+
+    Raises:
+      KeyError: if the database has no `idainfo` structure.
+      ValueError: if the structure is not in the IDA 6.x layout.
+    '''
+    def build():
+        buf = bytes(Root(db).idainfo)
+        if len(buf) < 14 or buf[:3] != b'IDA':
+            raise ValueError('unexpected idainfo structure')
+
+        version = struct.unpack_from('<H', buf, 3)[0]
+        if version >= 700:
+            raise ValueError('unsupported idainfo version: %d' % (version))
+
+        # tag[3], version, procName[8], lflags.
+        procname = buf[5:13].rstrip(b'\x00').decode('ascii')
+        lflags = buf[13]
+        if lflags & LFLG_64BIT:
+            bitness = 64
+        elif lflags & LFLG_PC_FLAT:
+            bitness = 32
+        else:
+            bitness = 16
+        return procname, bitness
+
+    return get_cache(db).memoize('Root Node', 'processor', build)
+
+
 Loader = Analysis('$ loader name', [
     Field('plugin', 'S', 0, idb.netnode.as_string),
     Field('format', 'S', 1, idb.netnode.as_string),
@@ -424,63 +785,57 @@ class func_t:
             self.refqty = self.vals[4]
 
     def get_values(self):
-        # see `func_loader` (my name) in ida.wll.
-        # used to initialize from "$ funcs" netnode, and references `unpack_dw`.
-        offset = 0
-        vals = []
-
-        v, size = unpack_dd(self.buf, offset=offset)
-        offset += size
-        vals.append(v)
+        return unpack_func_values(self.buf)
 
-        v, size = unpack_dd(self.buf, offset=offset)
-        offset += size
-        vals.append(v)
 
-        v, size = unpack_dw(self.buf, offset=offset)
-        offset += size
-        vals.append(v)
+def unpack_func_values(buf):
+    '''
+    decode the packed values of a `$ funcs` supval.
+    since not all combinations of fields are known, decode as many as are present.
 
-        try:
-            if not is_flag_set(vals[2], func_t.FUNC_TAIL):
-                v, size = unpack_dd(self.buf, offset=offset)
-                offset += size
-                # 0x1000000
-                vals.append(v)
+    Returns:
+      List[int]: for functions: start, size, flags, frame, frsize, frregs, argsize, fpd.
+        for function tails: start, size, flags, owner delta, refqty.
+    '''
+    # see `func_loader` (my name) in ida.wll.
+    # used to initialize from "$ funcs" netnode, and references `unpack_dw`.
+    offset = 0
+    vals = []
 
-                v, size = unpack_dd(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
+    v, size = unpack_dd(buf, offset=offset)
+    offset += size
+    vals.append(v)
 
-                v, size = unpack_dw(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
+    v, size = unpack_dd(buf, offset=offset)
+    offset += size
+    vals.append(v)
 
-                v, size = unpack_dd(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
+    v, size = unpack_dw(buf, offset=offset)
+    offset += size
+    vals.append(v)
 
-                v, size = unpack_dw(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
+    if not is_flag_set(vals[2], func_t.FUNC_TAIL):
+        # frame, frsize, frregs, argsize, fpd.
+        # there is some other stuff here, based on... IDB version???
+        unpackers = (unpack_dd, unpack_dd, unpack_dw, unpack_dd, unpack_dw)
+    else:
+        # owner delta, refqty.
+        unpackers = (unpack_dd, unpack_dw)
 
-                # there is some other stuff here, based on... IDB version???
+    try:
+        for unpacker in unpackers:
+            if offset >= len(buf):
+                break
+            v, size = unpacker(buf, offset=offset)
+            offset += size
+            vals.append(v)
+    except IndexError:
+        # this is dangerous.
+        # i don't know all the combinations of which fields can exist.
+        # so, we'll do the best we can...
+        pass
 
-            else:
-                v, size = unpack_dd(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
-
-                v, size = unpack_dw(self.buf, offset=offset)
-                offset += size
-                vals.append(v)
-        except IndexError:
-            # this is dangerous.
-            # i don't know all the combinations of which fields can exist.
-            # so, we'll do the best we can...
-            pass
-        finally:
-            return vals
+    return vals
 
 
 # '$ funcs' maps from function effective address to details about it.
@@ -494,6 +849,257 @@ Functions = Analysis('$ funcs', [
 ])
 
 
+class FunctionView(object):
+    '''
+    lightweight, read-only view of a single row of a `FunctionTable`.
+    exposes the same attributes as `func_t`.
+    '''
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def _get(self, column, position):
+        if self.table.counts[self.index] <= position:
+            return None
+        return column[self.index]
+
+    @property
+    def startEA(self):
+        return self.table.starts[self.index]
+
+    @property
+    def endEA(self):
+        return self.table.ends[self.index]
+
+    @property
+    def flags(self):
+        return self.table.flags[self.index]
+
+    def is_tail(self):
+        return is_flag_set(self.flags, func_t.FUNC_TAIL)
+
+    @property
+    def frame(self):
+        return None if self.is_tail() else self._get(self.table.frames, 3)
+
+    @property
+    def frsize(self):
+        return None if self.is_tail() else self._get(self.table.frsizes, 4)
+
+    @property
+    def frregs(self):
+        return None if self.is_tail() else self._get(self.table.frregs, 5)
+
+    @property
+    def argsize(self):
+        return None if self.is_tail() else self._get(self.table.argsizes, 6)
+
+    @property
+    def fpd(self):
+        return None if self.is_tail() else self._get(self.table.fpds, 7)
+
+    @property
+    def color(self):
+        # like `func_t`, the function color is not decoded from `$ funcs`.
+        return None
+
+    @property
+    def owner(self):
+        # for tails, the frame column holds the owner address.
+        return self._get(self.table.frames, 3) if self.is_tail() else None
+
+    @property
+    def refqty(self):
+        # for tails, the frsize column holds the reference count.
+        return self._get(self.table.frsizes, 4) if self.is_tail() else None
+
+    def __str__(self):
+        return 'FunctionView(startEA: 0x%x, endEA: 0x%x)' % (self.startEA, self.endEA)
+
+
+class FunctionTable(object):
+    '''
+    columnar table of the functions and function tails described by `$ funcs`.
+    each supval is decoded once into parallel arrays, ordered by start address,
+     and rows are exposed on demand as `FunctionView` instances.
+    this is much more compact than a `func_t` instance per function.
+
+    columns:
+      - starts
+      - ends
+      - flags
+      - frames (for tails: owner address)
+      - frsizes (for tails: refqty)
+      - frregs
+      - argsizes
+      - fpds
+      - counts: the number of values decoded for the row, used to detect missing fields.
+      - owners: the row index of the owning function (for functions, the row itself; -1 if unknown).
+
+    since functions and tails don't overlap, the sorted ranges double as an interval index,
+     so finding the function that contains an address is a binary search.
+
+    Example::
+
+        table = FunctionTable(db)
+        func = table.get(0x68901695)
+        assert func.frame == 0x75
+        assert table.get_func(0x68906156).startEA == 0x68901695
+    '''
+    # the names of the column arrays.
+    COLUMNS = ('starts', 'ends', 'flags', 'frames', 'frsizes', 'frregs',
+               'argsizes', 'fpds', 'counts', 'owners')
+
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 8:
+            typecode = 'Q'
+        else:
+            typecode = DD_TYPECODE
+
+        self.starts = array.array(typecode)
+        self.ends = array.array(typecode)
+        self.flags = array.array(DD_TYPECODE)
+        self.frames = array.array(typecode)
+        self.frsizes = array.array(DD_TYPECODE)
+        self.frregs = array.array(DD_TYPECODE)
+        self.argsizes = array.array(DD_TYPECODE)
+        self.fpds = array.array(DD_TYPECODE)
+        self.counts = array.array('B')
+        self.owners = array.array('l')
+
+        self._load()
+        self._resolve_owners()
+
+    def _get_arrays(self):
+        return {name: getattr(self, name) for name in self.COLUMNS}
+
+    @classmethod
+    def _from_arrays(cls, db, arrays):
+        table = cls.__new__(cls)
+        table.idb = db
+        for name in cls.COLUMNS:
+            setattr(table, name, arrays[name])
+        return table
+
+    def _load(self):
+        analyzer = Functions(self.idb)
+        rows = []
+        for sup in analyzer.netnode.supentries(tag='S'):
+            if not analyzer._is_address(sup.parsed_key.index):
+                continue
+            vals = unpack_func_values(sup.value)
+            if is_flag_set(vals[2], func_t.FUNC_TAIL) and len(vals) > 3:
+                # store the owner address, not its delta.
+                vals[3] = vals[0] - vals[3]
+            rows.append(vals)
+
+        # the b-tree orders keys by unsigned bytes, which usually matches address order, but be sure.
+        rows.sort(key=lambda vals: vals[0])
+
+        columns = (self.frames, self.frsizes, self.frregs, self.argsizes, self.fpds)
+        for vals in rows:
+            self.starts.append(vals[0])
+            self.ends.append(vals[0] + vals[1])
+            self.flags.append(vals[2])
+            self.counts.append(len(vals))
+            for i, column in enumerate(columns):
+                if 3 + i < len(vals):
+                    column.append(vals[3 + i])
+                else:
+                    column.append(0)
+
+    def _resolve_owners(self):
+        for i in range(len(self.starts)):
+            if not is_flag_set(self.flags[i], func_t.FUNC_TAIL):
+                self.owners.append(i)
+                continue
+
+            owner = -1
+            if self.counts[i] > 3:
+                try:
+                    owner = self.find(self.frames[i])
+                except KeyError:
+                    logger.warning('function tail %x has unknown owner %x', self.starts[i], self.frames[i])
+            self.owners.append(owner)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        for i in range(len(self.starts)):
+            yield FunctionView(self, i)
+
+    def __getitem__(self, index):
+        if not (0 <= index < len(self.starts)):
+            raise IndexError(index)
+        return FunctionView(self, index)
+
+    def find(self, ea):
+        '''
+        find the row index of the function or tail that starts at the given address.
+
+        Raises:
+          KeyError: if no function or tail starts at the given address.
+        '''
+        i = bisect.bisect_left(self.starts, ea)
+        if i < len(self.starts) and self.starts[i] == ea:
+            return i
+        raise KeyError(ea)
+
+    def get(self, ea):
+        '''
+        get the function or tail that starts at the given address.
+
+        Returns:
+          FunctionView: the row.
+
+        Raises:
+          KeyError: if no function or tail starts at the given address.
+        '''
+        return FunctionView(self, self.find(ea))
+
+    def find_containing(self, ea):
+        '''
+        find the row index of the function or tail whose range contains the given address.
+
+        Raises:
+          KeyError: if the address is not within a function or tail.
+        '''
+        i = bisect.bisect_right(self.starts, ea) - 1
+        if i >= 0 and ea < self.ends[i]:
+            return i
+        raise KeyError(ea)
+
+    def get_func(self, ea):
+        '''
+        get the function that contains the given address, resolving tails to their owners.
+
+        Returns:
+          FunctionView: the owning function.
+
+        Raises:
+          KeyError: if the address is not within a function, or the owner of the tail is unknown.
+        '''
+        owner = self.owners[self.find_containing(ea)]
+        if owner == -1:
+            raise KeyError(ea)
+        return FunctionView(self, owner)
+
+
+def get_function_table(db):
+    '''
+    fetch the function table for the given database, building it once.
+
+    Returns:
+      FunctionTable: the table.
+    '''
+    return get_cache(db).memoize('$ funcs', 'table', lambda: FunctionTable(db))
+
+
 class PString(vstruct.VStruct):
     '''
     short pascal string, prefixed with single byte length.
@@ -546,16 +1152,16 @@ class StructMember:
         return s.s
 
     def get_enum_id(self):
-        return self.altval(tag='A', index=0xB)
+        return self.netnode.altval(tag='A', index=0xB)
 
     def get_struct_id(self):
-        return self.altval(tag='A', index=0x3)
+        return self.netnode.altval(tag='A', index=0x3)
 
     def get_member_comment(self):
-        return self.supstr(tag='S', index=0x0)
+        return self.netnode.supstr(tag='S', index=0x0)
 
     def get_repeatable_member_comment(self):
-        return self.supstr(tag='S', index=0x1)
+        return self.netnode.supstr(tag='S', index=0x1)
 
     # TODO: tag='A', index=0x10
     # TODO: tag='S', index=0x9, "ptrseg"
@@ -615,9 +1221,13 @@ class Struct:
         self.nodeid = structid
         self.netnode = idb.netnode.Netnode(db, self.nodeid)
 
-    def get_members(self):
+    def get_member_nodeids(self):
+        '''
+        Yields:
+          int: the nodeid of each member, in order.
+        '''
         v = self.netnode.supval(tag='M', index=0)
-        vals = list(unpack_dds(v))
+        vals, _ = unpack_dds_array(v)
 
         if not vals[0] & STRUCT_FLAGS.SF_FRAME:
             raise RuntimeError('unexpected frame header')
@@ -629,51 +1239,185 @@ class Struct:
                 member_vals = vals[offset:offset + 5]
                 offset += 5
                 nodeid_offset, unk1, unk2, unk3, unk4 = member_vals
-                member_nodeid = self.netnode.nodebase + nodeid_offset
-                yield StructMember(self.idb, member_nodeid)
+                yield self.netnode.nodebase + nodeid_offset
             elif self.idb.wordsize == 8:
                 member_vals = vals[offset:offset + 8]
                 offset += 8
                 nodeid_offseta, nodeid_offsetb, unk1a, unk1b, unk2a, unk2b, unk3, unk4 = member_vals
-                nodeid_offset = nodeid_offseta | (nodeid_offset << 32)
+                nodeid_offset = nodeid_offseta | (nodeid_offsetb << 32)
                 unk1 = unk1a | (unk1b << 32)
                 unk2 = unk2a | (unk2b << 32)
-                member_nodeid = self.netnode.nodebase + nodeid_offset
-                yield StructMember(self.idb, member_nodeid)
+                yield self.netnode.nodebase + nodeid_offset
             else:
                 raise RuntimeError('unexpected wordsize')
 
+    def get_members(self):
+        for member_nodeid in self.get_member_nodeids():
+            yield StructMember(self.idb, member_nodeid)
 
-def chunks(l, n):
+    def load_members(self):
+        '''
+        fetch all the members with their details, loaded in bulk and cached.
+        see `StructLoader`.
+
+        Returns:
+          List[StructMemberRecord]: the members, in order.
+        '''
+        return get_struct_loader(self.idb).get_members(self.nodeid)
+
+
+class StructMemberRecord(object):
     '''
-    Yield successive n-sized chunks from l.
-    via: https://stackoverflow.com/a/312464/87207
+    compact, read-only details of a structure member, as loaded by `StructLoader`.
+    fields that don't exist in the database are `None`.
     '''
-    if isinstance(l, types.GeneratorType):
-        while True:
-            v = list(itertools.islice(l, n))
-            if not v:
-                return
-            yield v
-    else:
-        i = 0
-        while True:
-            try:
-                v = l[i:i+n]
-                yield v
-            except IndexError:
-                return
-            i += n
+    __slots__ = ('nodeid', 'name', 'type', 'comment', 'repeatable_comment', 'enum_id', 'struct_id')
 
+    def __init__(self, nodeid):
+        self.nodeid = nodeid
+        self.name = None
+        self.type = None
+        self.comment = None
+        self.repeatable_comment = None
+        self.enum_id = None
+        self.struct_id = None
 
-def pairs(l):
-    return chunks(l, 2)
+    def __str__(self):
+        if self.type is None:
+            return 'StructMember(name: %s)' % (self.name)
+        else:
+            return 'StructMember(name: %s, type: %s)' % (self.name, self.type)
 
 
-Chunk = namedtuple('Chunk', ['effective_address', 'length'])
-FunctionParameter = namedtuple('FunctionParameter', ['type', 'name'])
-FunctionSignature = namedtuple('FunctionSignature', ['calling_convention', 'rtype', 'unk', 'parameters'])
-StackChangePoint = namedtuple('StackChangePoint', ['effective_address', 'change'])
+class StructLoader(object):
+    '''
+    bulk loader for structure members.
+    rather than one b-tree lookup per member attribute (like `StructMember`),
+     this resolves the name, type, comments, and enum/struct ids of all members
+     with a single range scan over the member netnodes, which are allocated contiguously.
+    type strings are interned in a table shared by all structures,
+     and the member records are cached per structure.
+
+    Example::
+
+        loader = get_struct_loader(db)
+        for member in loader.get_members(0xFF000075):
+            print(member.name, member.type)
+    '''
+    def __init__(self, db):
+        self.idb = db
+        self.cache = get_cache(db)
+        # map from type string to the canonical instance.
+        self.types = {}
+
+        if db.wordsize == 4:
+            self.wordformat = 'I'
+        elif db.wordsize == 8:
+            self.wordformat = 'Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+    def _intern_type(self, s):
+        return self.types.setdefault(s, s)
+
+    def _load_members(self, structid):
+        nodeids = list(Struct(self.idb, structid).get_member_nodeids())
+        records = {nodeid: StructMemberRecord(nodeid) for nodeid in nodeids}
+        if not records:
+            return []
+
+        keyformat = '>' + self.wordformat
+        wordsize = struct.calcsize(keyformat)
+        start = b'.' + struct.pack(keyformat, min(nodeids))
+        end = b'.' + struct.pack(keyformat, max(nodeids) + 1)
+
+        for key, value in self.idb.id0.iter_entries(start=start, end=end):
+            nodeid = struct.unpack_from(keyformat, key, 1)[0]
+            record = records.get(nodeid)
+            if record is None:
+                # some other netnode allocated between the members.
+                continue
+
+            tag = key[1 + wordsize:2 + wordsize]
+            if len(key) > 2 + wordsize:
+                index = struct.unpack_from(keyformat, key, 2 + wordsize)[0]
+            else:
+                index = None
+
+            if tag == b'N':
+                record.name = idb.netnode.as_string(value).partition('.')[2]
+            elif tag == b'S' and index == 0x3000:
+                s = TypeString()
+                try:
+                    s.vsParse(bytes(value))
+                except RuntimeError:
+                    logger.debug('failed to parse type of member %x', nodeid)
+                else:
+                    record.type = self._intern_type(s.s)
+            elif tag == b'S' and index == 0x0:
+                record.comment = idb.netnode.as_string(value)
+            elif tag == b'S' and index == 0x1:
+                record.repeatable_comment = idb.netnode.as_string(value)
+            elif tag == b'A' and index == 0xB:
+                record.enum_id = idb.netnode.as_int(bytes(value))
+            elif tag == b'A' and index == 0x3:
+                record.struct_id = idb.netnode.as_int(bytes(value))
+
+        return [records[nodeid] for nodeid in nodeids]
+
+    def get_members(self, structid):
+        '''
+        fetch all the members of the given structure.
+
+        Args:
+          structid (int): the nodeid of the structure.
+
+        Returns:
+          List[StructMemberRecord]: the members, in order.
+        '''
+        return self.cache.memoize(structid, 'members', lambda: self._load_members(structid))
+
+
+def get_struct_loader(db):
+    '''
+    fetch the structure loader for the given database, creating it once.
+
+    Returns:
+      StructLoader: the loader.
+    '''
+    return get_cache(db).memoize('$ structs', 'loader', lambda: StructLoader(db))
+
+
+def chunks(l, n):
+    '''
+    Yield successive n-sized chunks from l.
+    via: https://stackoverflow.com/a/312464/87207
+    '''
+    if isinstance(l, types.GeneratorType):
+        while True:
+            v = list(itertools.islice(l, n))
+            if not v:
+                return
+            yield v
+    else:
+        i = 0
+        while True:
+            try:
+                v = l[i:i+n]
+                yield v
+            except IndexError:
+                return
+            i += n
+
+
+def pairs(l):
+    return chunks(l, 2)
+
+
+Chunk = namedtuple('Chunk', ['effective_address', 'length'])
+FunctionParameter = namedtuple('FunctionParameter', ['type', 'name'])
+FunctionSignature = namedtuple('FunctionSignature', ['calling_convention', 'rtype', 'unk', 'parameters'])
+StackChangePoint = namedtuple('StackChangePoint', ['effective_address', 'change'])
 
 
 class Function:
@@ -774,6 +1518,102 @@ class Function:
 
             yield StackChangePoint(offset, change)
 
+    def _load_stack_deltas(self):
+        deltas = StackDeltas()
+        try:
+            points = list(self.get_stack_change_points())
+        except KeyError:
+            # there are no stack change points in this function
+            points = []
+
+        spd = 0
+        for ea, change in points:
+            spd += change
+            deltas.addresses.append(ea)
+            deltas.changes.append(change)
+            deltas.spds.append(spd)
+        return deltas
+
+    def get_stack_deltas(self):
+        '''
+        fetch the prefix sums of the stack change points of this function, decoded once and cached.
+
+        Returns:
+          StackDeltas: the index of stack pointer deltas.
+        '''
+        return get_cache(self.idb).memoize(self.nodeid, 'spd', self._load_stack_deltas)
+
+    def get_spd(self, ea):
+        '''
+        get the difference between the initial and current values of the stack pointer at the given address.
+
+        Example::
+
+            assert Function(db, 0x68901aea).get_spd(0x68901aed) == -4
+        '''
+        return self.get_stack_deltas().get_spd(ea)
+
+    def get_sp_delta(self, ea):
+        '''
+        get the modification of the stack pointer made at the given location.
+        if the location is not a stack change point, then this is 0.
+        '''
+        return self.get_stack_deltas().get_sp_delta(ea)
+
+
+class StackDeltas(object):
+    '''
+    sorted stack change points of a function, with the running sum of the changes.
+    this makes the stack pointer delta at any address a binary search,
+     rather than a replay of `Function.get_stack_change_points`.
+    '''
+    def __init__(self):
+        # addresses of the change points, ordered.
+        self.addresses = array.array('Q')
+        # the change in the stack pointer at each point.
+        self.changes = array.array('q')
+        # the cumulative change, including each point.
+        self.spds = array.array('q')
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def get_spd(self, ea):
+        i = bisect.bisect_right(self.addresses, ea)
+        if i == 0:
+            return 0
+        return self.spds[i - 1]
+
+    def get_sp_delta(self, ea):
+        i = bisect.bisect_left(self.addresses, ea)
+        if i < len(self.addresses) and self.addresses[i] == ea:
+            return self.changes[i]
+        return 0
+
+    def get_spds(self, eas):
+        '''
+        compute the stack pointer delta at each of the given addresses in a single merge pass.
+        for example, pass the heads of a function to get the delta of every instruction.
+
+        Args:
+          eas (Iterable[int]): addresses, in ascending order.
+
+        Returns:
+          array.array: the stack pointer delta at each address.
+        '''
+        ret = array.array('q')
+        addresses = self.addresses
+        spds = self.spds
+        count = len(addresses)
+        i = 0
+        spd = 0
+        for ea in eas:
+            while i < count and addresses[i] <= ea:
+                spd = spds[i]
+                i += 1
+            ret.append(spd)
+        return ret
+
 
 Xref = namedtuple('Xref', ['src', 'dst', 'type'])
 
@@ -854,23 +1694,433 @@ def get_drefs_from(db, ea, types=None):
     return _get_xrefs(db, src=ea, tag='d', types=types)
 
 
+class XrefTable(object):
+    '''
+    compact, sorted table of one kind of cross references, in CSR form.
+    the references of `nodes[i]` are `targets[indptr[i]:indptr[i + 1]]`,
+     with the xref types in the same slice of `types`.
+    '''
+    def __init__(self, typecode):
+        # sorted, unique addresses that have references.
+        self.nodes = array.array(typecode)
+        # index into `targets` of the first reference of each node, with a trailing sentinel.
+        self.indptr = array.array(DD_TYPECODE, [0])
+        self.targets = array.array(typecode)
+        self.types = array.array('B')
+
+    def _add(self, node, target, xtype):
+        # entries must be added in (node, target) order.
+        if not self.nodes or self.nodes[-1] != node:
+            self.nodes.append(node)
+            self.indptr.append(self.indptr[-1])
+        self.targets.append(target)
+        self.types.append(xtype)
+        self.indptr[-1] += 1
+
+    def __len__(self):
+        return len(self.targets)
+
+    def get_bounds(self, ea):
+        '''
+        Returns:
+          (int, int): the range of `targets` and `types` that are references of the given address.
+        '''
+        i = bisect.bisect_left(self.nodes, ea)
+        if i < len(self.nodes) and self.nodes[i] == ea:
+            return self.indptr[i], self.indptr[i + 1]
+        return 0, 0
+
+    def get(self, ea):
+        '''
+        Returns:
+          (array.array, array.array): the referenced addresses, and the xref types, of the given address.
+        '''
+        lo, hi = self.get_bounds(ea)
+        return self.targets[lo:hi], self.types[lo:hi]
+
+
+class XrefIndex(object):
+    '''
+    index of all the cross references in the database, built in a single pass over ID0.
+    rather than descending the b-tree for each address (like `get_crefs_to`),
+     queries here are a binary search and a slice of compact arrays.
+
+    Example::
+
+        xrefs = XrefIndex(db)
+        for xref in xrefs.get_crefs_to(0x68906156):
+            print(hex(xref.src))
+    '''
+    # map from netnode tag to table name.
+    TAGS = {
+        'X': 'crefs_to',
+        'x': 'crefs_from',
+        'D': 'drefs_to',
+        'd': 'drefs_from',
+    }
+
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+            wordformat = 'I'
+        elif db.wordsize == 8:
+            typecode = 'Q'
+            wordformat = 'Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        self.crefs_to = XrefTable(typecode)
+        self.crefs_from = XrefTable(typecode)
+        self.drefs_to = XrefTable(typecode)
+        self.drefs_from = XrefTable(typecode)
+
+        self._load(wordformat)
+
+    def _get_arrays(self):
+        arrays = {}
+        for name in self.TAGS.values():
+            table = getattr(self, name)
+            for column in ('nodes', 'indptr', 'targets', 'types'):
+                arrays[name + '.' + column] = getattr(table, column)
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, db, arrays):
+        index = cls.__new__(cls)
+        index.idb = db
+        for name in cls.TAGS.values():
+            table = XrefTable.__new__(XrefTable)
+            for column in ('nodes', 'indptr', 'targets', 'types'):
+                setattr(table, column, arrays[name + '.' + column])
+            setattr(index, name, table)
+        return index
+
+    def _load(self, wordformat):
+        keyformat = '>' + wordformat + 'c' + wordformat
+        keysize = struct.calcsize(keyformat)
+        tables = {tag.encode('ascii'): getattr(self, name) for tag, name in self.TAGS.items()}
+
+        # complex keys are prefixed with `.`, and b-tree keys are ordered by nodeid, then tag,
+        #  so each tag yields its references sorted by (nodeid, index), which is CSR order.
+        for key, value in self.idb.id0.iter_entries(start=b'.', end=b'/'):
+            if len(key) != 1 + keysize:
+                continue
+
+            nodeid, tag, index = struct.unpack_from(keyformat, key, 1)
+            table = tables.get(tag)
+            if table is None:
+                continue
+
+            table._add(nodeid, index, value[0])
+
+    def _get_xrefs(self, table, ea, types=None, reverse=False):
+        lo, hi = table.get_bounds(ea)
+        for i in range(lo, hi):
+            xtype = table.types[i]
+            if types and xtype not in types:
+                continue
+            if reverse:
+                yield Xref(table.targets[i], ea, xtype)
+            else:
+                yield Xref(ea, table.targets[i], xtype)
+
+    def get_crefs_to(self, ea, types=None):
+        '''
+        like `idb.analysis.get_crefs_to`, but served from the index.
+
+        Yields:
+          Xref: the code references to the given address.
+        '''
+        return self._get_xrefs(self.crefs_to, ea, types=types, reverse=True)
+
+    def get_crefs_from(self, ea, types=None):
+        '''
+        like `idb.analysis.get_crefs_from`, but served from the index.
+
+        Yields:
+          Xref: the code references from the given address.
+        '''
+        return self._get_xrefs(self.crefs_from, ea, types=types)
+
+    def get_drefs_to(self, ea, types=None):
+        '''
+        like `idb.analysis.get_drefs_to`, but served from the index.
+
+        Yields:
+          Xref: the data references to the given address.
+        '''
+        return self._get_xrefs(self.drefs_to, ea, types=types, reverse=True)
+
+    def get_drefs_from(self, ea, types=None):
+        '''
+        like `idb.analysis.get_drefs_from`, but served from the index.
+
+        Yields:
+          Xref: the data references from the given address.
+        '''
+        return self._get_xrefs(self.drefs_from, ea, types=types)
+
+
+def get_xref_index(db):
+    '''
+    fetch the cross reference index for the given database, building it once.
+
+    Returns:
+      XrefIndex: the index.
+    '''
+    return get_cache(db).memoize('$ xrefs', 'index', lambda: XrefIndex(db))
+
+
+class CallGraph(object):
+    '''
+    whole-program call graph, with functions as nodes and calls as edges.
+    call sites are mapped to their containing function (resolving tails to owners)
+     via the `FunctionTable`, and calls are taken from the `XrefIndex`.
+
+    nodes are integers: the index of the function in `.starts`.
+    edges are stored as sorted adjacency arrays in CSR form, in both directions.
+    transitive queries produce bitsets (python integers with one bit per node) that are cached,
+     and later traversals reuse cached results rather than re-exploring the same subgraphs.
+
+    Example::
+
+        cg = CallGraph(db)
+        # which functions can (transitively) call CreateRemoteThreadEx?
+        for fva in cg.get_reaching(0x68901aea):
+            print(hex(fva))
+    '''
+    # fl_CF, fl_CN. see `idb.idapython.idaapi`.
+    CALL_TYPES = (0x10, 0x11)
+
+    def __init__(self, db, functions=None, xrefs=None):
+        self.idb = db
+        if functions is None:
+            functions = get_function_table(db)
+        if xrefs is None:
+            xrefs = get_xref_index(db)
+
+        self.functions = functions
+        typecode = functions.starts.typecode
+
+        # the start addresses of (non-tail) functions, ordered, indexed by node.
+        self.starts = array.array(typecode)
+        # map from function table row to node, or -1.
+        self._node_by_row = array.array('l')
+        for i in range(len(functions)):
+            owner = functions.owners[i]
+            if owner == i:
+                self._node_by_row.append(len(self.starts))
+                self.starts.append(functions.starts[i])
+            else:
+                self._node_by_row.append(-1)
+        for i in range(len(functions)):
+            owner = functions.owners[i]
+            if owner != i and owner != -1:
+                self._node_by_row[i] = self._node_by_row[owner]
+
+        edges = set([])
+        table = xrefs.crefs_from
+        for i, src in enumerate(table.nodes):
+            caller = self._get_node_containing(src)
+            if caller == -1:
+                continue
+
+            for j in range(table.indptr[i], table.indptr[i + 1]):
+                if table.types[j] not in self.CALL_TYPES:
+                    continue
+                callee = self._get_node_containing(table.targets[j])
+                if callee == -1:
+                    # such as calls to imports.
+                    continue
+                edges.add((caller, callee))
+
+        self.succ_indptr, self.succs = self._build_csr(sorted(edges))
+        self.pred_indptr, self.preds = self._build_csr(sorted((callee, caller) for (caller, callee) in edges))
+
+        # map from (node, direction, max_depth) to bitset.
+        self._reach_cache = {}
+
+    def _get_node_containing(self, ea):
+        try:
+            return self._node_by_row[self.functions.find_containing(ea)]
+        except KeyError:
+            return -1
+
+    def _build_csr(self, edges):
+        indptr = array.array(DD_TYPECODE, [0] * (len(self.starts) + 1))
+        targets = array.array(DD_TYPECODE)
+        for src, dst in edges:
+            indptr[src + 1] += 1
+            targets.append(dst)
+        for i in range(len(self.starts)):
+            indptr[i + 1] += indptr[i]
+        return indptr, targets
+
+    def __len__(self):
+        return len(self.starts)
+
+    def get_node(self, ea):
+        '''
+        get the node of the function that contains the given address.
+
+        Raises:
+          KeyError: if the address is not within a function.
+        '''
+        node = self._get_node_containing(ea)
+        if node == -1:
+            raise KeyError(ea)
+        return node
+
+    def get_callees(self, ea):
+        '''
+        Returns:
+          List[int]: the start addresses of the functions called by the function containing the address.
+        '''
+        node = self.get_node(ea)
+        return [self.starts[n] for n in self.succs[self.succ_indptr[node]:self.succ_indptr[node + 1]]]
+
+    def get_callers(self, ea):
+        '''
+        Returns:
+          List[int]: the start addresses of the functions that call the function containing the address.
+        '''
+        node = self.get_node(ea)
+        return [self.starts[n] for n in self.preds[self.pred_indptr[node]:self.pred_indptr[node + 1]]]
+
+    def _get_reach(self, node, reverse, max_depth):
+        key = (node, reverse, max_depth)
+        try:
+            return self._reach_cache[key]
+        except KeyError:
+            pass
+
+        if reverse:
+            indptr, adjacent = self.pred_indptr, self.preds
+        else:
+            indptr, adjacent = self.succ_indptr, self.succs
+
+        # visited nodes, one bit per node.
+        seen = bytearray((len(self.starts) + 7) // 8)
+        # bitsets of nodes reachable from already explored subgraphs.
+        extra = 0
+        frontier = [node]
+        depth = 0
+        while frontier and (max_depth is None or depth < max_depth):
+            next_frontier = []
+            for n in frontier:
+                for m in adjacent[indptr[n]:indptr[n + 1]]:
+                    if seen[m >> 3] & (1 << (m & 7)):
+                        continue
+                    seen[m >> 3] |= 1 << (m & 7)
+
+                    if max_depth is None:
+                        cached = self._reach_cache.get((m, reverse, None))
+                        if cached is not None:
+                            # everything reachable from `m` is already known.
+                            extra |= cached
+                            continue
+                    next_frontier.append(m)
+            frontier = next_frontier
+            depth += 1
+
+        reach = int.from_bytes(bytes(seen), 'little') | extra
+        self._reach_cache[key] = reach
+        return reach
+
+    def _get_addresses(self, bitset):
+        ret = []
+        buf = bitset.to_bytes((len(self.starts) + 7) // 8, 'little')
+        for i, b in enumerate(buf):
+            while b:
+                low = b & -b
+                ret.append(self.starts[(i << 3) + low.bit_length() - 1])
+                b ^= low
+        return ret
+
+    def get_reachable(self, ea, max_depth=None):
+        '''
+        find the functions transitively called by the function containing the address.
+
+        Args:
+          ea (int): an address within the function.
+          max_depth (int): the maximum number of calls to follow. default: unbounded.
+
+        Returns:
+          List[int]: the start addresses of the reachable functions, ordered.
+        '''
+        return self._get_addresses(self._get_reach(self.get_node(ea), False, max_depth))
+
+    def get_reaching(self, ea, max_depth=None):
+        '''
+        find the functions that transitively call the function containing the address.
+
+        Args:
+          ea (int): an address within the function.
+          max_depth (int): the maximum number of calls to follow. default: unbounded.
+
+        Returns:
+          List[int]: the start addresses of the reaching functions, ordered.
+        '''
+        return self._get_addresses(self._get_reach(self.get_node(ea), True, max_depth))
+
+    def can_reach(self, src, dst, max_depth=None):
+        '''
+        can the function containing `src` transitively call the function containing `dst`?
+        '''
+        return bool(self._get_reach(self.get_node(src), False, max_depth) >> self.get_node(dst) & 1)
+
+
+def get_call_graph(db):
+    '''
+    fetch the call graph for the given database, building it once.
+
+    Returns:
+      CallGraph: the call graph.
+    '''
+    return get_cache(db).memoize('$ funcs', 'callgraph',
+                                 lambda: CallGraph(db, functions=get_function_table(db)))
+
+
+# the bits of the fixup type that select the kind of fixup.
+# the higher bits are flags: FIXUP_REL (0x10), FIXUP_EXTDEF (0x20), and FIXUP_UNUSED (0x40).
+FIXUP_MASK = 0xF
+
+# map from fixup type (masked by `FIXUP_MASK`) to the number of bytes patched.
+# via: https://www.hex-rays.com/products/ida/support/sdkdoc/fixup_8hpp.html
+FIXUP_LENGTHS = {
+    0x0: 1,  # FIXUP_OFF8
+    0x1: 2,  # FIXUP_OFF16
+    0x2: 2,  # FIXUP_SEG16
+    0x3: 4,  # FIXUP_PTR16
+    0x4: 4,  # FIXUP_OFF32
+    0x5: 6,  # FIXUP_PTR32
+    0x6: 1,  # FIXUP_HI8
+    0x7: 2,  # FIXUP_HI16
+    0x8: 1,  # FIXUP_LOW8
+    0x9: 2,  # FIXUP_LOW16
+    0xC: 8,  # FIXUP_OFF64
+}
+
+
 class Fixup(vstruct.VStruct):
     def __init__(self):
         vstruct.VStruct.__init__(self)
         # sizeof() == 0xB (fixed)
-        self.type = v_uint8()    # possible values: 0x0 - 0xC. top bit has some meaning.
+        self.type = v_uint8()    # possible values: 0x0 - 0xC, with flags in the high bits.
         self.unk01 = v_uint16()  # this might be the segment index + 1?
         self.offset = v_uint32()
         self.unk07 = v_uint32()
 
     def pcb_type(self):
-        if self.type != 0x04:
+        if self.type & FIXUP_MASK not in FIXUP_LENGTHS:
             raise NotImplementedError('fixup type %x not yet supported' % (self.type))
 
     def get_fixup_length(self):
-        if self.type == 0x4:
-            return 0x4
-        else:
+        try:
+            return FIXUP_LENGTHS[self.type & FIXUP_MASK]
+        except KeyError:
             raise NotImplementedError('fixup type %x not yet supported' % (self.type))
 
 
@@ -888,6 +2138,151 @@ Fixups = Analysis('$ fixups', [
 ])
 
 
+class FixupIndex(object):
+    '''
+    the fixups of a database, loaded once into sorted arrays of start address and length.
+    queries are binary searches, rather than a walk of the `$ fixups` supvals.
+
+    Example::
+
+        fixups = FixupIndex(db)
+        if fixups.contains_fixups(0x401000, 0x10):
+            print(hex(fixups.next_fixup(0x401000)))
+    '''
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+            self._wordformat = '>I'
+        elif db.wordsize == 8:
+            typecode = 'Q'
+            self._wordformat = '>Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        self.starts = array.array(typecode)
+        self.lengths = array.array('B')
+        self._load()
+
+    def _load(self):
+        try:
+            nodeid = idb.netnode.Netnode(self.idb, '$ fixups').nodeid
+        except KeyError:
+            # there are no fixups in this database
+            return
+
+        prefix = idb.netnode.make_key(nodeid, 'S', wordsize=self.idb.wordsize)
+        keysize = len(prefix) + self.idb.wordsize
+        end = prefix[:-1] + bytes([prefix[-1] + 1])
+        for key, value in self.idb.id0.iter_entries(start=prefix, end=end):
+            if len(key) != keysize:
+                continue
+            ea = struct.unpack_from(self._wordformat, key, len(prefix))[0]
+            # processor-specific fixups patch an unknown number of bytes, so assume a word.
+            length = FIXUP_LENGTHS.get(value[0] & FIXUP_MASK, self.idb.wordsize)
+            self.starts.append(ea)
+            self.lengths.append(length)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __iter__(self):
+        return iter(self.starts)
+
+    def next_fixup(self, ea):
+        '''
+        find the first fixup at or after the given address.
+
+        Raises:
+          KeyError: if there is no such fixup.
+        '''
+        i = bisect.bisect_left(self.starts, ea)
+        if i == len(self.starts):
+            raise KeyError(ea)
+        return self.starts[i]
+
+    def prev_fixup(self, ea):
+        '''
+        find the last fixup before the given address.
+
+        Raises:
+          KeyError: if there is no such fixup.
+        '''
+        i = bisect.bisect_left(self.starts, ea)
+        if i == 0:
+            raise KeyError(ea)
+        return self.starts[i - 1]
+
+    def _get_bounds(self, ea, size, overlap=False):
+        lo = bisect.bisect_left(self.starts, ea)
+        if overlap and lo > 0 and self.starts[lo - 1] + self.lengths[lo - 1] > ea:
+            # include the fixup that starts before the range but patches bytes within it.
+            lo -= 1
+        hi = bisect.bisect_left(self.starts, ea + size)
+        return lo, hi
+
+    def fixups_in_range(self, ea, size):
+        '''
+        fetch the fixups that start within the given range.
+
+        Returns:
+          List[int]: the start addresses of the fixups, ordered.
+        '''
+        lo, hi = self._get_bounds(ea, size)
+        return self.starts[lo:hi].tolist()
+
+    def contains_fixups(self, ea, size):
+        lo, hi = self._get_bounds(ea, size)
+        return lo < hi
+
+    def get_mask(self, ea, size):
+        '''
+        compute a mask over the given range with 0x00 for bytes patched by a fixup, and 0xFF otherwise.
+
+        Returns:
+          bytearray: the mask, one byte per address.
+        '''
+        mask = bytearray(b'\xFF') * size
+        lo, hi = self._get_bounds(ea, size, overlap=True)
+        for i in range(lo, hi):
+            start = max(self.starts[i] - ea, 0)
+            end = min(self.starts[i] + self.lengths[i] - ea, size)
+            mask[start:end] = bytes(end - start)
+        return mask
+
+    def mask_fixups(self, ea, buf, fill=0x00):
+        '''
+        replace the bytes patched by fixups in the given buffer, such as for relocation-aware hashing.
+
+        Args:
+          ea (int): the address of the first byte of the buffer.
+          buf (bytes): the bytes of the range.
+          fill (int): the byte to write in place of fixup bytes.
+
+        Returns:
+          bytes: the masked buffer.
+        '''
+        ret = bytearray(buf)
+        size = len(ret)
+        lo, hi = self._get_bounds(ea, size, overlap=True)
+        for i in range(lo, hi):
+            start = max(self.starts[i] - ea, 0)
+            end = min(self.starts[i] + self.lengths[i] - ea, size)
+            ret[start:end] = bytes([fill]) * (end - start)
+        return bytes(ret)
+
+
+def get_fixup_index(db):
+    '''
+    fetch the fixup index for the given database, building it once.
+
+    Returns:
+      FixupIndex: the index.
+    '''
+    return get_cache(db).memoize('$ fixups', 'index', lambda: FixupIndex(db))
+
+
 def parse_seg_strings(buf):
     strings = []
     offset = 0x0
@@ -910,9 +2305,19 @@ SegStrings = Analysis('$ segstrings', [
 
 
 class Seg:
-    def __init__(self, buf):
+    __slots__ = ('buf', 'vals', 'startEA', 'endEA', 'name_index', 'sclass', 'orgbase', 'align',
+                 'comb', 'perm', 'bitness', 'flags', 'sel', 'defsr', 'type', 'color')
+
+    def __init__(self, buf, vals=None):
+        '''
+        Args:
+          buf (bytes): the `$ segs` supval.
+          vals (List[int]): the packed dwords of the supval, when already decoded, such as by `unpack_dds_batch`.
+        '''
         self.buf = buf
-        self.vals = list(unpack_dds(buf))
+        if vals is None:
+            vals = unpack_dds_array(buf)[0].tolist()
+        self.vals = vals
         self.startEA = self.vals[0]
         self.endEA = self.startEA + self.vals[1]
         # index into `$ segstrings` array of strings.
@@ -957,3 +2362,1569 @@ Segments = Analysis('$ segs', [
     Field('segments',  'S', ADDRESSES, Seg),
 ])
 
+
+class SegmentTable(object):
+    '''
+    the segments of a database, ordered by start address, with their names resolved.
+    `$ segs` and `$ segstrings` are parsed once, and lookups are binary searches.
+
+    Example::
+
+        segs = SegmentTable(db)
+        print(segs.get_name(0x68901000))  # --> ".text"
+    '''
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+        elif db.wordsize == 8:
+            typecode = 'Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        self.segments = list(sorted(self._load(), key=lambda s: s.startEA))
+
+        self.starts = array.array(typecode, [seg.startEA for seg in self.segments])
+        self.ends = array.array(typecode, [seg.endEA for seg in self.segments])
+
+        try:
+            strings = SegStrings(db).strings
+        except KeyError:
+            strings = []
+        self.names = [strings[seg.name_index] if seg.name_index < len(strings) else None
+                      for seg in self.segments]
+
+    def _load(self):
+        analyzer = Segments(self.idb)
+        try:
+            bufs = [sup.value for sup in analyzer.netnode.supentries(tag='S')
+                    if analyzer._is_address(sup.parsed_key.index)]
+        except KeyError:
+            # there are no segments in this database
+            return []
+
+        # decode all the supvals in one pass.
+        values, _, indices = unpack_dds_batch(bufs)
+        return [Seg(buf, vals=values[indices[i]:indices[i + 1]].tolist()) for i, buf in enumerate(bufs)]
+
+    def _get_arrays(self):
+        arrays = {
+            'starts': self.starts,
+            'ends': self.ends,
+            # segment names may be missing, which is distinct from empty.
+            'has_names': array.array('B', [name is not None for name in self.names]),
+        }
+        arrays['segments'], arrays['segments.offsets'] = _pack_buffers([bytes(seg.buf) for seg in self.segments])
+        arrays['names'], arrays['names.offsets'] = _pack_buffers([(name or '').encode('utf-8') for name in self.names])
+        return arrays
+
+    @classmethod
+    def _from_arrays(cls, db, arrays):
+        table = cls.__new__(cls)
+        table.idb = db
+        table.starts = arrays['starts']
+        table.ends = arrays['ends']
+        table.segments = [Seg(memoryview(buf))
+                          for buf in _unpack_buffers(arrays['segments'], arrays['segments.offsets'])]
+        table.names = [buf.decode('utf-8') if has_name else None
+                       for buf, has_name in zip(_unpack_buffers(arrays['names'], arrays['names.offsets']),
+                                                arrays['has_names'])]
+        return table
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    def __getitem__(self, index):
+        return self.segments[index]
+
+    def find(self, ea):
+        '''
+        find the index of the segment that contains the given address.
+
+        Raises:
+          KeyError: if the address is not within a segment.
+        '''
+        i = bisect.bisect_right(self.starts, ea) - 1
+        if i >= 0 and ea < self.ends[i]:
+            return i
+        raise KeyError(ea)
+
+    def get(self, ea):
+        '''
+        get the segment that contains the given address.
+
+        Returns:
+          Seg: the segment.
+
+        Raises:
+          KeyError: if the address is not within a segment.
+        '''
+        return self.segments[self.find(ea)]
+
+    def get_name(self, ea):
+        '''
+        get the name of the segment that contains the given address.
+
+        Raises:
+          KeyError: if the address is not within a segment.
+        '''
+        return self.names[self.find(ea)]
+
+    def get_next(self, ea):
+        '''
+        get the first segment that starts after the given address.
+
+        Raises:
+          KeyError: if there is no such segment.
+        '''
+        i = bisect.bisect_right(self.starts, ea)
+        if i == len(self.segments):
+            raise KeyError(ea)
+        return self.segments[i]
+
+
+def get_segment_table(db):
+    '''
+    fetch the segment table for the given database, building it once.
+
+    Returns:
+      SegmentTable: the table.
+    '''
+    return get_cache(db).memoize('$ segs', 'table', lambda: SegmentTable(db))
+
+
+class NameIndex(object):
+    '''
+    index of the global names in the database: the `N`-prefixed keys that map a name to a nodeid or address.
+    the keys are loaded in a single range scan into sorted arrays,
+     so exact, prefix, and glob queries are binary searches, and substring queries use a trigram index.
+
+    Example::
+
+        names = NameIndex(db)
+        print(hex(names.get('$ funcs')))
+        for name in names.search('*Thread*'):
+            print(name)
+    '''
+    # the length of the substrings in the substring index.
+    NGRAM = 3
+
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+            valueformat = '<I'
+        elif db.wordsize == 8:
+            typecode = 'Q'
+            valueformat = '<Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        # the names, ordered.
+        self.names = []
+        # the nodeid or address of each name.
+        self.values = array.array(typecode)
+
+        # b-tree keys are ordered, so the names come out sorted.
+        # utf-8 preserves the order of the raw key bytes, as long as nothing is replaced while decoding.
+        for key, value in self.idb.id0.iter_entries(start=b'N', end=b'O'):
+            if len(value) != db.wordsize:
+                continue
+            self.names.append(bytes(key[1:]).decode('utf-8'))
+            self.values.append(struct.unpack(valueformat, value)[0])
+
+        # the reverse mapping: row indices ordered by value.
+        self.order = array.array('l', sorted(range(len(self.values)), key=lambda i: self.values[i]))
+        self.sorted_values = array.array(typecode, [self.values[i] for i in self.order])
+
+        # map from trigram to ordered row indices, built on first substring query.
+        self._ngrams = None
+
+    def _get_arrays(self):
+        names, offsets = _pack_buffers([name.encode('utf-8') for name in self.names])
+        return {
+            'names': names,
+            'names.offsets': offsets,
+            'values': self.values,
+            'order': self.order,
+            'sorted_values': self.sorted_values,
+        }
+
+    @classmethod
+    def _from_arrays(cls, db, arrays):
+        index = cls.__new__(cls)
+        index.idb = db
+        index.names = [buf.decode('utf-8') for buf in _unpack_buffers(arrays['names'], arrays['names.offsets'])]
+        index.values = arrays['values']
+        index.order = arrays['order']
+        index.sorted_values = arrays['sorted_values']
+        index._ngrams = None
+        return index
+
+    def __len__(self):
+        return len(self.names)
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __contains__(self, name):
+        i = bisect.bisect_left(self.names, name)
+        return i < len(self.names) and self.names[i] == name
+
+    def get(self, name):
+        '''
+        resolve the given name to its nodeid or address.
+
+        Raises:
+          KeyError: if the name does not exist.
+        '''
+        i = bisect.bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            return self.values[i]
+        raise KeyError(name)
+
+    def get_name(self, value):
+        '''
+        find the name of the given nodeid or address.
+
+        Raises:
+          KeyError: if there is no name for the value.
+        '''
+        i = bisect.bisect_left(self.sorted_values, value)
+        if i < len(self.sorted_values) and self.sorted_values[i] == value:
+            return self.names[self.order[i]]
+        raise KeyError(value)
+
+    def _get_prefix_bounds(self, prefix):
+        lo = bisect.bisect_left(self.names, prefix)
+        if not prefix:
+            return lo, len(self.names)
+        # the smallest string greater than all strings with the prefix.
+        hi = bisect.bisect_left(self.names, prefix[:-1] + chr(ord(prefix[-1]) + 1), lo)
+        return lo, hi
+
+    def find_prefix(self, prefix):
+        '''
+        Returns:
+          List[str]: the names that start with the given prefix, ordered.
+        '''
+        lo, hi = self._get_prefix_bounds(prefix)
+        return self.names[lo:hi]
+
+    def search(self, pattern):
+        '''
+        find the names that match the given glob pattern, like `fnmatch`.
+        the literal prefix of the pattern is used to narrow the candidates.
+
+        Returns:
+          List[str]: the matching names, ordered.
+        '''
+        literal = []
+        for c in pattern:
+            if c in '*?[':
+                break
+            literal.append(c)
+
+        if len(literal) == len(pattern):
+            return [pattern] if pattern in self else []
+
+        lo, hi = self._get_prefix_bounds(''.join(literal))
+        return [name for name in self.names[lo:hi] if fnmatch.fnmatchcase(name, pattern)]
+
+    def _get_ngrams(self):
+        if self._ngrams is None:
+            n = self.NGRAM
+            ngrams = {}
+            for i, name in enumerate(self.names):
+                for gram in set(name[j:j + n] for j in range(len(name) - n + 1)):
+                    rows = ngrams.get(gram)
+                    if rows is None:
+                        rows = ngrams[gram] = array.array('l')
+                    rows.append(i)
+            self._ngrams = ngrams
+        return self._ngrams
+
+    def find_substring(self, substring):
+        '''
+        Returns:
+          List[str]: the names that contain the given substring, ordered.
+        '''
+        n = self.NGRAM
+        if len(substring) < n:
+            return [name for name in self.names if substring in name]
+
+        ngrams = self._get_ngrams()
+        grams = set(substring[j:j + n] for j in range(len(substring) - n + 1))
+
+        rows = None
+        # intersect starting from the rarest trigram.
+        for gram in sorted(grams, key=lambda g: len(ngrams.get(g, ()))):
+            candidates = ngrams.get(gram)
+            if candidates is None:
+                return []
+            if rows is None:
+                rows = set(candidates)
+            else:
+                rows.intersection_update(candidates)
+            if not rows:
+                return []
+
+        return [self.names[i] for i in sorted(rows) if substring in self.names[i]]
+
+
+def get_name_index(db):
+    '''
+    fetch the name index for the given database, building it once.
+
+    Returns:
+      NameIndex: the index.
+    '''
+    # the index covers the `N` keys of the whole b-tree, not any one netnode.
+    return get_cache(db).memoize('ID0', 'names', lambda: NameIndex(db))
+
+
+# map from the second byte of the ID1 flags to 1 for item heads (code or data), and 0 otherwise.
+# this is the same test as `(flags & FF_DATA) != 0`, which covers both FF_CODE and FF_DATA.
+HEAD_TABLE = bytes(1 if b & 0x04 else 0 for b in range(0x100))
+
+
+class HeadIndex(object):
+    '''
+    the item heads of the database, derived from the ID1 flags in one pass per segment.
+    the second byte of each segment's flags is extracted with a strided slice and classified with `bytes.translate`,
+     and the head addresses are collected into a sorted array.
+    so head queries are binary searches, rather than stepping backwards or forwards byte by byte.
+
+    Example::
+
+        heads = HeadIndex(db)
+        print(hex(heads.next_head(0x68901000)))
+    '''
+    def __init__(self, db):
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+        elif db.wordsize == 8:
+            typecode = 'Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        segments = sorted(db.id1.segments, key=lambda s: s.bounds.start)
+        self.segment_starts = array.array(typecode, [s.bounds.start for s in segments])
+        self.segment_ends = array.array(typecode, [s.bounds.end for s in segments])
+        self.heads = array.array(typecode)
+
+        for segment in segments:
+            flags = db.id1.get_segment_flags(segment)
+            mask = bytes(flags[1::4]).translate(HEAD_TABLE)
+            start = segment.bounds.start
+            self.heads.extend(itertools.compress(range(start, start + len(mask)), mask))
+
+    def _get_arrays(self):
+        return {
+            'segment_starts': self.segment_starts,
+            'segment_ends': self.segment_ends,
+            'heads': self.heads,
+        }
+
+    @classmethod
+    def _from_arrays(cls, db, arrays):
+        index = cls.__new__(cls)
+        index.idb = db
+        index.segment_starts = arrays['segment_starts']
+        index.segment_ends = arrays['segment_ends']
+        index.heads = arrays['heads']
+        return index
+
+    def __len__(self):
+        return len(self.heads)
+
+    def __iter__(self):
+        return iter(self.heads)
+
+    def _get_segment_bounds(self, ea):
+        i = bisect.bisect_right(self.segment_starts, ea) - 1
+        if i >= 0 and ea < self.segment_ends[i]:
+            return self.segment_starts[i], self.segment_ends[i]
+        raise KeyError(ea)
+
+    def is_head(self, ea):
+        i = bisect.bisect_left(self.heads, ea)
+        return i < len(self.heads) and self.heads[i] == ea
+
+    def get_head(self, ea):
+        '''
+        find the head of the item that contains the given address.
+        items never span segments, so this doesn't search beyond the start of the segment.
+
+        Raises:
+          KeyError: if the address is not within a segment, or no item contains it.
+        '''
+        start, _ = self._get_segment_bounds(ea)
+        i = bisect.bisect_right(self.heads, ea) - 1
+        if i < 0 or self.heads[i] < start:
+            raise KeyError(ea)
+        return self.heads[i]
+
+    def next_head(self, ea):
+        '''
+        find the first head after the given address, in this or a later segment.
+
+        Raises:
+          KeyError: if there are no more heads.
+        '''
+        i = bisect.bisect_right(self.heads, ea)
+        if i == len(self.heads):
+            raise KeyError(ea)
+        return self.heads[i]
+
+    def prev_head(self, ea):
+        '''
+        find the head of the item before the item that contains the given address,
+         in this or an earlier segment.
+
+        Raises:
+          KeyError: if there is no earlier head.
+        '''
+        # skip the head of the item that contains the address.
+        i = bisect.bisect_right(self.heads, ea) - 2
+        if i < 0:
+            raise KeyError(ea)
+        return self.heads[i]
+
+    def get_item_size(self, ea):
+        '''
+        compute the size of the item at the given head:
+         the distance to the next head, or the end of the segment, whichever comes first.
+
+        Raises:
+          ValueError: if the address is not a head.
+          KeyError: if the address is not within a segment.
+        '''
+        _, end = self._get_segment_bounds(ea)
+        i = bisect.bisect_left(self.heads, ea)
+        if i == len(self.heads) or self.heads[i] != ea:
+            raise ValueError('ItemSize must only be called on a head address.')
+        if i + 1 < len(self.heads) and self.heads[i + 1] < end:
+            return self.heads[i + 1] - ea
+        return end - ea
+
+
+def get_head_index(db):
+    '''
+    fetch the item head index for the given database, building it once.
+
+    Returns:
+      HeadIndex: the index.
+    '''
+    return get_cache(db).memoize('ID1', 'heads', lambda: HeadIndex(db))
+
+
+# map from the second byte of the ID1 flags to 1 when the address has a value (FF_IVL), and 0 otherwise.
+VALUE_TABLE = bytes(b & 0x01 for b in range(0x100))
+
+
+class ByteView(object):
+    '''
+    the loaded bytes of the database, extracted from the ID1 flags once per segment.
+    the low byte of each flags word is the byte value, and FF_IVL indicates whether its defined,
+     so each segment is decoded with two strided slices into a byte string and a "has value" mask.
+
+    Example::
+
+        view = ByteView(db)
+        buf = view.get_bytes(0x68901010, 0x3)
+    '''
+    def __init__(self, db):
+        self.idb = db
+
+        segments = sorted(db.id1.segments, key=lambda s: s.bounds.start)
+        self.segments = segments
+        self.starts = [s.bounds.start for s in segments]
+        # map from segment index to tuple (bytes, has value mask), decoded on demand.
+        self._segments = {}
+
+    def _get_segment(self, ea):
+        i = bisect.bisect_right(self.starts, ea) - 1
+        if i < 0 or ea >= self.segments[i].bounds.end:
+            raise KeyError(ea)
+
+        try:
+            return self.segments[i], self._segments[i]
+        except KeyError:
+            flags = self.idb.id1.get_segment_flags(self.segments[i])
+            decoded = (bytes(flags[0::4]), bytes(flags[1::4]).translate(VALUE_TABLE))
+            self._segments[i] = decoded
+            return self.segments[i], decoded
+
+    def get_segment_bytes(self, ea):
+        '''
+        fetch the bytes and has-value mask of the segment that contains the given address.
+        undefined bytes are 0x00 in the byte string.
+
+        Returns:
+          Tuple[int, bytes, bytes]: the start address of the segment, its bytes, and the mask (1 when defined).
+
+        Raises:
+          KeyError: if the address is not within a segment.
+        '''
+        segment, (buf, mask) = self._get_segment(ea)
+        return segment.bounds.start, buf, mask
+
+    def has_value(self, ea):
+        segment, (_, mask) = self._get_segment(ea)
+        return mask[ea - segment.bounds.start] == 1
+
+    def get_bytes(self, ea, size):
+        '''
+        fetch the defined bytes in the given range, without copying.
+
+        Returns:
+          memoryview: the bytes.
+
+        Raises:
+          IndexError: if the range extends beyond a segment.
+          KeyError: if the address is not within a segment, or a byte in the range is not defined.
+        '''
+        segment, (buf, mask) = self._get_segment(ea)
+        if ea + size > segment.bounds.end:
+            raise IndexError((ea, ea + size))
+
+        offset = ea - segment.bounds.start
+        undefined = mask.find(b'\x00', offset, offset + size)
+        if undefined != -1:
+            raise KeyError(segment.bounds.start + undefined)
+
+        return memoryview(buf)[offset:offset + size]
+
+
+def get_byte_view(db):
+    '''
+    fetch the loaded-bytes view for the given database.
+
+    Returns:
+      ByteView: the view.
+    '''
+    return get_cache(db).memoize('ID1', 'bytes', lambda: ByteView(db))
+
+
+# map from the second byte of the ID1 flags to 1 when the address has no value, and 0 otherwise.
+UNDEFINED_TABLE = bytes(0 if b & 0x01 else 1 for b in range(0x100))
+
+
+def pack_bits(mask):
+    '''
+    pack a mask of 0x00/0x01 bytes into a bitmap, least significant bit first.
+    each of the eight bit positions is gathered with a strided slice and merged as a big integer,
+     so this runs at C speed rather than per bit.
+
+    Example::
+
+        assert pack_bits(bytes([1, 0, 0, 0, 0, 0, 0, 0, 1])) == bytes([1, 1])
+
+    Args:
+      mask (bytes): one byte per bit, each 0x00 or 0x01.
+
+    Returns:
+      bytes: the bitmap.
+    '''
+    pad = -len(mask) % 8
+    if pad:
+        mask = bytes(mask) + bytes(pad)
+
+    value = 0
+    for i in range(8):
+        value |= int.from_bytes(mask[i::8], 'little') << i
+    return value.to_bytes(len(mask) // 8, 'little')
+
+
+def _write_bits(bitmap, offset, mask):
+    # align the mask to the containing byte of the bitmap,
+    #  and merge the first byte, which may be shared with the previous write.
+    shift = offset % 8
+    bits = bytearray(pack_bits(bytes(shift) + bytes(mask)))
+    start = offset // 8
+    bits[0] |= bitmap[start]
+    bitmap[start:start + len(bits)] = bits
+
+
+def export_image(db, path, bitmap_path=None, chunk_size=0x100000):
+    '''
+    write the loaded bytes of the database to a flat file, at their offset from the lowest segment.
+    the file is extended without writing the gaps between segments or runs of zero bytes,
+     so on most file systems it is sparse.
+    segments are decoded from the ID1 flags in chunks, so memory use is bounded by `chunk_size`.
+
+    optionally, write a bitmap with one bit per byte of the image, set when the byte is undefined
+     (including the gaps between segments), least significant bit first.
+
+    Example::
+
+        base = export_image(db, 'image.bin', bitmap_path='image.undef')
+        with MappedImage('image.bin', base, bitmap_path='image.undef') as image:
+            print(image.get_bytes(0x68901010, 3).hex())
+
+    Args:
+      db (idb.IDB): the database.
+      path (str): the path of the image file to create.
+      bitmap_path (str): the path of the undefined bytes bitmap to create, if any.
+      chunk_size (int): the number of addresses to decode at a time.
+
+    Returns:
+      int: the address of the first byte of the image.
+    '''
+    segments = sorted(db.id1.segments, key=lambda s: s.bounds.start)
+    if segments:
+        base = segments[0].bounds.start
+        size = max(s.bounds.end for s in segments) - base
+    else:
+        base = 0
+        size = 0
+
+    # keep bitmap chunks aligned to bytes of the bitmap.
+    chunk_size = max(8, chunk_size - chunk_size % 8)
+
+    bitmap_file = None
+    bitmap = None
+    with open(path, 'wb') as f:
+        f.truncate(size)
+
+        if bitmap_path is not None:
+            bitmap_file = open(bitmap_path, 'w+b')
+            bitmap_file.truncate((size + 7) // 8)
+            if size:
+                bitmap = mmap.mmap(bitmap_file.fileno(), 0)
+
+        try:
+            last = base
+            for segment in segments:
+                start = segment.bounds.start
+                if bitmap is not None and start > last:
+                    # the gap between segments is undefined.
+                    for ea in range(last, start, chunk_size):
+                        _write_bits(bitmap, ea - base, b'\x01' * min(chunk_size, start - ea))
+
+                flags = db.id1.get_segment_flags(segment)
+                count = segment.bounds.end - start
+                for i in range(0, count, chunk_size):
+                    chunk = flags[4 * i:4 * min(i + chunk_size, count)]
+                    offset = start - base + i
+
+                    buf = bytes(chunk[0::4])
+                    if buf.count(0) != len(buf):
+                        f.seek(offset)
+                        f.write(buf)
+
+                    if bitmap is not None:
+                        _write_bits(bitmap, offset, bytes(chunk[1::4]).translate(UNDEFINED_TABLE))
+
+                last = max(last, segment.bounds.end)
+        finally:
+            if bitmap is not None:
+                bitmap.close()
+            if bitmap_file is not None:
+                bitmap_file.close()
+
+    return base
+
+
+class MappedImage(object):
+    '''
+    random access to an image written by `export_image`, through `mmap`.
+
+    Example::
+
+        with MappedImage('image.bin', 0x68901000) as image:
+            buf = image.get_bytes(0x68901010, 0x3)
+    '''
+    def __init__(self, path, base, bitmap_path=None):
+        self.base = base
+
+        self._files = []
+        self.image = self._map(path)
+        self.bitmap = self._map(bitmap_path) if bitmap_path is not None else None
+
+    def _map(self, path):
+        f = open(path, 'rb')
+        self._files.append(f)
+        if os.fstat(f.fileno()).st_size == 0:
+            # empty files cannot be mapped.
+            return b''
+        return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def close(self):
+        for m in (self.image, self.bitmap):
+            if isinstance(m, mmap.mmap):
+                m.close()
+        for f in self._files:
+            f.close()
+        self._files = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self.image)
+
+    def get_bytes(self, ea, size):
+        '''
+        fetch the bytes of the image in the given range, without copying.
+
+        Raises:
+          IndexError: if the range is not within the image.
+        '''
+        offset = ea - self.base
+        if offset < 0 or offset + size > len(self.image):
+            raise IndexError((ea, ea + size))
+        return memoryview(self.image)[offset:offset + size]
+
+    def is_defined(self, ea):
+        '''
+        Raises:
+          IndexError: if the address is not within the image.
+          ValueError: if there is no bitmap of undefined bytes.
+        '''
+        if self.bitmap is None:
+            raise ValueError('no bitmap of undefined bytes')
+        offset = ea - self.base
+        if offset < 0 or offset >= len(self.image):
+            raise IndexError(ea)
+        return not (self.bitmap[offset // 8] >> (offset % 8)) & 1
+
+
+# tables that classify bytes of the ID1 flags, for use with `bytes.translate`.
+# see `idb.idapython.FLAGS` for the definitions of these bits.
+# the second byte has FF_REF (0x1000).
+REF_TABLE = bytes(1 if b & 0x10 else 0 for b in range(0x100))
+# the third byte has FF_FLOW (0x10000).
+NOFLOW_TABLE = bytes(0 if b & 0x01 else 1 for b in range(0x100))
+# the fourth byte has MS_CODE (0xF0000000), which is exactly FF_FUNC (0x10000000) at function starts.
+# for data, these bits are the data type instead, such as FF_WORD (0x10000000), so test FF_CODE first.
+FUNC_TABLE = bytes(1 if b & 0xF0 == 0x10 else 0 for b in range(0x100))
+# the second byte has MS_CLS (0x600), which is FF_CODE (0x600) for instructions.
+CODE_TABLE = bytes(1 if b & 0x06 == 0x06 else 0 for b in range(0x100))
+# ... and FF_DATA (0x400) for data items.
+DATA_TABLE = bytes(1 if b & 0x06 == 0x04 else 0 for b in range(0x100))
+
+
+def _combine_masks(op, *masks):
+    # combine masks of 0x00/0x01 bytes with a bitwise operator, at C speed, via big integers.
+    size = len(masks[0])
+    value = int.from_bytes(masks[0], 'little')
+    for mask in masks[1:]:
+        value = op(value, int.from_bytes(mask, 'little'))
+    return value.to_bytes(size, 'little')
+
+
+class BlockBoundaries(object):
+    '''
+    the basic block leaders and terminators of the database, precomputed for all segments.
+
+    a head is a block leader when it:
+      - has a reference to it (FF_REF),
+      - is an instruction (FF_CODE) that starts a function,
+      - is an instruction that is not reached by ordinary flow from the previous instruction (not FF_FLOW),
+      - is the first head of its segment, or
+      - follows a head with a flow cref (jump or flow) from it.
+
+    a head is a block terminator when it has a flow cref from it, the next head is a leader or a data item,
+     or it is the last head of its segment.
+
+    the flag tests are done per segment with strided slices and `bytes.translate`,
+     and the xref tests are joined from the `XrefIndex`.
+    so, a block start or end lookup is a binary search, and the blocks of a range are a slice.
+
+    Example::
+
+        blocks = BlockBoundaries(db)
+        start = blocks.find_block_start(0x6890169E)
+        end = blocks.find_block_end(start)
+    '''
+    def __init__(self, db, heads=None, xrefs=None):
+        # break import cycle
+        import idb.idapython
+
+        self.idb = db
+
+        if db.wordsize == 4:
+            typecode = DD_TYPECODE
+        elif db.wordsize == 8:
+            typecode = 'Q'
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        if heads is None:
+            heads = get_head_index(db)
+        if xrefs is None:
+            xrefs = get_xref_index(db)
+
+        leaders = array.array(typecode)
+        # data items don't start blocks, but they do end the preceding block.
+        data = array.array(typecode)
+        # blocks never span segments, so the first and last heads of each segment are boundaries.
+        segment_starts = set()
+        segment_ends = set()
+        for segment in sorted(db.id1.segments, key=lambda s: s.bounds.start):
+            i = bisect.bisect_left(heads.heads, segment.bounds.end)
+            if i > 0 and heads.heads[i - 1] >= segment.bounds.start:
+                segment_ends.add(heads.heads[i - 1])
+                segment_starts.add(heads.heads[bisect.bisect_left(heads.heads, segment.bounds.start)])
+
+            flags = db.id1.get_segment_flags(segment)
+            second = bytes(flags[1::4])
+            # function starts and ordinary flow only apply to instructions.
+            code_mask = _combine_masks(lambda a, b: a & b,
+                                       second.translate(CODE_TABLE),
+                                       _combine_masks(lambda a, b: a | b,
+                                                      bytes(flags[2::4]).translate(NOFLOW_TABLE),
+                                                      bytes(flags[3::4]).translate(FUNC_TABLE)))
+            mask = _combine_masks(lambda a, b: a & b,
+                                  second.translate(HEAD_TABLE),
+                                  _combine_masks(lambda a, b: a | b,
+                                                 second.translate(REF_TABLE),
+                                                 code_mask))
+            start = segment.bounds.start
+            leaders.extend(itertools.compress(range(start, start + len(mask)), mask))
+            data.extend(itertools.compress(range(start, start + len(second)), second.translate(DATA_TABLE)))
+
+        # the sources of flow crefs: jump far, jump near, and ordinary flow.
+        table = xrefs.crefs_from
+        flow_table = bytes(1 if t in idb.idapython.idaapi.FLOW_TYPES else 0 for t in range(0x100))
+        is_flow = bytes(table.types).translate(flow_table)
+        terminators = set()
+        for i in itertools.compress(range(len(is_flow)), is_flow):
+            terminators.add(table.nodes[bisect.bisect_right(table.indptr, i) - 1])
+
+        starts = set(leaders)
+        starts.update(segment_starts)
+        for ea in terminators:
+            try:
+                starts.add(heads.next_head(ea))
+            except KeyError:
+                continue
+
+        ends = set(terminators)
+        ends.update(segment_ends)
+        for ea in itertools.chain(leaders, data):
+            i = bisect.bisect_left(heads.heads, ea)
+            if i > 0:
+                ends.add(heads.heads[i - 1])
+
+        self.starts = array.array(typecode, sorted(starts))
+        self.ends = array.array(typecode, sorted(ends))
+
+    def find_block_start(self, ea):
+        '''
+        find the first instruction of the basic block that contains the given address.
+
+        Raises:
+          KeyError: if there is no block start at or before the address.
+        '''
+        i = bisect.bisect_right(self.starts, ea) - 1
+        if i < 0:
+            raise KeyError(ea)
+        return self.starts[i]
+
+    def find_block_end(self, ea):
+        '''
+        find the final instruction of the basic block that contains the given address.
+        it may be the same as the start.
+
+        Raises:
+          KeyError: if there is no block end at or after the address.
+        '''
+        i = bisect.bisect_left(self.ends, ea)
+        if i == len(self.ends):
+            raise KeyError(ea)
+        return self.ends[i]
+
+    def get_block_starts(self, start, end):
+        '''
+        Returns:
+          array.array: the addresses of the block leaders in the given range, ordered.
+        '''
+        lo = bisect.bisect_left(self.starts, start)
+        hi = bisect.bisect_left(self.starts, end)
+        return self.starts[lo:hi]
+
+    def get_block_ends(self, start, end):
+        '''
+        Returns:
+          array.array: the addresses of the block terminators in the given range, ordered.
+        '''
+        lo = bisect.bisect_left(self.ends, start)
+        hi = bisect.bisect_left(self.ends, end)
+        return self.ends[lo:hi]
+
+
+def get_block_boundaries(db):
+    '''
+    fetch the basic block boundaries for the given database, computing them once.
+
+    Returns:
+      BlockBoundaries: the boundaries.
+    '''
+    return get_cache(db).memoize('ID1', 'blocks', lambda: BlockBoundaries(db))
+
+
+# the database opened by a worker process of `build_cfgs`, with keys `context`, `db`, and `api`.
+_cfg_worker = {}
+
+
+def _open_cfg_worker(path):
+    '''
+    open (and map) the database for `_build_flowcharts`,
+     and build the whole-program indexes that every flowchart uses,
+     so they are shared by all the shards handled by this process.
+    '''
+    context = idb.from_file(path, use_mmap=True)
+    db = context.__enter__()
+    for get_index in (get_xref_index, get_head_index, get_block_boundaries):
+        try:
+            get_index(db)
+        except KeyError:
+            # the database doesn't have the netnode for this index.
+            continue
+
+    _cfg_worker['context'] = context
+    _cfg_worker['db'] = db
+    _cfg_worker['api'] = idb.IDAPython(db)
+
+
+def _close_cfg_worker():
+    context = _cfg_worker.pop('context', None)
+    _cfg_worker.clear()
+    if context is not None:
+        context.__exit__(None, None, None)
+
+
+def _init_cfg_worker(path):
+    # initializer of the `build_cfgs` process pool: open the database once per worker, and close it on exit.
+    import multiprocessing.util
+    _open_cfg_worker(path)
+    multiprocessing.util.Finalize(None, _close_cfg_worker, exitpriority=10)
+
+
+def _build_flowcharts(fvas):
+    '''
+    build the basic blocks and edges of the given functions,
+     using the database opened by `_open_cfg_worker` in this process.
+
+    Args:
+      fvas (List[int]): the function start addresses.
+
+    Returns:
+      Tuple[List[Tuple[int, List[Tuple[int, int]], List[Tuple[int, int]]]], List[int]]:
+        for each function that was built, its start address, its blocks (start, end),
+         and its edges (source start, destination start);
+        and the start addresses of the functions that failed to build.
+    '''
+    db = _cfg_worker['db']
+    api = _cfg_worker['api']
+
+    ret = []
+    failed = []
+    for fva in fvas:
+        try:
+            # don't use `idaapi.FlowChart`, which would memoize every flowchart in this process.
+            fc = idb.idapython.FlowChart(db, api, fva)
+        except (KeyError, IndexError, ValueError) as e:
+            logger.warning('failed to build flowchart for %x: %s', fva, e)
+            failed.append(fva)
+            continue
+
+        blocks = sorted((bb.startEA, bb.endEA) for bb in fc)
+        edges = sorted((src, dst) for src, dsts in fc.succs.items() for dst in dsts)
+        ret.append((fva, blocks, edges))
+    return ret, failed
+
+
+class CFGStore(object):
+    '''
+    the control flow graphs of many functions, in compact CSR arrays.
+
+    arrays:
+      - functions: the function start addresses, ordered.
+      - func_indptr: the blocks of `functions[i]` are `func_indptr[i]:func_indptr[i + 1]`.
+      - block_starts, block_ends: the first and final instruction of each block.
+      - edge_indptr: the successors of block `j` are `edges[edge_indptr[j]:edge_indptr[j + 1]]`.
+      - edges: the successor block indices.
+
+    Example::
+
+        store = build_cfgs('kernel32.idb')
+        store.save('kernel32.cfg')
+
+        store = CFGStore.load('kernel32.cfg')
+        for start, end in store.get_blocks(0x68901695):
+            print(hex(start), hex(end))
+    '''
+    MAGIC = b'IDBCFG\x00\x01'
+    ARRAYS = ('functions', 'func_indptr', 'block_starts', 'block_ends', 'edge_indptr', 'edges')
+
+    def __init__(self):
+        self.functions = array.array('Q')
+        self.func_indptr = array.array('Q', [0])
+        self.block_starts = array.array('Q')
+        self.block_ends = array.array('Q')
+        self.edge_indptr = array.array('Q', [0])
+        self.edges = array.array('Q')
+        # the reverse of `edge_indptr` and `edges`, built on first query of predecessors.
+        self._preds = None
+
+    def _add_function(self, fva, blocks, edges):
+        # functions must be added in order.
+        self._preds = None
+        base = len(self.block_starts)
+        index = {start: base + i for i, (start, _) in enumerate(blocks)}
+
+        succs = [[] for _ in blocks]
+        for src, dst in edges:
+            succs[index[src] - base].append(index[dst])
+
+        for (start, end), dsts in zip(blocks, succs):
+            self.block_starts.append(start)
+            self.block_ends.append(end)
+            self.edges.extend(dsts)
+            self.edge_indptr.append(len(self.edges))
+
+        self.functions.append(fva)
+        self.func_indptr.append(len(self.block_starts))
+
+    def __len__(self):
+        return len(self.functions)
+
+    def __contains__(self, fva):
+        i = bisect.bisect_left(self.functions, fva)
+        return i < len(self.functions) and self.functions[i] == fva
+
+    def _get_bounds(self, fva):
+        i = bisect.bisect_left(self.functions, fva)
+        if i == len(self.functions) or self.functions[i] != fva:
+            raise KeyError(fva)
+        return self.func_indptr[i], self.func_indptr[i + 1]
+
+    def get_blocks(self, fva):
+        '''
+        Returns:
+          List[Tuple[int, int]]: the first and final instruction of each block of the function, ordered.
+
+        Raises:
+          KeyError: if the function is not in the store.
+        '''
+        lo, hi = self._get_bounds(fva)
+        return list(zip(self.block_starts[lo:hi], self.block_ends[lo:hi]))
+
+    def _find_block(self, fva, ea):
+        lo, hi = self._get_bounds(fva)
+        j = bisect.bisect_left(self.block_starts, ea, lo, hi)
+        if j == hi or self.block_starts[j] != ea:
+            raise KeyError(ea)
+        return j
+
+    def get_succs(self, fva, ea):
+        '''
+        Returns:
+          List[int]: the start addresses of the successors of the block that starts at the given address.
+
+        Raises:
+          KeyError: if the function or block is not in the store.
+        '''
+        j = self._find_block(fva, ea)
+        return [self.block_starts[k] for k in self.edges[self.edge_indptr[j]:self.edge_indptr[j + 1]]]
+
+    def get_preds(self, fva, ea):
+        '''
+        Returns:
+          List[int]: the start addresses of the predecessors of the block that starts at the given address.
+
+        Raises:
+          KeyError: if the function or block is not in the store.
+        '''
+        j = self._find_block(fva, ea)
+        pred_indptr, preds = self._get_preds()
+        return [self.block_starts[k] for k in preds[pred_indptr[j]:pred_indptr[j + 1]]]
+
+    def _get_preds(self):
+        '''
+        build the predecessor CSR arrays, by counting the edges into each block.
+
+        Returns:
+          Tuple[array.array, array.array]: the predecessors of block `j` are `preds[pred_indptr[j]:pred_indptr[j + 1]]`.
+        '''
+        if self._preds is not None:
+            return self._preds
+
+        counts = [0] * (len(self.block_starts) + 1)
+        for dst in self.edges:
+            counts[dst + 1] += 1
+        pred_indptr = array.array('Q', itertools.accumulate(counts))
+
+        preds = array.array('Q', bytes(8 * len(self.edges)))
+        fill = pred_indptr[:-1]
+        # sources are visited in order, so the predecessors of each block come out ordered.
+        for src in range(len(self.block_starts)):
+            for dst in self.edges[self.edge_indptr[src]:self.edge_indptr[src + 1]]:
+                preds[fill[dst]] = src
+                fill[dst] += 1
+
+        self._preds = (pred_indptr, preds)
+        return self._preds
+
+    def save(self, path):
+        '''
+        write the store to the given file, from which it can be loaded without rebuilding.
+        '''
+        with open(path, 'wb') as f:
+            f.write(self.MAGIC)
+            f.write(struct.pack('<' + 'Q' * len(self.ARRAYS),
+                                *[len(getattr(self, name)) for name in self.ARRAYS]))
+            for name in self.ARRAYS:
+                values = getattr(self, name)
+                if sys.byteorder != 'little':
+                    values = array.array('Q', values)
+                    values.byteswap()
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, path):
+        '''
+        read a store written by `CFGStore.save`.
+
+        Raises:
+          ValueError: if the file is not a CFG store.
+        '''
+        store = cls()
+        with open(path, 'rb') as f:
+            if f.read(len(cls.MAGIC)) != cls.MAGIC:
+                raise ValueError('not a CFG store')
+
+            countsformat = '<' + 'Q' * len(cls.ARRAYS)
+            counts = struct.unpack(countsformat, f.read(struct.calcsize(countsformat)))
+            for name, count in zip(cls.ARRAYS, counts):
+                values = array.array('Q')
+                values.fromfile(f, count)
+                if sys.byteorder != 'little':
+                    values.byteswap()
+                setattr(store, name, values)
+        return store
+
+
+def build_cfgs(path, functions=None, processes=None, shard_size=0x100):
+    '''
+    build the control flow graphs of all the functions in the database at the given path.
+    the functions are split into shards that are built in a process pool,
+     and the results are merged into a `CFGStore`.
+    each worker maps the same database file and builds its indexes once, and then reuses them for all its shards.
+
+    Example::
+
+        store, failed = build_cfgs('kernel32.idb', processes=8)
+
+    Args:
+      path (str): the path to the .idb file.
+      functions (Iterable[int]): the function start addresses. default: all functions, excluding tails.
+      processes (int): the number of worker processes. default: the number of CPUs.
+        when 1, build in this process.
+      shard_size (int): the number of functions in each unit of work.
+
+    Returns:
+      Tuple[CFGStore, List[int]]: the control flow graphs,
+        and the start addresses of the functions whose graphs could not be built, which are not in the store.
+    '''
+    if functions is None:
+        with idb.from_file(path, use_mmap=True) as db:
+            try:
+                table = get_function_table(db)
+            except KeyError:
+                # there are no functions in this database
+                functions = []
+            else:
+                functions = [table.starts[i] for i in range(len(table))
+                             if not FunctionView(table, i).is_tail()]
+    functions = sorted(set(functions))
+
+    shards = [functions[i:i + shard_size] for i in range(0, len(functions), shard_size)]
+
+    if not shards:
+        results = []
+    elif processes == 1 or len(shards) == 1:
+        _open_cfg_worker(path)
+        try:
+            results = list(map(_build_flowcharts, shards))
+        finally:
+            _close_cfg_worker()
+    else:
+        import multiprocessing
+        pool = multiprocessing.Pool(processes=processes, initializer=_init_cfg_worker, initargs=(path, ))
+        try:
+            # results come back in shard order, so the functions stay sorted.
+            results = pool.map(_build_flowcharts, shards)
+        finally:
+            pool.close()
+            pool.join()
+
+    store = CFGStore()
+    failed = []
+    for built, failures in results:
+        for fva, blocks, edges in built:
+            store._add_function(fva, blocks, edges)
+        failed.extend(failures)
+    return store, failed
+
+
+# marks a missing `default` argument, so that `None` can be provided as a default.
+_MISSING = object()
+
+
+class AltvalIndex(object):
+    '''
+    the altvals with the given tag of all address netnodes, loaded in a single scan of ID0.
+    the values of each altval index are stored in a sorted address array and a parallel value array,
+     so lookups are binary searches, and range queries are slices.
+
+    for example, the tag `A` holds the analysis flags (aflags) of each address at index 0x8,
+     and the item color plus one at index 0x14.
+
+    Example::
+
+        altvals = AltvalIndex(db, 'A')
+        aflags = altvals.get(0x68901695, 0x8)
+    '''
+    def __init__(self, db, tag):
+        self.idb = db
+        self.tag = tag
+
+        if db.wordsize == 4:
+            self._typecode = DD_TYPECODE
+            wordformat = 'I'
+            nodebase = 0xFF000000
+        elif db.wordsize == 8:
+            self._typecode = 'Q'
+            wordformat = 'Q'
+            nodebase = 0xFF00000000000000
+        else:
+            raise RuntimeError('unexpected wordsize')
+
+        # map from altval index to tuple (addresses, values).
+        self.altvals = {}
+        self._load(wordformat, nodebase)
+
+    def _load(self, wordformat, nodebase):
+        keyformat = '>' + wordformat + 'c' + wordformat
+        keysize = struct.calcsize(keyformat)
+        tag = self.tag.encode('ascii')
+
+        # keys are ordered by nodeid, so each index yields its addresses in order.
+        for key, value in self.idb.id0.iter_entries(start=b'.', end=b'/'):
+            if len(key) != 1 + keysize:
+                continue
+
+            nodeid, ktag, index = struct.unpack_from(keyformat, key, 1)
+            if ktag != tag or nodeid >= nodebase:
+                continue
+
+            v = idb.netnode.as_int(value)
+            if not isinstance(v, int):
+                continue
+
+            altvals = self.altvals.get(index)
+            if altvals is None:
+                altvals = self.altvals[index] = (array.array(self._typecode), array.array('Q'))
+            altvals[0].append(nodeid)
+            altvals[1].append(v)
+
+    def get_values(self, index):
+        '''
+        Returns:
+          Tuple[array.array, array.array]: the addresses with an altval at the given index, and the values.
+        '''
+        try:
+            return self.altvals[index]
+        except KeyError:
+            return array.array(self._typecode), array.array('Q')
+
+    def get(self, ea, index, default=_MISSING):
+        '''
+        fetch the altval of the given address.
+
+        Raises:
+          KeyError: if the address has no altval at the index, and no default is provided.
+        '''
+        addresses, values = self.get_values(index)
+        i = bisect.bisect_left(addresses, ea)
+        if i < len(addresses) and addresses[i] == ea:
+            return values[i]
+        if default is not _MISSING:
+            return default
+        raise KeyError(ea)
+
+    def get_range(self, index, start, end):
+        '''
+        Returns:
+          Tuple[array.array, array.array]: the addresses in the given range with an altval at the index, and the values.
+        '''
+        addresses, values = self.get_values(index)
+        lo = bisect.bisect_left(addresses, start)
+        hi = bisect.bisect_left(addresses, end)
+        return addresses[lo:hi], values[lo:hi]
+
+    def find_flagged(self, index, flag, start=0, end=None):
+        '''
+        find the addresses whose altval at the given index has all the bits of `flag` set.
+        for example, `find_flagged(0x8, AFLAGS.AFL_COLORED)` finds the colored items.
+
+        Returns:
+          List[int]: the addresses, ordered.
+        '''
+        addresses, values = self.get_values(index)
+        lo = bisect.bisect_left(addresses, start)
+        hi = len(addresses) if end is None else bisect.bisect_left(addresses, end)
+
+        # test one byte of each value at a time, using a lookup table over a strided slice of the raw values,
+        #  so that there's no per-value work in python.
+        buf = values[lo:hi].tobytes()
+        mask = None
+        for i in range(values.itemsize):
+            bits = (flag >> (8 * i)) & 0xFF
+            if not bits:
+                continue
+
+            offset = i if sys.byteorder == 'little' else values.itemsize - 1 - i
+            table = bytes(1 if b & bits == bits else 0 for b in range(0x100))
+            lane = buf[offset::values.itemsize].translate(table)
+            if mask is None:
+                mask = lane
+            else:
+                mask = (int.from_bytes(mask, 'little') & int.from_bytes(lane, 'little')).to_bytes(len(lane), 'little')
+
+        if mask is None:
+            # no bits requested, so everything matches.
+            return list(addresses[lo:hi])
+        return list(itertools.compress(addresses[lo:hi], mask))
+
+
+def get_altval_index(db, tag):
+    '''
+    fetch the index of the altvals with the given tag of all address netnodes, building it once.
+
+    Returns:
+      AltvalIndex: the index.
+    '''
+    return get_cache(db).memoize('$ altvals', tag, lambda: AltvalIndex(db, tag))
+
+
+def _pack_buffers(bufs):
+    '''
+    concatenate the given byte strings into a heap, with the offset of each, and a trailing sentinel.
+
+    Returns:
+      Tuple[array.array, array.array]: the heap and the offsets.
+    '''
+    offsets = array.array('Q', [0])
+    for buf in bufs:
+        offsets.append(offsets[-1] + len(buf))
+    return array.array('B', b''.join(bufs)), offsets
+
+
+def _unpack_buffers(heap, offsets):
+    '''
+    the inverse of `_pack_buffers`.
+
+    Returns:
+      List[bytes]: the byte strings.
+    '''
+    heap = heap.tobytes()
+    return [heap[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+
+# the indexes persisted to sidecar files: the cache key, the index class, and the function that builds it.
+SIDECAR_INDEXES = (
+    ('$ funcs', 'table', FunctionTable, get_function_table),
+    ('$ segs', 'table', SegmentTable, get_segment_table),
+    ('ID0', 'names', NameIndex, get_name_index),
+    ('$ xrefs', 'index', XrefIndex, get_xref_index),
+    ('ID1', 'heads', HeadIndex, get_head_index),
+)
+
+SIDECAR_MAGIC = b'IDBIDX\x00\x01'
+# magic, database file size, six section checksums, wordsize, byte order, array count.
+SIDECAR_HEADER = struct.Struct('<8sQ6IIcI')
+# array name length, then the name, then: typecode, item size, offset, item count.
+SIDECAR_ENTRY = struct.Struct('<cBQQ')
+
+
+def get_database_identity(db):
+    '''
+    compute the values that identify the contents of the given database, for validating derived data.
+
+    Returns:
+      Tuple[int, Tuple[int], int]: the file size, the section checksums from the file header, and the wordsize.
+    '''
+    return len(db.buf), tuple(db.header.checksums), db.wordsize
+
+
+def get_sidecar_path(path, cache_dir=None):
+    '''
+    compute the path of the index sidecar for the database at the given path.
+    by default, the sidecar is written next to the database.
+    in a cache directory, the sidecar name includes a hash of the database path,
+     so databases with the same name don't evict each other.
+
+    Returns:
+      str: the path to the sidecar.
+    '''
+    if cache_dir is None:
+        return path + '.idx'
+
+    digest = hashlib.md5(os.path.abspath(path).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(cache_dir, '%s.%s.idx' % (os.path.basename(path), digest))
+
+
+def save_indexes(db, path, build=True):
+    '''
+    write the indexes of the given database to a sidecar file,
+     from which `load_indexes` restores them without scanning ID0 or ID1.
+    the file is replaced atomically, so concurrent readers see either the old or the new sidecar.
+
+    Args:
+      db (idb.IDB): the database.
+      path (str): the path to the sidecar.
+      build (bool): build the indexes that are missing; otherwise, only write the indexes already in the cache.
+
+    Returns:
+      List[Tuple[str, str]]: the cache keys of the indexes written.
+    '''
+    cache = get_cache(db)
+    keys = []
+    arrays = []
+    for nodeid, field, _, get_index in SIDECAR_INDEXES:
+        if build:
+            try:
+                get_index(db)
+            except KeyError:
+                # the database doesn't have the netnode for this index.
+                continue
+
+        if (nodeid, field) not in cache:
+            continue
+
+        keys.append((nodeid, field))
+        for name, values in sorted(cache.get(nodeid, field)._get_arrays().items()):
+            arrays.append(('%s/%s/%s' % (nodeid, field, name), values))
+
+    filesize, checksums, wordsize = get_database_identity(db)
+    header = SIDECAR_HEADER.pack(SIDECAR_MAGIC, filesize, *checksums, wordsize,
+                                 b'<' if sys.byteorder == 'little' else b'>',
+                                 len(arrays))
+    entries_size = sum(2 + len(name.encode('utf-8')) + SIDECAR_ENTRY.size for name, _ in arrays)
+
+    # the arrays are stored in native byte order, each aligned to 8 bytes.
+    offset = SIDECAR_HEADER.size + entries_size
+    entries = []
+    for name, values in arrays:
+        offset = (offset + 7) & ~7
+        name = name.encode('utf-8')
+        entries.append(struct.pack('<H', len(name)) + name +
+                       SIDECAR_ENTRY.pack(values.typecode.encode('ascii'), values.itemsize, offset, len(values)))
+        offset += len(values) * values.itemsize
+
+    tmp_path = '%s.%d.tmp' % (path, os.getpid())
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        f.write(b''.join(entries))
+        for _, values in arrays:
+            f.write(b'\x00' * (-f.tell() & 7))
+            values.tofile(f)
+    os.replace(tmp_path, path)
+
+    return keys
+
+
+def load_indexes(db, path):
+    '''
+    restore the indexes of the given database from a sidecar file written by `save_indexes`,
+     and put them into the analysis cache.
+    the sidecar is mapped, and each index array is copied out of the mapping with a single memcpy.
+
+    Args:
+      db (idb.IDB): the database.
+      path (str): the path to the sidecar.
+
+    Returns:
+      List[Tuple[str, str]]: the cache keys of the indexes loaded.
+
+    Raises:
+      ValueError: if the file is not an index sidecar, is truncated,
+        or was written for a different database or platform.
+    '''
+    with open(path, 'rb') as f:
+        try:
+            m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ValueError('empty index sidecar')
+
+    buf = memoryview(m)
+    try:
+        if len(buf) < SIDECAR_HEADER.size:
+            raise ValueError('truncated index sidecar')
+
+        header = SIDECAR_HEADER.unpack_from(buf, 0)
+        if header[0] != SIDECAR_MAGIC:
+            raise ValueError('not an index sidecar')
+
+        filesize, checksums, wordsize = header[1], header[2:8], header[8]
+        if (filesize, checksums, wordsize) != get_database_identity(db):
+            raise ValueError('index sidecar is stale')
+        if header[9] != (b'<' if sys.byteorder == 'little' else b'>'):
+            raise ValueError('index sidecar has foreign byte order')
+
+        # map from (nodeid, field) to map from array name to array.
+        indexes = {}
+        offset = SIDECAR_HEADER.size
+        for _ in range(header[10]):
+            if offset + 2 > len(buf):
+                raise ValueError('truncated index sidecar')
+            namesize = struct.unpack_from('<H', buf, offset)[0]
+            offset += 2
+            if offset + namesize + SIDECAR_ENTRY.size > len(buf):
+                raise ValueError('truncated index sidecar')
+            name = bytes(buf[offset:offset + namesize]).decode('utf-8')
+            offset += namesize
+            typecode, itemsize, start, count = SIDECAR_ENTRY.unpack_from(buf, offset)
+            offset += SIDECAR_ENTRY.size
+
+            values = array.array(typecode.decode('ascii'))
+            if values.itemsize != itemsize:
+                raise ValueError('index sidecar has foreign item size')
+            end = start + count * itemsize
+            if end > len(buf):
+                raise ValueError('truncated index sidecar')
+            values.frombytes(buf[start:end])
+
+            nodeid, field, name = name.split('/', 2)
+            indexes.setdefault((nodeid, field), {})[name] = values
+    finally:
+        buf.release()
+        m.close()
+
+    cache = get_cache(db)
+    keys = []
+    for nodeid, field, cls, _ in SIDECAR_INDEXES:
+        if (nodeid, field) not in indexes:
+            continue
+        if (nodeid, field) not in cache:
+            arrays = indexes[(nodeid, field)]
+            cache.set(nodeid, field, cls._from_arrays(db, arrays),
+                      size=sum(sys.getsizeof(a) for a in arrays.values()))
+        keys.append((nodeid, field))
+    return keys
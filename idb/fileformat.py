@@ -1,9 +1,18 @@
 '''
 lots of inspiration from: https://github.com/nlitsme/pyidbutil
 '''
+import os
 import abc
+import sys
+import zlib
+import mmap
+import array
+import bisect
+import shutil
 import struct
 import logging
+import tempfile
+import concurrent.futures
 from collections import namedtuple
 
 import vstruct
@@ -89,6 +98,8 @@ class Section(vstruct.VStruct):
         vstruct.VStruct.__init__(self)
         self.header = SectionHeader()
         self.contents = v_bytes()
+        # the expected checksum of the contents, from the file header.
+        self.checksum = None
 
     def pcb_header(self):
         if self.header.is_compressed:
@@ -102,6 +113,20 @@ class Section(vstruct.VStruct):
             raise ValueError('zero size')
         return True
 
+    def compute_checksum(self, chunk_size=0x100000):
+        '''
+        compute the CRC32 of the contents, in chunks, without copying them.
+        `zlib.crc32` releases the GIL, so many sections can be checksummed in parallel threads.
+
+        Returns:
+          int: the checksum, comparable to `FileHeader.checksums`.
+        '''
+        contents = memoryview(self.contents)
+        crc = 0
+        for offset in range(0, len(contents), chunk_size):
+            crc = zlib.crc32(contents[offset:offset + chunk_size], crc)
+        return crc
+
 
 # sizeof(BranchEntryPointer)
 # sizeof(BranchEntry)
@@ -266,15 +291,33 @@ class Page(vstruct.VStruct):
         return self._entries[entry_number]
 
     def validate(self):
+        '''
+        check that the entry pointers and entries are within the page, and the entries are sorted.
+
+        Raises:
+          ValueError: if the page is malformed.
+        '''
+        if self.entry_count * SIZEOF_ENTRY > len(self.contents):
+            raise ValueError('bad page entry count')
+
+        ptr_cls = LeafEntryPointer if self.is_leaf() else BranchEntryPointer
+        for i in range(self.entry_count):
+            ptr = ptr_cls()
+            ptr.vsParse(self.contents, offset=i * SIZEOF_ENTRY)
+            if not (SIZEOF_ENTRY <= ptr.offset < len(self.contents) + SIZEOF_ENTRY):
+                raise ValueError('bad page entry offset')
+
+        try:
+            self._load_entries()
+        except struct.error:
+            raise ValueError('bad page entry')
+
         last = None
         for entry in self.get_entries():
-            if last is None:
-                continue
-
-            if last.key >= entry.key:
+            key = bytes(entry.key)
+            if last is not None and last >= key:
                 raise ValueError('bad page entry sort order')
-
-            last = entry
+            last = key
         return True
 
 
@@ -320,10 +363,11 @@ class ExactMatchStrategy(FindStrategy):
             # no matches!
             raise KeyError(key)
         else:
-            if entry_number == 0:
-                next_page_number = page.ppointer
-            elif is_largest:
+            if is_largest:
+                # check this first, since the final entry may also be the first entry.
                 next_page_number = page.get_entry(page.entry_count - 1).page
+            elif entry_number == 0:
+                next_page_number = page.ppointer
             else:
                 next_page_number = page.get_entry(entry_number - 1).page
             self._find(cursor, next_page_number, key)
@@ -740,6 +784,63 @@ class ID0(vstruct.VStruct):
         '''
         return self.find(key, strategy=PREFIX_MATCH)
 
+    def _iter_page(self, page_number, start, end):
+        page = self.get_page(page_number)
+        if page.is_leaf():
+            for entry in page.get_entries():
+                key = bytes(entry.key)
+                if start is not None and key < start:
+                    continue
+                if end is not None and key >= end:
+                    return
+                yield key, entry.value
+            return
+
+        # the subtree before each entry contains keys between the previous entry and this one.
+        lower = None
+        next_page = page.ppointer
+        for entry in page.get_entries():
+            key = bytes(entry.key)
+            if start is None or key > start:
+                # the subtree may contain keys >= start.
+                if end is None or lower is None or lower < end:
+                    for kv in self._iter_page(next_page, start, end):
+                        yield kv
+
+            if end is not None and key >= end:
+                return
+
+            if start is None or key >= start:
+                yield key, entry.value
+
+            lower = key
+            next_page = entry.page
+
+        if end is None or lower is None or lower < end:
+            for kv in self._iter_page(next_page, start, end):
+                yield kv
+
+    def iter_entries(self, start=None, end=None):
+        '''
+        generate the entries of the index in key order, optionally within a range of keys.
+        this walks the pages directly, so its much faster than repeatedly calling `Cursor.next()`,
+         and subtrees outside of the range are never loaded.
+
+        Example::
+
+            for key, value in db.id0.iter_entries(start=b'N', end=b'O'):
+                print(key)
+
+        Args:
+          start (bytes): the smallest key to generate, inclusive. default: the minimum key.
+          end (bytes): the key at which to stop, exclusive. default: the maximum key.
+
+        Yields:
+          Tuple[bytes, memoryview]: the key and value of each entry.
+        '''
+        for kv in self._iter_page(self.root_page, start, end):
+            yield kv
+
     def get_min(self):
         '''
         find the minimum entry in the index.
@@ -761,9 +862,309 @@ class ID0(vstruct.VStruct):
     def validate(self):
         if self.signature != b'B-tree v2':
             raise ValueError('bad signature')
+        if self.page_size == 0:
+            raise ValueError('bad page size')
+        if self.page_size * (self.page_count + 1) > len(self.buf):
+            raise ValueError('pages extend past the end of the section')
+        if not (1 <= self.root_page <= self.page_count):
+            raise ValueError('bad root page')
+        return True
+
+    def validate_pages(self):
+        '''
+        walk the whole b-tree, validating each page,
+         and check that each subtree only contains keys between its separating keys in the parent,
+         and that the number of entries matches the header.
+
+        Raises:
+          ValueError: if the b-tree is malformed.
+        '''
+        count = 0
+        seen = set([])
+        # stack of (page number, exclusive lower bound, exclusive upper bound).
+        pages = [(self.root_page, None, None)]
+        while pages:
+            page_number, lower, upper = pages.pop()
+            if not (1 <= page_number <= self.page_count):
+                raise ValueError('bad page number: %d' % (page_number))
+            if page_number in seen:
+                raise ValueError('page referenced twice: %d' % (page_number))
+            seen.add(page_number)
+
+            page = self.get_page(page_number)
+            page.validate()
+            count += page.entry_count
+
+            keys = [bytes(entry.key) for entry in page.get_entries()]
+            if keys and lower is not None and keys[0] <= lower:
+                raise ValueError('bad key order on page: %d' % (page_number))
+            if keys and upper is not None and keys[-1] >= upper:
+                raise ValueError('bad key order on page: %d' % (page_number))
+
+            if not page.is_leaf():
+                bounds = [lower] + keys + [upper]
+                children = [page.ppointer] + [entry.page for entry in page.get_entries()]
+                for i, child in enumerate(children):
+                    pages.append((child, bounds[i], bounds[i + 1]))
+
+        if count != self.record_count:
+            raise ValueError('bad record count')
         return True
 
 
+class FlatCursor(object):
+    '''
+    a location in a `FlatIndex`, with the same interface as `Cursor`.
+    '''
+    def __init__(self, index, entry_number):
+        self.index = index
+        self.entry_number = entry_number
+
+    def next(self):
+        '''
+        traverse to the next entry.
+
+        Raises:
+          IndexError: if the entry does not exist.
+        '''
+        if self.entry_number + 1 >= len(self.index):
+            raise IndexError()
+        self.entry_number += 1
+
+    def prev(self):
+        '''
+        traverse to the previous entry.
+
+        Raises:
+          IndexError: if the entry does not exist.
+        '''
+        if self.entry_number == 0:
+            raise IndexError()
+        self.entry_number -= 1
+
+    @property
+    def key(self):
+        return self.index.get_key(self.entry_number)
+
+    @property
+    def value(self):
+        return self.index.get_value(self.entry_number)
+
+
+class _FlatKeys(object):
+    # sequence of the keys of a `FlatIndex`, for use with `bisect`.
+    def __init__(self, index):
+        self.index = index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __getitem__(self, i):
+        return self.index.get_key(i)
+
+
+class FlatIndex(object):
+    '''
+    the entries of a b-tree index, written in key order to a flat file by `write_flat_index`.
+    the file is mapped, and lookups are binary searches over the key offsets,
+     so there are no pages to decode and no pointers to chase.
+    supports the read-only interface of `ID0`: `.find()`, `.find_prefix()`, `.iter_entries()`, etc.,
+     so it can replace the b-tree of a database via `IDB.set_id0` (or `idb.from_file(..., flat_id0=...)`).
+
+    layout (all integers are little-endian):
+
+      - header: magic, entry count, key heap size, value heap size, wordsize.
+      - key heap: the keys, concatenated in order.
+      - value heap: the values, concatenated in order.
+      - padding to 8 bytes.
+      - key offsets: uint64 offset of each key into the key heap, with a trailing sentinel.
+      - value offsets: uint64 offset of each value into the value heap, with a trailing sentinel.
+
+    Example::
+
+        write_flat_index(db.id0, 'kernel32.id0')
+        with FlatIndex('kernel32.id0') as index:
+            cursor = index.find_prefix(b'N$ ')
+            for key, value in index.iter_entries(start=b'N', end=b'O'):
+                print(key)
+    '''
+    MAGIC = b'IDBFLAT\x01'
+    HEADER = struct.Struct('<8sQQQI4x')
+
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < self.HEADER.size:
+            self._file.close()
+            raise ValueError('not a flat index')
+
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = memoryview(self._map)
+
+        magic, self.count, keys_size, values_size, self.wordsize = self.HEADER.unpack_from(self.buf, 0)
+        if magic != self.MAGIC:
+            self.close()
+            raise ValueError('not a flat index')
+
+        keys_start = self.HEADER.size
+        values_start = keys_start + keys_size
+        offsets_start = (values_start + values_size + 7) & ~7
+        offsets_size = 8 * (self.count + 1)
+        if offsets_start + 2 * offsets_size > len(self.buf):
+            self.close()
+            raise ValueError('truncated flat index')
+
+        self._keys = self.buf[keys_start:values_start]
+        self._values = self.buf[values_start:values_start + values_size]
+        self._key_offsets = self._get_offsets(offsets_start, offsets_size)
+        self._value_offsets = self._get_offsets(offsets_start + offsets_size, offsets_size)
+        self._bisect_keys = _FlatKeys(self)
+
+    def _get_offsets(self, start, size):
+        offsets = self.buf[start:start + size]
+        if sys.byteorder == 'little':
+            return offsets.cast('Q')
+        offsets = array.array('Q', offsets)
+        offsets.byteswap()
+        return offsets
+
+    def close(self):
+        for view in ('_key_offsets', '_value_offsets', '_keys', '_values', 'buf'):
+            v = getattr(self, view, None)
+            if isinstance(v, memoryview):
+                v.release()
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def get_key(self, entry_number):
+        return bytes(self._keys[self._key_offsets[entry_number]:self._key_offsets[entry_number + 1]])
+
+    def get_value(self, entry_number):
+        # copy the value, so no views of the map escape, and it can always be closed.
+        return bytes(self._values[self._value_offsets[entry_number]:self._value_offsets[entry_number + 1]])
+
+    def _bisect(self, key):
+        return bisect.bisect_left(self._bisect_keys, key)
+
+    def find(self, key, strategy=EXACT_MATCH):
+        '''
+        Args:
+          key (bytes): the index key for which to search.
+          strategy (Type[MatchStrategy]): the strategy to use to do the search, like with `ID0.find`.
+
+        Returns:
+          FlatCursor: the cursor that points to the match.
+
+        Raises:
+          KeyError: if the match failes to find a result.
+        '''
+        if strategy is MIN_KEY:
+            if not self.count:
+                raise KeyError(key)
+            return FlatCursor(self, 0)
+
+        if strategy is MAX_KEY:
+            if not self.count:
+                raise KeyError(key)
+            return FlatCursor(self, self.count - 1)
+
+        key = bytes(key)
+        if strategy is ROUND_DOWN_MATCH:
+            i = bisect.bisect_right(self._bisect_keys, key) - 1
+            if i < 0:
+                raise KeyError(key)
+            return FlatCursor(self, i)
+
+        if strategy is EXACT_MATCH:
+            is_match = key.__eq__
+        elif strategy is PREFIX_MATCH:
+            is_match = lambda found: found.startswith(key)
+        else:
+            raise ValueError('unsupported strategy')
+
+        i = self._bisect(key)
+        if i < self.count and is_match(self.get_key(i)):
+            return FlatCursor(self, i)
+        raise KeyError(key)
+
+    def find_prefix(self, key):
+        '''
+        convenience shortcut for prefix match search.
+        '''
+        return self.find(key, strategy=PREFIX_MATCH)
+
+    def iter_entries(self, start=None, end=None):
+        '''
+        generate the entries in key order, optionally within a range of keys, like `ID0.iter_entries`.
+
+        Yields:
+          Tuple[bytes, bytes]: the key and value of each entry.
+        '''
+        lo = 0 if start is None else self._bisect(start)
+        hi = self.count if end is None else self._bisect(end)
+        for i in range(lo, hi):
+            yield self.get_key(i), self.get_value(i)
+
+    def get_min(self):
+        return self.find(None, strategy=MIN_KEY)
+
+    def get_max(self):
+        return self.find(None, strategy=MAX_KEY)
+
+
+def write_flat_index(index, path):
+    '''
+    stream the entries of the given b-tree index, in key order, to a flat file readable by `FlatIndex`.
+    the keys are written directly to the file, and the values are spooled to a temporary file,
+     so only the offsets are held in memory.
+
+    Args:
+      index (ID0): the b-tree index.
+      path (str): the path to the output file.
+
+    Returns:
+      int: the number of entries written.
+    '''
+    key_offsets = array.array('Q', [0])
+    value_offsets = array.array('Q', [0])
+
+    with open(path, 'wb') as f, tempfile.TemporaryFile() as values:
+        f.write(b'\x00' * FlatIndex.HEADER.size)
+
+        for key, value in index.iter_entries():
+            f.write(key)
+            values.write(value)
+            key_offsets.append(key_offsets[-1] + len(key))
+            value_offsets.append(value_offsets[-1] + len(value))
+
+        count = len(key_offsets) - 1
+        header = FlatIndex.HEADER.pack(FlatIndex.MAGIC, count, key_offsets[-1], value_offsets[-1], index.wordsize)
+
+        values.seek(0)
+        shutil.copyfileobj(values, f)
+        f.write(b'\x00' * (-f.tell() & 7))
+
+        for offsets in (key_offsets, value_offsets):
+            if sys.byteorder != 'little':
+                offsets.byteswap()
+            offsets.tofile(f)
+
+        f.seek(0)
+        f.write(header)
+
+    return count
+
+
 class SegmentBounds(vstruct.VStruct):
     '''
     specifies the range of a segment.
@@ -822,14 +1223,18 @@ class ID1(vstruct.VStruct):
     def pcb_segment_count(self):
         # TODO: pass wordsize
         self['_segments'].vsAddElements(self.segment_count, SegmentBounds)
+        offset = 0x14 + (self.segment_count * (2 * self.wordsize))
+        padsize = ID1.PAGE_SIZE - offset
+        self['padding'].vsSetLength(padsize)
+
+    def pcb__segments(self):
+        # the flags of each segment are stored back-to-back, in order, at the start of the buffer.
+        # this must be computed once the bounds are parsed, not when they are allocated.
         offset = 0
         for i in range(self.segment_count):
             segment = self._segments[i]
-            offset += 4 * (segment.end - segment.start)
             self.segments.append(ID1.SegmentDescriptor(segment, offset))
-        offset = 0x14 + (self.segment_count * (2 * self.wordsize))
-        padsize = ID1.PAGE_SIZE - offset
-        self['padding'].vsSetLength(padsize)
+            offset += 4 * (segment.end - segment.start)
 
     def pcb_page_count(self):
         self['buffer'].vsSetLength(ID1.PAGE_SIZE * self.page_count)
@@ -894,6 +1299,22 @@ class ID1(vstruct.VStruct):
         offset = seg.offset + 4 * (ea - seg.bounds.start)
         return struct.unpack_from('<I', self.buffer, offset)[0]
 
+    def get_segment_flags(self, segment):
+        '''
+        fetch the raw flags of the given segment, without copying.
+
+        the flags are little-endian 32-bit words, one per address,
+         so the low byte of the flags of each address is `buf[0::4]`, the next byte is `buf[1::4]`, etc.
+
+        Arguments:
+          segment (SegmentDescriptor): the segment.
+
+        Returns:
+          memoryview: the flags of the segment.
+        '''
+        size = segment.bounds.end - segment.bounds.start
+        return memoryview(self.buffer)[segment.offset:segment.offset + 4 * size]
+
     def validate(self):
         if self.signature != b'VA*\x00':
             raise ValueError('bad signature')
@@ -904,6 +1325,8 @@ class ID1(vstruct.VStruct):
         for segment in self.segments:
             if segment.bounds.start > segment.bounds.end:
                 raise ValueError('segment ends before it starts')
+            if segment.offset + 4 * (segment.bounds.end - segment.bounds.start) > len(self.buffer):
+                raise ValueError('segment flags extend past the end of the section')
         return True
 
 
@@ -1025,15 +1448,20 @@ class IDB(vstruct.VStruct):
         else:
             raise RuntimeError('unexpected file signature: %s' % (self.header.signature))
 
-        # TODO: pass along checksum
-        for offset in self.header.offsets:
+        for offset, checksum in zip(self.header.offsets, self.header.checksums):
             if offset == 0:
                 self.sections.append(None)
                 continue
 
             sectionbuf = self.buf[offset:]
             section = Section()
-            section.vsParse(sectionbuf)
+            try:
+                section.vsParse(sectionbuf)
+            except struct.error:
+                raise ValueError('truncated section header at offset 0x%x' % (offset))
+            if len(section.contents) != section.header.length:
+                raise ValueError('truncated section at offset 0x%x' % (offset))
+            section.checksum = checksum
             self.sections.append(section)
 
         for i, sectiondef in enumerate(SECTIONS):
@@ -1058,6 +1486,15 @@ class IDB(vstruct.VStruct):
             object.__setattr__(self, sectiondef.name, s)
             logger.debug('parsed section: %s', sectiondef.name)
 
+    def set_id0(self, index):
+        '''
+        replace the ID0 b-tree with another index that has the same interface, such as a `FlatIndex`.
+        netnodes and analyses of the database then read from the given index.
+        do this before analyzing the database, since cached results are not invalidated.
+        '''
+        # vivisect doesn't allow assigning to attributes that are not part of the struct.
+        object.__setattr__(self, 'id0', index)
+
     def validate(self):
         self.header.validate()
         self.id0.validate()
@@ -1065,3 +1502,47 @@ class IDB(vstruct.VStruct):
         self.nam.validate()
         self.til.validate()
         return True
+
+    def verify_checksums(self, threads=None, chunk_size=0x100000):
+        '''
+        check the contents of each section against its checksum in the file header.
+        the sections are checksummed concurrently, over the underlying buffer.
+
+        Args:
+          threads (int): the number of threads to use. default: one per section.
+          chunk_size (int): the number of bytes checksummed at once.
+
+        Raises:
+          ValueError: if a section doesn't match its checksum.
+        '''
+        sections = [(sectiondef.name, section) for sectiondef, section in zip(SECTIONS, self.sections)
+                    if section is not None]
+        if not sections:
+            return True
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads or len(sections)) as pool:
+            checksums = pool.map(lambda s: s[1].compute_checksum(chunk_size=chunk_size), sections)
+            for (name, section), checksum in zip(sections, checksums):
+                if checksum != section.checksum:
+                    raise ValueError('bad checksum: %s (expected 0x%x, found 0x%x)' % (name, section.checksum, checksum))
+        return True
+
+    def verify(self, pages=True, checksums=True, threads=None):
+        '''
+        check the integrity of the database, such as before analyzing an untrusted upload.
+        the cheap structural checks run first, so most corrupt files are rejected before the checksums are computed.
+
+        Args:
+          pages (bool): walk and validate all the pages of the ID0 b-tree.
+          checksums (bool): check the sections against the checksums in the file header.
+          threads (int): the number of threads used to compute checksums.
+
+        Raises:
+          ValueError: if the database is corrupt.
+        '''
+        self.validate()
+        if pages:
+            self.id0.validate_pages()
+        if checksums:
+            self.verify_checksums(threads=threads)
+        return True
@@ -348,7 +348,6 @@ class idc:
     def __init__(self, db, api):
         self.idb = db
         self.api = api
-        self.dis = None  # this will be the capstone disassembler, lazily loaded.
 
         # apparently this enum changes with bitness.
         # this is annoying.
@@ -364,35 +363,35 @@ class idc:
         # via: https://github.com/zachriggle/idapython/blob/37d2fd13b31fec8e6e53fbb9704fa3cd0cbd5b07/python/idc.py#L4149
         if self.idb.wordsize == 4:
             # function start address
-            FUNCATTR_START = 0
+            self.FUNCATTR_START = 0
             # function end address
-            FUNCATTR_END = 4
+            self.FUNCATTR_END = 4
             # function flags
-            FUNCATTR_FLAGS = 8
+            self.FUNCATTR_FLAGS = 8
             # function frame id
-            FUNCATTR_FRAME = 10
+            self.FUNCATTR_FRAME = 10
             # size of local variables
-            FUNCATTR_FRSIZE = 14
+            self.FUNCATTR_FRSIZE = 14
             # size of saved registers area
-            FUNCATTR_FRREGS = 18
+            self.FUNCATTR_FRREGS = 18
             # number of bytes purged from the stack
-            FUNCATTR_ARGSIZE = 20
+            self.FUNCATTR_ARGSIZE = 20
             # frame pointer delta
-            FUNCATTR_FPD = 24
+            self.FUNCATTR_FPD = 24
             # function color code
-            FUNCATTR_COLOR = 28
+            self.FUNCATTR_COLOR = 28
         elif self.idb.wordsize == 8:
-            FUNCATTR_START   = 0
-            FUNCATTR_END     = 8
-            FUNCATTR_FLAGS   = 16
-            FUNCATTR_FRAME   = 18
-            FUNCATTR_FRSIZE  = 26
-            FUNCATTR_FRREGS  = 34
-            FUNCATTR_ARGSIZE = 36
-            FUNCATTR_FPD     = 44
-            FUNCATTR_COLOR   = 52
-            FUNCATTR_OWNER   = 18
-            FUNCATTR_REFQTY  = 26
+            self.FUNCATTR_START   = 0
+            self.FUNCATTR_END     = 8
+            self.FUNCATTR_FLAGS   = 16
+            self.FUNCATTR_FRAME   = 18
+            self.FUNCATTR_FRSIZE  = 26
+            self.FUNCATTR_FRREGS  = 34
+            self.FUNCATTR_ARGSIZE = 36
+            self.FUNCATTR_FPD     = 44
+            self.FUNCATTR_COLOR   = 52
+            self.FUNCATTR_OWNER   = 18
+            self.FUNCATTR_REFQTY  = 26
         else:
             raise RuntimeError('unexpected wordsize')
 
@@ -400,36 +399,46 @@ class idc:
         return self.api.ScreenEA
 
     def SegStart(self, ea):
-        segs = idb.analysis.Segments(self.idb).segments
-        for seg in segs.values():
-            if seg.startEA <= ea < seg.endEA:
-                return seg.startEA
+        try:
+            return self.api.registry.get_segment_table().get(ea).startEA
+        except KeyError:
+            return None
 
     def SegEnd(self, ea):
-        segs = idb.analysis.Segments(self.idb).segments
-        for seg in segs.values():
-            if seg.startEA <= ea < seg.endEA:
-                return seg.endEA
+        try:
+            return self.api.registry.get_segment_table().get(ea).endEA
+        except KeyError:
+            return None
 
     def FirstSeg(self):
-        segs = idb.analysis.Segments(self.idb).segments
-        for startEA in sorted(segs.keys()):
-            return startEA
+        for seg in self.api.registry.get_segment_table():
+            return seg.startEA
 
     def NextSeg(self, ea):
-        segs = idb.analysis.Segments(self.idb).segments.values()
-        segs = sorted(segs, key=lambda s: s.startEA)
+        '''
+        Returns:
+          int: the start of the segment after the one containing the address,
+            or None if the address is not within a segment.
+
+        Raises:
+          IndexError: if the address is within the last segment.
+        '''
+        segs = self.api.registry.get_segment_table()
+        try:
+            segs.get(ea)
+        except KeyError:
+            return None
 
-        for i, seg in enumerate(segs):
-            if seg.startEA <= ea < seg.endEA:
-                return segs[i + 1].startEA
+        try:
+            return segs.get_next(ea).startEA
+        except KeyError:
+            raise IndexError(ea)
 
     def SegName(self, ea):
-        segstrings = idb.analysis.SegStrings(self.idb).strings
-        segs = idb.analysis.Segments(self.idb).segments
-        for seg in segs.values():
-            if seg.startEA <= ea < seg.endEA:
-                return segstrings[seg.name_index]
+        try:
+            return self.api.registry.get_segment_table().get_name(ea)
+        except KeyError:
+            return None
 
     def GetFlags(self, ea):
         return self.idb.id1.get_flags(ea)
@@ -442,40 +451,33 @@ class idc:
             raise KeyError(ea)
 
     def Head(self, ea):
-        flags = self.GetFlags(ea)
-        while not self.api.ida_bytes.isHead(flags):
-            ea -= 1
-            # TODO: handle Index/KeyError here when we overrun a segment
-            flags = self.GetFlags(ea)
-        return ea
+        '''
+        Raises:
+          KeyError: if the address is not within a segment, or no item contains it.
+        '''
+        return self.api.registry.get_head_index().get_head(ea)
 
     def ItemSize(self, ea):
-        oea = ea
-        flags = self.GetFlags(ea)
-        if not self.api.ida_bytes.isHead(flags):
-            raise ValueError('ItemSize must only be called on a head address.')
-
-        ea += 1
-        flags = self.GetFlags(ea)
-        while not self.api.ida_bytes.isHead(flags):
-            ea += 1
-            # TODO: handle Index/KeyError here when we overrun a segment
-            flags = self.GetFlags(ea)
-        return ea - oea
+        '''
+        Raises:
+          ValueError: if the address is not a head.
+          KeyError: if the address is not within a segment.
+        '''
+        return self.api.registry.get_head_index().get_item_size(ea)
 
     def NextHead(self, ea):
-        ea += 1
-        flags = self.GetFlags(ea)
-        while not self.api.ida_bytes.isHead(flags):
-            ea += 1
-            # TODO: handle Index/KeyError here when we overrun a segment
-            flags = self.GetFlags(ea)
-        return ea
+        '''
+        Raises:
+          KeyError: if there are no more heads.
+        '''
+        return self.api.registry.get_head_index().next_head(ea)
 
     def PrevHead(self, ea):
-        ea = self.Head(ea)
-        ea -= 1
-        return self.Head(ea)
+        '''
+        Raises:
+          KeyError: if there is no earlier head.
+        '''
+        return self.api.registry.get_head_index().prev_head(ea)
 
     def GetManyBytes(self, ea, size, use_dbg=False):
         '''
@@ -486,40 +488,30 @@ class idc:
         if use_dbg:
             raise NotImplementedError()
 
-        if self.SegStart(ea) != self.SegStart(ea + size):
-            raise IndexError((ea, ea+size))
+        return self.api.registry.get_byte_view().get_bytes(ea, size).tobytes()
 
-        ret = []
-        for i in range(ea, ea + size):
-            ret.append(self.IdbByte(i))
-        return bytes(ret)
-
-    def _load_dis(self):
-        if self.dis is not None:
-            return
+    def _disassemble(self, ea):
+        return self.api.registry.get_disassembler().get_insn(ea)
 
-        import capstone
-        # WARNING:
-        # TODO: this is hardcoded to 32bit x86! where is the arch stored in the idb?
-        self.dis = capstone.Cs(capstone.CS_ARCH_X86, capstone.CS_MODE_32)
-        # required to fetch operand values
-        self.dis.detail = True
+    def GetMnem(self, ea):
+        return self.api.registry.get_disassembler().get_lite_insn(ea).mnemonic
 
-    def _disassemble(self, ea):
-        size = self.ItemSize(ea)
-        buf = self.GetManyBytes(ea, size)
-        self._load_dis()
+    def GetOpnd(self, ea, n):
+        '''
+        fetch the text of the given operand of the instruction at the given address.
 
-        try:
-            op = next(self.dis.disasm(buf, ea))
-        except StopIteration:
-            raise RuntimeError('failed to disassemble %s' % (hex(ea)))
-        else:
-            return op
+        Returns:
+          str: the operand text, or the empty string if the instruction has no such operand.
+        '''
+        insn = self._disassemble(ea)
+        if n >= len(insn.operands):
+            return ''
 
-    def GetMnem(self, ea):
-        op = self._disassemble(ea)
-        return op.mnemonic
+        # capstone may also list operands that are not printed, such as the implicit count of `rcl`.
+        operands = _split_operands(insn.op_str)
+        if n >= len(operands):
+            return ''
+        return operands[n]
 
     # one instruction or data
     CIC_ITEM = 1
@@ -548,9 +540,9 @@ class idc:
         if not self.api.ida_nalt.is_colored_item(ea):
             return idc.DEFCOLOR
 
-        nn = self.api.ida_netnode.netnode(ea)
         try:
-            return nn.altval(tag='A', index=0x14) - 1
+            # the color is stored plus one.
+            return self.api.registry.get_altval_index('A').get(ea, 0x14) - 1
         except KeyError:
             return idc.DEFCOLOR
 
@@ -582,12 +574,37 @@ class idc:
         else:
             raise ValueError('unknown attr: %x' % (attr))
 
+    def GetSpd(self, ea):
+        '''
+        get the difference between the initial and current values of the stack pointer at the given address.
+        '''
+        func = self.api.ida_funcs.get_func(ea)
+        return idb.analysis.Function(self.idb, func.startEA).get_spd(ea)
+
+    def GetSpDiff(self, ea):
+        '''
+        get the modification of the stack pointer made by the instruction at the given address.
+        '''
+        func = self.api.ida_funcs.get_func(ea)
+        # the change point is recorded at the address after the instruction,
+        #  which is `func.endEA` for the last instruction, so don't resolve the function from it.
+        return idb.analysis.Function(self.idb, func.startEA).get_sp_delta(ea + self.ItemSize(ea))
+
     def GetFunctionName(self, ea):
         nn = self.api.ida_netnode.netnode(ea)
         return nn.name()
 
+    def LocByName(self, name):
+        '''
+        resolve the given global name to its address.
+
+        Raises:
+          KeyError: if the name does not exist.
+        '''
+        return self.api.registry.get_name_index().get(name)
+
     def GetInputMD5(self):
-        return idb.analysis.Root(self.idb).md5
+        return self.api.registry.root.md5
 
     @staticmethod
     def hasValue(flags):
@@ -844,12 +861,24 @@ class ida_nalt:
         self.idb = db
         self.api = api
 
+    # the altval index of the analysis flags of an address, under tag `A`.
+    AFLAGS_INDEX = 0x8
+
     def get_aflags(self, ea):
-        nn = self.api.ida_netnode.netnode(ea)
-        try:
-            return nn.altval(tag='A', index=0x8)
-        except KeyError:
-            return 0
+        return self.api.registry.get_altval_index('A').get(ea, self.AFLAGS_INDEX, default=0)
+
+    def find_aflags(self, flag, start=0, end=None):
+        '''
+        find the addresses in the given range whose analysis flags have all the bits of `flag` set.
+
+        Example::
+
+            colored = api.ida_nalt.find_aflags(AFLAGS.AFL_COLORED)
+
+        Returns:
+          List[int]: the addresses, ordered.
+        '''
+        return self.api.registry.get_altval_index('A').find_flagged(self.AFLAGS_INDEX, flag, start=start, end=end)
 
     def is_hidden_item(self, ea):
         return is_flag_set(self.get_aflags(ea), AFLAGS.AFL_HIDDEN)
@@ -974,35 +1003,23 @@ class ida_funcs:
 
     def get_func(self, ea):
         '''
-        get the func_t associated with the given address.
+        get the function associated with the given address.
         if the address is not the start of a function (or function tail), then searches
          for a function that contains the given address.
-        note: the range search is pretty slow, since we parse everything on-demand.
-        '''
-        nn = self.api.ida_netnode.netnode('$ funcs')
-        try:
-            v = nn.supval(tag='S', index=ea)
-        except KeyError:
-            # search for the given effective address in the function regions.
-            # according to [1], `get_func` only searches the primary region, and not all chunks?
-            #
-            # [1]: http://www.openrce.org/reference_library/ida_sdk_lookup/get_func
-            for func in idb.analysis.Functions(self.idb).functions.values():
-                if not (func.startEA <= ea < func.endEA):
-                    continue
-
-                if is_flag_set(func.flags, self.FUNC_TAIL):
-                    return self.get_func(func.owner)
-                else:
-                    return func
+        function tails resolve to their owning function.
 
-            raise KeyError(ea)
-        else:
-            func = idb.analysis.func_t(v)
-            if is_flag_set(func.flags, self.FUNC_TAIL):
-                return self.get_func(func.owner)
-            else:
-                return func
+        according to [1], `get_func` only searches the primary region, and not all chunks?
+        however, since tail chunks are also described by `$ funcs`, we find them, too.
+
+        [1]: http://www.openrce.org/reference_library/ida_sdk_lookup/get_func
+
+        Returns:
+          idb.analysis.FunctionView: the function, with the same attributes as `func_t`.
+
+        Raises:
+          KeyError: if the address is not within a function.
+        '''
+        return self.api.registry.get_function_table().get_func(ea)
 
 
 class BasicBlock(object):
@@ -1030,6 +1047,84 @@ class BasicBlock(object):
         return 'BasicBlock(startEA: 0x%x, endEA: 0x%x)' % (self.startEA, self.endEA)
 
 
+class FlowChart(object):
+    '''
+    the control flow graph of a function, as returned by `idaapi.FlowChart`.
+
+    i have no idea how this data is indexed in the idb.
+    is it even indexed?
+    therefore, let's parse the basic blocks ourselves!
+    blocks are explored with a worklist, from the function start through flow predecessors and successors.
+    '''
+    def __init__(self, db, api, ea):
+        self.idb = db
+        logger.debug('creating flowchart for %x', ea)
+
+        # set of startEA
+        seen = set([])
+
+        # map from startEA to BasicBlock instance
+        bbs_by_start = {}
+        # map from endEA to BasicBlock instance
+        bbs_by_end = {}
+
+        # map from startEA to set of startEA
+        preds = collections.defaultdict(set)
+        # map from startEA to set of startEA
+        succs = collections.defaultdict(set)
+
+        endEA = api.idaapi._find_bb_end(ea)
+        logger.debug('found end. %x -> %x', ea, endEA)
+        block = BasicBlock(self, ea, endEA)
+        bbs_by_start[ea] = block
+        bbs_by_end[endEA] = block
+
+        q = collections.deque([block])
+
+        while q:
+            block = q.popleft()
+
+            if block.startEA in seen:
+                continue
+            seen.add(block.startEA)
+
+            logger.debug('exploring %s', block)
+
+            for xref in api.idaapi._get_flow_preds(block.startEA):
+                pred = bbs_by_end.get(xref.src)
+                if pred is None:
+                    pred_start = api.idaapi._find_bb_start(xref.src)
+                    pred = BasicBlock(self, pred_start, xref.src)
+                    bbs_by_start[pred.startEA] = pred
+                    bbs_by_end[pred.endEA] = pred
+
+                preds[block.startEA].add(pred.startEA)
+                succs[pred.startEA].add(block.startEA)
+                if pred.startEA not in seen:
+                    q.append(pred)
+
+            for xref in api.idaapi._get_flow_succs(block.endEA):
+                succ = bbs_by_start.get(xref.dst)
+                if succ is None:
+                    succ_end = api.idaapi._find_bb_end(xref.dst)
+                    succ = BasicBlock(self, xref.dst, succ_end)
+                    bbs_by_start[succ.startEA] = succ
+                    bbs_by_end[succ.endEA] = succ
+
+                succs[block.startEA].add(succ.startEA)
+                preds[succ.startEA].add(block.startEA)
+                if succ.startEA not in seen:
+                    q.append(succ)
+
+        self.preds = preds
+        self.succs = succs
+        self.bbs = bbs_by_start
+
+    def __iter__(self):
+        for bb in self.bbs.values():
+            yield bb
+
+
 def is_empty(s):
     for c in s:
         return False
@@ -1055,6 +1150,9 @@ class idaapi:
     fl_USobsolete = 0x14
     # Ordinary flow: used to specify execution flow to the next instruction.
     fl_F = 0x15
+
+    # the code xref types that are control flow within a function, not calls.
+    FLOW_TYPES = (fl_JN, fl_JF, fl_F)
     # unknown – for compatibility with old versions.
     # Should not be used anymore.
     dr_U = 0
@@ -1084,27 +1182,7 @@ class idaapi:
         Returns:
           int: the address of the final instruction in the basic block. it may be the same as the start.
         '''
-        if not is_empty(idb.analysis.get_crefs_from(self.idb, ea,
-                                                    types=[idaapi.fl_JN, idaapi.fl_JF, idaapi.fl_F])):
-            return ea
-
-        while True:
-            last_ea = ea
-            ea = self.api.idc.NextHead(ea)
-
-            flags = self.api.idc.GetFlags(ea)
-            if self.api.ida_bytes.hasRef(flags):
-                return last_ea
-
-            if self.api.ida_bytes.isFunc(flags):
-                return last_ea
-
-            if not self.api.ida_bytes.isFlow(flags):
-                return last_ea
-
-            if not is_empty(idb.analysis.get_crefs_from(self.idb, ea,
-                                                        types=[idaapi.fl_JN, idaapi.fl_JF, idaapi.fl_F])):
-                return ea
+        return self.api.registry.get_block_boundaries().find_block_end(ea)
 
     def _find_bb_start(self, ea):
         '''
@@ -1114,23 +1192,7 @@ class idaapi:
         Returns:
           int: the address of the first instruction in the basic block. it may be the same as the end.
         '''
-        while True:
-            flags = self.api.idc.GetFlags(ea)
-            if self.api.ida_bytes.hasRef(flags):
-                return ea
-
-            if self.api.ida_bytes.isFunc(flags):
-                return ea
-
-            last_ea = ea
-            ea = self.api.idc.PrevHead(ea)
-
-            if not is_empty(idb.analysis.get_crefs_from(self.idb, ea,
-                                                        types=[idaapi.fl_JN, idaapi.fl_JF, idaapi.fl_F])):
-                return last_ea
-
-            if not self.api.ida_bytes.isFlow(flags):
-                return last_ea
+        return self.api.registry.get_block_boundaries().find_block_start(ea)
 
     def _get_flow_preds(self, ea):
         # this is basically CodeRefsTo with flow=True.
@@ -1143,8 +1205,7 @@ class idaapi:
 
         # get all the flow xrefs to this instruction.
         # a flow xref is like a fallthrough or jump, not like a call.
-        for xref in idb.analysis.get_crefs_to(self.idb, ea,
-                                              types=[idaapi.fl_JN, idaapi.fl_JF, idaapi.fl_F]):
+        for xref in self.api.registry.get_xref_index().get_crefs_to(ea, types=idaapi.FLOW_TYPES):
             yield xref
 
     def _get_flow_succs(self, ea):
@@ -1159,8 +1220,7 @@ class idaapi:
 
         # get all the flow xrefs from this instruction.
         # a flow xref is like a fallthrough or jump, not like a call.
-        for xref in idb.analysis.get_crefs_from(self.idb, ea,
-                                                types=[idaapi.fl_JN, idaapi.fl_JF, idaapi.fl_F]):
+        for xref in self.api.registry.get_xref_index().get_crefs_from(ea, types=idaapi.FLOW_TYPES):
             yield xref
 
     def FlowChart(self, func):
@@ -1182,136 +1242,415 @@ class idaapi:
         via: https://github.com/EiNSTeiN-/idapython/blob/master/examples/ex_gdl_qflow_chart.py
         '''
 
-        # i have no idea how this data is indexed in the idb.
-        # is it even indexed?
-        # therefore, let's parse the basic blocks ourselves!
+        # flowcharts are derived entirely from the database, so they're built once per function.
+        return self.api.registry.get(func.startEA, 'flowchart',
+                                     lambda: FlowChart(self.idb, self.api, func.startEA))
+
+    def get_next_fixup_ea(self, ea):
+        return self.api.registry.get_fixup_index().next_fixup(ea)
+
+    def get_prev_fixup_ea(self, ea):
+        return self.api.registry.get_fixup_index().prev_fixup(ea)
+
+    def contains_fixups(self, ea, size):
+        return self.api.registry.get_fixup_index().contains_fixups(ea, size)
+
+    def getseg(self, ea):
+        try:
+            return self.api.registry.get_segment_table().get(ea)
+        except KeyError:
+            return None
+
+
+class idautils:
+    def __init__(self, db, api):
+        self.idb = db
+        self.api = api
+
+    def GetInputFileMD5(self):
+        return self.api.idc.GetInputMD5()
 
-        class _FlowChart:
-            def __init__(self, db, api, ea):
-                self.idb = db
-                logger.debug('creating flowchart for %x', ea)
+    def Segments(self):
+        return [seg.startEA for seg in self.api.registry.get_segments()]
 
-                # set of startEA
-                seen = set([])
+    def Functions(self):
+        return list(self.api.registry.get_function_starts())
 
-                # map from startEA to BasicBlock instance
-                bbs_by_start = {}
-                # map from endEA to BasicBlock instance
-                bbs_by_end = {}
 
-                # map from startEA to set of startEA
-                preds = collections.defaultdict(lambda: set([]))
-                # map from startEA to set of startEA
-                succs = collections.defaultdict(lambda: set([]))
+def _split_operands(op_str):
+    '''
+    split the operand text of an instruction into the text of each operand.
+    commas within brackets or braces, such as in `[r0, #4]` or `{r4, lr}`, don't separate operands.
 
-                endEA = api.idaapi._find_bb_end(ea)
-                logger.debug('found end. %x -> %x', ea, endEA)
-                block = BasicBlock(self, ea, endEA)
-                bbs_by_start[ea] = block
-                bbs_by_end[endEA] = block
+    Returns:
+      List[str]: the operands.
+    '''
+    if not op_str:
+        return []
 
-                q = [block]
+    operands = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(op_str):
+        if c in '[{(':
+            depth += 1
+        elif c in ']})':
+            depth -= 1
+        elif c == ',' and depth == 0:
+            operands.append(op_str[start:i].strip())
+            start = i + 1
+    operands.append(op_str[start:].strip())
+    return operands
 
-                while q:
-                    logger.debug('iteration')
-                    logger.debug('queue: [%s]', ', '.join(map(str, q)))
 
-                    block = q[0]
-                    q = q[1:]
+# the fields of a disassembled instruction without operand details, as produced by `capstone.Cs.disasm_lite`.
+LiteInsn = collections.namedtuple('LiteInsn', ['address', 'size', 'mnemonic', 'op_str'])
 
-                    logger.debug('exploring %s', block)
 
-                    if block.startEA in seen:
-                        logger.debug('already seen!')
-                        continue
-                    logger.debug('new!')
-                    seen.add(block.startEA)
+class LRUCache(object):
+    '''
+    a dictionary that holds at most `maxsize` entries, evicting the least recently used.
+    '''
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._values = collections.OrderedDict()
 
-                    for xref in api.idaapi._get_flow_preds(block.startEA):
-                        if xref.src not in bbs_by_end:
-                            pred_start = api.idaapi._find_bb_start(xref.src)
-                            pred = BasicBlock(self, pred_start, xref.src)
-                            bbs_by_start[pred.startEA] = pred
-                            bbs_by_end[pred.endEA] = pred
-                        else:
-                            pred = bbs_by_end[xref.src]
+    def __len__(self):
+        return len(self._values)
 
-                        logger.debug('pred: %s', pred)
+    def __contains__(self, key):
+        return key in self._values
 
-                        preds[block.startEA].add(pred.startEA)
-                        succs[pred.startEA].add(block.startEA)
-                        q.append(pred)
+    def get(self, key):
+        '''
+        Raises:
+          KeyError: if the key is not cached.
+        '''
+        v = self._values[key]
+        self._values.move_to_end(key)
+        return v
 
-                    for xref in api.idaapi._get_flow_succs(block.endEA):
-                        if xref.dst not in bbs_by_start:
-                            succ_end = api.idaapi._find_bb_end(xref.dst)
-                            succ = BasicBlock(self, xref.dst, succ_end)
-                            bbs_by_start[succ.startEA] = succ
-                            bbs_by_end[succ.endEA] = succ
-                        else:
-                            succ = bbs_by_start[xref.dst]
+    def set(self, key, value):
+        self._values[key] = value
+        self._values.move_to_end(key)
+        if len(self._values) > self.maxsize:
+            self._values.popitem(last=False)
 
-                        logger.debug('succ: %s', succ)
 
-                        succs[block.startEA].add(succ.startEA)
-                        preds[succ.startEA].add(block.startEA)
-                        q.append(succ)
+class Disassembler(object):
+    '''
+    disassembles instructions in batches, caching the results by address.
+    on a miss, the whole function chunk containing the address is swept in a single capstone pass
+     over a slice of the loaded bytes, so subsequent queries within the function are cache hits.
 
-                self.preds = preds
-                self.succs = succs
-                self.bbs = bbs_by_start
+    there are two paths:
+      - `get_insn` fetches capstone instructions with operand details, and
+      - `get_lite_insn` uses `disasm_lite`, which is much cheaper and sufficient for mnemonics.
 
-            def __iter__(self):
-                for bb in self.bbs.values():
-                    yield bb
+    the capstone mode is chosen from the processor and bitness of the database.
+    only x86 (`metapc`) databases are supported.
 
-        return _FlowChart(self.idb, self.api, func.startEA)
+    Example::
 
-    def get_next_fixup_ea(self, ea):
-        nn = self.api.ida_netnode.netnode('$ fixups')
-        # TODO: this is really bad algorithmically. we should cache.
-        for index in nn.sups(tag='S'):
-            if ea <= index:
-                return index
-        raise KeyError(ea)
+        dis = Disassembler(db)
+        print(dis.get_lite_insn(0x68901695).mnemonic)
+    '''
+    def __init__(self, db, maxsize=0x10000):
+        self.idb = db
+        self._dis = None
+        self._lite_dis = None
+        self.insns = LRUCache(maxsize)
+        self.lite_insns = LRUCache(maxsize)
 
-    def contains_fixups(self, ea, size):
+    def _load_dis(self, detail):
+        if detail and self._dis is not None:
+            return self._dis
+        if not detail and self._lite_dis is not None:
+            return self._lite_dis
+
+        import capstone
+        procname, bitness = idb.analysis.get_processor(self.idb)
+        if procname != 'metapc':
+            raise NotImplementedError('unsupported processor: %s' % (procname))
+        modes = {
+            16: capstone.CS_MODE_16,
+            32: capstone.CS_MODE_32,
+            64: capstone.CS_MODE_64,
+        }
+        dis = capstone.Cs(capstone.CS_ARCH_X86, modes[bitness])
+        if detail:
+            # required to fetch operand values
+            dis.detail = True
+            self._dis = dis
+        else:
+            self._lite_dis = dis
+        return dis
+
+    def _get_sweep_range(self, ea):
+        # prefer the function chunk, then fall back to the item.
         try:
-            next_fixup = self.get_next_fixup_ea(ea)
+            functions = idb.analysis.get_function_table(self.idb)
+            i = functions.find_containing(ea)
         except KeyError:
-            return False
+            heads = idb.analysis.get_head_index(self.idb)
+            return ea, ea + heads.get_item_size(ea)
         else:
-            if next_fixup < ea + size:
-                return True
+            return functions.starts[i], functions.ends[i]
+
+    def sweep(self, start, end, detail=True):
+        '''
+        disassemble the given range in a single pass, and cache the instructions.
+        the sweep is clipped to the segment, and resumes at the next head if capstone stops early.
+
+        Returns:
+          int: the number of instructions disassembled.
+        '''
+        seg_start, buf, _ = idb.analysis.get_byte_view(self.idb).get_segment_bytes(start)
+        end = min(end, seg_start + len(buf))
+        heads = idb.analysis.get_head_index(self.idb)
+        dis = self._load_dis(detail)
+        cache = self.insns if detail else self.lite_insns
+        mv = memoryview(buf)
+
+        count = 0
+        ea = start
+        while ea < end:
+            code = mv[ea - seg_start:end - seg_start]
+            if detail:
+                for insn in dis.disasm(code, ea):
+                    cache.set(insn.address, insn)
+                    ea = insn.address + insn.size
+                    count += 1
             else:
-                return False
+                for insn in dis.disasm_lite(code, ea):
+                    insn = LiteInsn(*insn)
+                    cache.set(insn.address, insn)
+                    ea = insn.address + insn.size
+                    count += 1
+
+            if ea >= end:
+                break
+
+            # capstone stopped at something it could not decode, so resume at the next item.
+            try:
+                ea = heads.next_head(ea)
+            except KeyError:
+                break
+        return count
+
+    def _get(self, ea, detail):
+        cache = self.insns if detail else self.lite_insns
+        try:
+            return cache.get(ea)
+        except KeyError:
+            pass
 
-    def getseg(self, ea):
-        segs = idb.analysis.Segments(self.idb).segments
-        for seg in segs.values():
-            if seg.startEA <= ea < seg.endEA:
-                return seg
+        start, end = self._get_sweep_range(ea)
+        self.sweep(start, end, detail=detail)
+        try:
+            return cache.get(ea)
+        except KeyError:
+            pass
+
+        # the sweep desynchronized from the item heads, such as after inline data,
+        #  so decode the item by itself.
+        heads = idb.analysis.get_head_index(self.idb)
+        self.sweep(ea, ea + heads.get_item_size(ea), detail=detail)
+        try:
+            return cache.get(ea)
+        except KeyError:
+            raise RuntimeError('failed to disassemble %s' % (hex(ea)))
 
+    def get_insn(self, ea):
+        '''
+        Returns:
+          capstone.CsInsn: the instruction at the given address, with operand details.
 
-class idautils:
-    def __init__(self, db, api):
+        Raises:
+          RuntimeError: if the instruction cannot be disassembled.
+          NotImplementedError: if the processor of the database is not supported.
+        '''
+        return self._get(ea, True)
+
+    def get_lite_insn(self, ea):
+        '''
+        Returns:
+          LiteInsn: the address, size, mnemonic, and operand string of the instruction at the given address.
+
+        Raises:
+          RuntimeError: if the instruction cannot be disassembled.
+          NotImplementedError: if the processor of the database is not supported.
+        '''
+        return self._get(ea, False)
+
+
+class AnalysisRegistry(object):
+    '''
+    lazily constructed analyzers, netnodes, and derived indexes for a database.
+    the emulated IDAPython modules fetch their analysis state from here,
+     rather than re-parsing the same global netnodes in each call.
+
+    everything is memoized in the database's `idb.analysis.AnalysisCache`,
+     so all registries (and `IDAPython` instances) for a database share the same state.
+
+    Example::
+
+        registry = AnalysisRegistry(db)
+        for seg in registry.get_segments():
+            print(hex(seg.startEA))
+    '''
+    def __init__(self, db):
         self.idb = db
-        self.api = api
+        self.cache = idb.analysis.get_cache(db)
 
-    def GetInputFileMD5(self):
-        return self.api.idc.GetInputMD5()
+    def get(self, nodeid, name, build):
+        '''
+        fetch the memoized object derived from the given netnode, building it when necessary.
 
-    def Segments(self):
-        return sorted(idb.analysis.Segments(self.idb).segments.keys())
+        Args:
+          nodeid (Union[str, int]): the node id from which the object is derived.
+          name (str): the name of the derived object.
+          build (callable[]->any): function that computes the object.
 
-    def Functions(self):
-        return list(sorted(idb.analysis.Functions(self.idb).functions.keys()))
+        Returns:
+          any: the memoized object.
+        '''
+        return self.cache.memoize(nodeid, name, build)
+
+    def get_netnode(self, nodeid):
+        '''
+        fetch the netnode with the given id, resolving names only once.
+
+        Raises:
+          KeyError: if the named netnode does not exist.
+        '''
+        return self.get(nodeid, '<netnode>', lambda: idb.netnode.Netnode(self.idb, nodeid))
+
+    @property
+    def root(self):
+        return self.get('Root Node', '<analyzer>', lambda: idb.analysis.Root(self.idb))
+
+    @property
+    def segments(self):
+        return self.get('$ segs', '<analyzer>', lambda: idb.analysis.Segments(self.idb))
+
+    @property
+    def segstrings(self):
+        return self.get('$ segstrings', '<analyzer>', lambda: idb.analysis.SegStrings(self.idb))
+
+    @property
+    def functions(self):
+        return self.get('$ funcs', '<analyzer>', lambda: idb.analysis.Functions(self.idb))
+
+    @property
+    def fixups(self):
+        return self.get('$ fixups', '<analyzer>', lambda: idb.analysis.Fixups(self.idb))
+
+    def get_xref_index(self):
+        '''
+        Returns:
+          idb.analysis.XrefIndex: the index of all cross references.
+        '''
+        return idb.analysis.get_xref_index(self.idb)
+
+    def get_call_graph(self):
+        '''
+        Returns:
+          idb.analysis.CallGraph: the whole-program call graph.
+        '''
+        return idb.analysis.get_call_graph(self.idb)
+
+    def get_fixup_index(self):
+        '''
+        Returns:
+          idb.analysis.FixupIndex: the sorted index of fixups.
+        '''
+        return idb.analysis.get_fixup_index(self.idb)
+
+    def get_name_index(self):
+        '''
+        Returns:
+          idb.analysis.NameIndex: the index of global names.
+        '''
+        return idb.analysis.get_name_index(self.idb)
+
+    def get_head_index(self):
+        '''
+        Returns:
+          idb.analysis.HeadIndex: the sorted addresses of item heads.
+        '''
+        return idb.analysis.get_head_index(self.idb)
+
+    def get_byte_view(self):
+        '''
+        Returns:
+          idb.analysis.ByteView: the loaded bytes of each segment, with their has-value masks.
+        '''
+        return idb.analysis.get_byte_view(self.idb)
+
+    def get_disassembler(self):
+        '''
+        Returns:
+          Disassembler: the batching, caching disassembler.
+        '''
+        return self.get('ID1', 'disassembler', lambda: Disassembler(self.idb))
+
+    def get_block_boundaries(self):
+        '''
+        Returns:
+          idb.analysis.BlockBoundaries: the basic block leaders and terminators of all segments.
+        '''
+        return idb.analysis.get_block_boundaries(self.idb)
+
+    def get_altval_index(self, tag):
+        '''
+        Returns:
+          idb.analysis.AltvalIndex: the altvals with the given tag of all address netnodes.
+        '''
+        return idb.analysis.get_altval_index(self.idb, tag)
+
+    def get_segment_table(self):
+        '''
+        Returns:
+          idb.analysis.SegmentTable: the segments, ordered by start address, with resolved names.
+        '''
+        return idb.analysis.get_segment_table(self.idb)
+
+    def get_segments(self):
+        '''
+        Returns:
+          List[idb.analysis.Seg]: the segments, ordered by start address.
+        '''
+        return self.get_segment_table().segments
+
+    def get_segment_names(self):
+        '''
+        Returns:
+          List[str]: the segment name strings, indexed by `Seg.name_index`.
+        '''
+        return self.segstrings.strings
+
+    def get_function_table(self):
+        '''
+        Returns:
+          idb.analysis.FunctionTable: the columnar table of functions and function tails.
+        '''
+        return idb.analysis.get_function_table(self.idb)
+
+    def get_function_starts(self):
+        '''
+        Returns:
+          Sequence[int]: the start addresses of functions and function tails, ordered.
+        '''
+        return self.get_function_table().starts
 
 
 class IDAPython:
     def __init__(self, db, ScreenEA=None):
         self.idb = db
         self.ScreenEA = ScreenEA
+        # shared by all the modules below.
+        self.registry = AnalysisRegistry(db)
 
         self.idc = idc(db, self)
         self.idaapi = idaapi(db, self)
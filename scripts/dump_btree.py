@@ -1,23 +1,163 @@
 #!/usr/bin/env python3
 '''
-some documentation
+dump the entries of an IDB B-tree (ID0), optionally filtered to a range of keys.
+
+output formats:
+  - hexdump: human readable, the default.
+  - jsonl: one JSON object per entry, with hex-encoded key and value, and the parsed netnode key fields.
+  - binary: for each entry, the little-endian uint32 length of the key, the key,
+     the little-endian uint32 length of the value, and the value.
+
+filters seek directly to the start of the range of keys, so they don't scan the whole tree.
 
 author: Willi Ballenthin
 email: willi.ballenthin@gmail.com
 '''
+import io
 import sys
+import json
+import struct
 import logging
+import binascii
+import collections
 
 import hexdump
 import argparse
 
 import idb
-import idb.netnode
 
 
 logger = logging.getLogger(__name__)
 
 
+def parse_complex_key(key, wordsize):
+    '''
+    Returns:
+      Tuple[int, str, Optional[int]]: the nodeid, tag, and index (if any) of the given netnode key.
+
+    Raises:
+      ValueError: if the key is not a complex key.
+    '''
+    wordformat = '>I' if wordsize == 4 else '>Q'
+    if len(key) not in (1 + wordsize + 1, 1 + wordsize + 1 + wordsize) or key[0] != 0x2E:
+        raise ValueError('not a complex key')
+
+    nodeid = struct.unpack_from(wordformat, key, 1)[0]
+    tag = chr(key[1 + wordsize])
+    if len(key) == 1 + wordsize + 1:
+        return nodeid, tag, None
+    return nodeid, tag, struct.unpack_from(wordformat, key, 1 + wordsize + 1)[0]
+
+
+def get_prefix_end(prefix):
+    '''
+    compute the smallest key greater than all keys with the given prefix.
+
+    Returns:
+      Optional[bytes]: the key, or None if there is no such key (the prefix is all 0xFF).
+    '''
+    prefix = bytearray(prefix)
+    while prefix:
+        if prefix[-1] != 0xFF:
+            prefix[-1] += 1
+            return bytes(prefix)
+        prefix.pop()
+    return None
+
+
+def get_range(args, wordsize):
+    '''
+    compute the range of keys selected by the command line filters.
+
+    Returns:
+      Tuple[Optional[bytes], Optional[bytes]]: the inclusive start and exclusive end, or None when unbounded.
+    '''
+    if args.nodeid is not None:
+        prefix = b'.' + struct.pack('>I' if wordsize == 4 else '>Q', args.nodeid)
+        if args.tag is not None:
+            prefix += args.tag.encode('ascii')
+    elif args.tag is not None:
+        raise ValueError('--tag requires --nodeid')
+    elif args.prefix is not None:
+        prefix = args.prefix.encode('utf-8')
+    else:
+        prefix = None
+
+    start = binascii.unhexlify(args.start) if args.start is not None else None
+    end = binascii.unhexlify(args.end) if args.end is not None else None
+
+    if prefix is not None:
+        pend = get_prefix_end(prefix)
+        start = prefix if start is None else max(start, prefix)
+        if pend is not None:
+            end = pend if end is None else min(end, pend)
+
+    return start, end
+
+
+def output_hexdump(db, entries, out):
+    for key, value in entries:
+        try:
+            nodeid, tag, index = parse_complex_key(key, db.wordsize)
+        except ValueError:
+            out.write(hexdump.hexdump(key, result='return') + '\n')
+        else:
+            out.write('nodeid: %x tag: %s index: %s\n' % (
+                      nodeid,
+                      tag,
+                      hex(index) if index is not None else 'None'))
+
+        out.write(hexdump.hexdump(bytes(value), result='return') + '\n')
+        out.write('--\n')
+
+
+def output_jsonl(db, entries, out):
+    for key, value in entries:
+        entry = {
+            'key': binascii.hexlify(key).decode('ascii'),
+            'value': binascii.hexlify(value).decode('ascii'),
+        }
+        try:
+            nodeid, tag, index = parse_complex_key(key, db.wordsize)
+        except ValueError:
+            pass
+        else:
+            entry['nodeid'] = nodeid
+            entry['tag'] = tag
+            entry['index'] = index
+        out.write(json.dumps(entry) + '\n')
+
+
+def output_binary(db, entries, out):
+    for key, value in entries:
+        out.write(struct.pack('<I', len(key)))
+        out.write(key)
+        out.write(struct.pack('<I', len(value)))
+        out.write(value)
+
+
+def output_stats(db, entries, out):
+    # map from (nodeid, tag) to count, for complex keys.
+    counts = collections.Counter()
+    # map from first byte to count, for other keys.
+    others = collections.Counter()
+    total = 0
+    for key, value in entries:
+        total += 1
+        try:
+            nodeid, tag, _ = parse_complex_key(key, db.wordsize)
+        except ValueError:
+            others[chr(key[0])] += 1
+        else:
+            counts[(nodeid, tag)] += 1
+
+    out.write('total entries: %d\n' % (total))
+    for (nodeid, tag), count in sorted(counts.items()):
+        out.write('nodeid: %x tag: %s count: %d\n' % (nodeid, tag, count))
+    for prefix, count in sorted(others.items()):
+        out.write('prefix: %r count: %d\n' % (prefix, count))
+
+
 def main(argv=None):
     if argv is None:
         argv = sys.argv[1:]
@@ -25,6 +165,20 @@ def main(argv=None):
     parser = argparse.ArgumentParser(description="Dump an IDB B-tree to a textual representation.")
     parser.add_argument("idbpath", type=str,
                         help="Path to input idb file")
+    parser.add_argument("-f", "--format", choices=['hexdump', 'jsonl', 'binary'], default='hexdump',
+                        help="Output format")
+    parser.add_argument("--prefix", type=str, default=None,
+                        help="Only dump keys that start with this string, like 'N$ '")
+    parser.add_argument("--nodeid", type=lambda s: int(s, 0), default=None,
+                        help="Only dump keys of this netnode")
+    parser.add_argument("--tag", type=str, default=None,
+                        help="Only dump keys with this netnode tag, like 'S'. requires --nodeid")
+    parser.add_argument("--start", type=str, default=None,
+                        help="Only dump keys at or after this hex-encoded key")
+    parser.add_argument("--end", type=str, default=None,
+                        help="Only dump keys before this hex-encoded key")
+    parser.add_argument("--stats", action="store_true",
+                        help="Report the number of entries per netnode and tag, rather than the entries")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Enable debug logging")
     parser.add_argument("-q", "--quiet", action="store_true",
@@ -41,25 +195,36 @@ def main(argv=None):
         logging.basicConfig(level=logging.INFO)
         logging.getLogger().setLevel(logging.INFO)
 
+    if args.tag is not None and len(args.tag) != 1:
+        parser.error('--tag must be a single character')
+
     with idb.from_file(args.idbpath) as db:
-        cursor = db.id0.get_min()
-        while True:
-            if cursor.key[0] == 0x2E:
-                k = idb.netnode.parse_key(cursor.key)
-                print('nodeid: %x tag: %s index: %s' % (
-                      k.nodeid,
-                      k.tag,
-                      hex(k.index) if k.index is not None else 'None'))
-            else:
-                hexdump.hexdump(cursor.key)
+        try:
+            start, end = get_range(args, db.wordsize)
+        except ValueError as e:
+            parser.error(str(e))
 
-            hexdump.hexdump(bytes(cursor.value))
-            print('--')
+        entries = ((bytes(key), bytes(value)) for key, value in db.id0.iter_entries(start=start, end=end))
 
-            try:
-                cursor.next()
-            except IndexError:
-                break
+        out = io.BufferedWriter(sys.stdout.buffer, buffer_size=0x100000)
+        try:
+            if args.format == 'binary' and not args.stats:
+                output_binary(db, entries, out)
+            else:
+                text = io.TextIOWrapper(out, encoding='utf-8', write_through=False)
+                try:
+                    if args.stats:
+                        output_stats(db, entries, text)
+                    elif args.format == 'jsonl':
+                        output_jsonl(db, entries, text)
+                    else:
+                        output_hexdump(db, entries, text)
+                finally:
+                    text.flush()
+                    text.detach()
+        finally:
+            out.flush()
+            out.detach()
 
     return 0
 
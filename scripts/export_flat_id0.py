@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+'''
+write the entries of the ID0 b-tree of an IDB to a flat, sorted key/value file,
+ which `idb.fileformat.FlatIndex` searches with binary searches over a memory map.
+
+author: Willi Ballenthin
+email: willi.ballenthin@gmail.com
+'''
+import sys
+import logging
+
+import argparse
+
+import idb
+import idb.fileformat
+
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Export the ID0 b-tree of an IDB to a flat key/value file.")
+    parser.add_argument("idbpath", type=str,
+                        help="Path to input idb file")
+    parser.add_argument("outpath", type=str,
+                        help="Path to output flat index file")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Enable debug logging")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Disable all output but errors")
+    args = parser.parse_args(args=argv)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.getLogger().setLevel(logging.DEBUG)
+    elif args.quiet:
+        logging.basicConfig(level=logging.ERROR)
+        logging.getLogger().setLevel(logging.ERROR)
+    else:
+        logging.basicConfig(level=logging.INFO)
+        logging.getLogger().setLevel(logging.INFO)
+
+    with idb.from_file(args.idbpath) as db:
+        count = idb.fileformat.write_flat_index(db.id0, args.outpath)
+        logger.info('wrote %d entries to %s', count, args.outpath)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
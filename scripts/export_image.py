@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+'''
+write the loaded bytes of an IDB to a flat (sparse) image file,
+ optionally with a bitmap of the undefined bytes.
+
+author: Willi Ballenthin
+email: willi.ballenthin@gmail.com
+'''
+import sys
+import logging
+
+import argparse
+
+import idb
+import idb.analysis
+
+
+logger = logging.getLogger(__name__)
+
+
+def main(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description="Export the loaded image of an IDB to a flat file.")
+    parser.add_argument("idbpath", type=str,
+                        help="Path to input idb file")
+    parser.add_argument("outpath", type=str,
+                        help="Path to output image file")
+    parser.add_argument("--bitmap", type=str, default=None,
+                        help="Path to output bitmap of undefined bytes")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Enable debug logging")
+    parser.add_argument("-q", "--quiet", action="store_true",
+                        help="Disable all output but errors")
+    args = parser.parse_args(args=argv)
+
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG)
+        logging.getLogger().setLevel(logging.DEBUG)
+    elif args.quiet:
+        logging.basicConfig(level=logging.ERROR)
+        logging.getLogger().setLevel(logging.ERROR)
+    else:
+        logging.basicConfig(level=logging.INFO)
+        logging.getLogger().setLevel(logging.INFO)
+
+    with idb.from_file(args.idbpath) as db:
+        base = idb.analysis.export_image(db, args.outpath, bitmap_path=args.bitmap)
+        logger.info('wrote image based at 0x%x to %s', base, args.outpath)
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
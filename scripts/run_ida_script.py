@@ -1,12 +1,29 @@
 #!/usr/bin/env python3
 '''
-some documentation
+run an IDAPython script against an IDB, without IDA Pro.
+
+to run many scripts against the same database, start a server that loads the database once:
+
+    run_ida_script.py --serve /tmp/kernel32.sock kernel32.idb
+
+and then submit scripts to it:
+
+    run_ida_script.py --connect /tmp/kernel32.sock script.py
+
+each script runs in a forked copy of the server, so it sees the warmed database,
+ but can't affect other scripts.
 
 author: Willi Ballenthin
 email: willi.ballenthin@gmail.com
 '''
+import io
+import os
 import sys
+import json
+import signal
+import socket
 import logging
+import traceback
 import importlib.abc
 import importlib.util
 
@@ -46,23 +63,191 @@ class HookedImporter(importlib.abc.MetaPathFinder, importlib.abc.Loader):
         sys.meta_path.insert(0, self)
 
 
+def get_hooks(api):
+    '''
+    Returns:
+      Dict[str, object]: the emulated IDAPython modules, by module name.
+    '''
+    return {
+        'idc': api.idc,
+        'idaapi': api.idaapi,
+        'idautils': api.idautils,
+        'ida_funcs': api.ida_funcs,
+        'ida_bytes': api.ida_bytes,
+        'ida_netnode': api.ida_netnode,
+        'ida_nalt': api.ida_nalt,
+    }
+
+
+def get_screenea(db, screenea=None):
+    if screenea:
+        if screenea.startswith('0x'):
+            return int(screenea, 0x10)
+        else:
+            return int(screenea)
+    else:
+        return list(sorted(idb.analysis.Functions(db).functions.keys()))[0]
+
+
+def run_script(source, hooks, filename='<script>'):
+    g = {
+        '__name__': '__main__',
+    }
+    g.update(hooks)
+    exec(compile(source, filename, 'exec'), g)
+
+
+def warm(api):
+    '''
+    build the indexes that most scripts use, so that forked workers inherit them.
+    '''
+    registry = api.registry
+    for build in (registry.get_segment_table,
+                  registry.get_function_table,
+                  registry.get_head_index,
+                  registry.get_byte_view,
+                  registry.get_xref_index,
+                  registry.get_name_index,
+                  registry.get_fixup_index,
+                  registry.get_block_boundaries,
+                  lambda: registry.get_altval_index('A')):
+        try:
+            build()
+        except KeyError:
+            # the database doesn't have the netnode for this index.
+            continue
+
+
+def recv_line(conn):
+    buf = bytearray()
+    while not buf.endswith(b'\n'):
+        chunk = conn.recv(0x10000)
+        if not chunk:
+            break
+        buf.extend(chunk)
+    return bytes(buf)
+
+
+def send_response(conn, response):
+    conn.sendall(json.dumps(response).encode('utf-8') + b'\n')
+
+
+def handle_request(conn, hooks, default_timeout):
+    '''
+    run the script submitted over the given connection, and send back its output.
+    this runs in a forked worker, which exits when the script completes or times out.
+
+    request: a JSON line with keys `source`, `filename`, and optionally `timeout` (seconds).
+    response: a JSON line with keys `status` ("ok", "error", or "timeout"), `output`, and `error`.
+    '''
+    request = json.loads(recv_line(conn).decode('utf-8'))
+    timeout = request.get('timeout') or default_timeout
+
+    output = io.StringIO()
+    sys.stdout = output
+    sys.stderr = output
+
+    def on_timeout(signum, frame):
+        send_response(conn, {'status': 'timeout', 'output': output.getvalue(), 'error': None})
+        conn.close()
+        os._exit(1)
+
+    if timeout:
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, float(timeout))
+
+    try:
+        run_script(request['source'], hooks, filename=request.get('filename', '<script>'))
+    except BaseException:
+        response = {'status': 'error', 'output': output.getvalue(), 'error': traceback.format_exc()}
+    else:
+        response = {'status': 'ok', 'output': output.getvalue(), 'error': None}
+
+    signal.setitimer(signal.ITIMER_REAL, 0)
+    send_response(conn, response)
+
+
+def serve(sockpath, hooks, timeout=None):
+    '''
+    accept scripts on the given unix socket, forever,
+     and run each in a copy-on-write fork of this process.
+    '''
+    # forked workers are reaped automatically.
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    if os.path.exists(sockpath):
+        os.unlink(sockpath)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(sockpath)
+    server.listen(0x40)
+    logger.info('listening on %s', sockpath)
+
+    try:
+        while True:
+            conn, _ = server.accept()
+            pid = os.fork()
+            if pid == 0:
+                server.close()
+                # the server ignores SIGCHLD to reap workers, but scripts may wait on their own subprocesses.
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                status = 0
+                try:
+                    handle_request(conn, hooks, timeout)
+                except BaseException:
+                    logger.error('failed to handle request: %s', traceback.format_exc())
+                    status = 1
+                finally:
+                    conn.close()
+                    os._exit(status)
+            else:
+                conn.close()
+    finally:
+        server.close()
+        os.unlink(sockpath)
+
+
+def submit(sockpath, script_path, timeout=None):
+    '''
+    run the given script on the server at the given unix socket.
+
+    Returns:
+      Dict[str, Any]: the response, with keys `status`, `output`, and `error`.
+    '''
+    with open(script_path, 'rb') as f:
+        source = f.read().decode('utf-8')
+
+    conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    conn.connect(sockpath)
+    try:
+        send_response(conn, {'source': source, 'filename': script_path, 'timeout': timeout})
+        return json.loads(recv_line(conn).decode('utf-8'))
+    finally:
+        conn.close()
+
+
 def main(argv=None):
     # TODO: do version check for 3.x
 
     if argv is None:
         argv = sys.argv[1:]
 
-    parser = argparse.ArgumentParser(description="Dump an IDB B-tree to a textual representation.")
-    parser.add_argument("script_path", type=str,
-                        help="Path to script file")
-    parser.add_argument("idbpath", type=str,
-                        help="Path to input idb file")
+    parser = argparse.ArgumentParser(description="Run an IDAPython script against an IDB.")
+    parser.add_argument("paths", type=str, nargs='+',
+                        help="Path to script file and path to input idb file; "
+                             "with --serve, only the idb; with --connect, only the script")
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="Enable debug logging")
     parser.add_argument("-q", "--quiet", action="store_true",
                         help="Disable all output but errors")
     parser.add_argument("--ScreenEA", type=str,
                         help="Prepare value of ScreenEA()")
+    parser.add_argument("--serve", type=str, metavar="SOCKET",
+                        help="Load the idb once and run submitted scripts, listening on this unix socket")
+    parser.add_argument("--connect", type=str, metavar="SOCKET",
+                        help="Submit the script to the server listening on this unix socket")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Kill scripts run via a server after this many seconds")
     args = parser.parse_args(args=argv)
 
     if args.verbose:
@@ -79,37 +264,43 @@ def main(argv=None):
         logging.getLogger('idb.netnode').setLevel(logging.ERROR)
         logging.getLogger('idb.fileformat').setLevel(logging.ERROR)
 
+    if args.serve and args.connect:
+        parser.error('--serve and --connect are mutually exclusive')
 
-    with idb.from_file(args.idbpath) as db:
-        if args.ScreenEA:
-            if args.ScreenEA.startswith('0x'):
-                screenea = int(args.ScreenEA, 0x10)
-            else:
-                screenea = int(args.ScreenEA)
-        else:
-            screenea = list(sorted(idb.analysis.Functions(db).functions.keys()))[0]
+    if args.connect:
+        if len(args.paths) != 1:
+            parser.error('--connect requires only the path to the script')
 
-        api = idb.IDAPython(db, ScreenEA=screenea)
+        response = submit(args.connect, args.paths[0], timeout=args.timeout)
+        sys.stdout.write(response['output'])
+        if response['status'] == 'error':
+            sys.stderr.write(response['error'])
+        elif response['status'] == 'timeout':
+            logger.error('script timed out')
+        return 0 if response['status'] == 'ok' else 1
 
-        hooks = {
-            'idc': api.idc,
-            'idaapi': api.idaapi,
-            'idautils': api.idautils,
-            'ida_funcs': api.ida_funcs,
-            'ida_bytes': api.ida_bytes,
-            'ida_netnode': api.ida_netnode,
-            'ida_nalt': api.ida_nalt,
-        }
+    if args.serve:
+        if len(args.paths) != 1:
+            parser.error('--serve requires only the path to the idb')
+        idbpath = args.paths[0]
+    else:
+        if len(args.paths) != 2:
+            parser.error('requires the path to the script and the path to the idb')
+        script_path, idbpath = args.paths
+
+    with idb.from_file(idbpath) as db:
+        api = idb.IDAPython(db, ScreenEA=get_screenea(db, args.ScreenEA))
+        hooks = get_hooks(api)
 
         importer = HookedImporter(hooks=hooks)
         importer.install()
 
-        with open(args.script_path, 'rb') as f:
-            g = {
-                '__name__': '__main__',
-            }
-            g.update(hooks)
-            exec(f.read(), g)
+        if args.serve:
+            warm(api)
+            serve(args.serve, hooks, timeout=args.timeout)
+        else:
+            with open(script_path, 'rb') as f:
+                run_script(f.read(), hooks, filename=script_path)
 
     return 0
 
@@ -1,5 +1,9 @@
 from fixtures import *
 
+import gc
+import array
+import weakref
+
 import idb.analysis
 
 
@@ -197,6 +201,29 @@ def test_stack_change_points(kernel32_idb):
         assert list(GetCurrentProcess.get_stack_change_points()) == []
 
 
+def test_stack_deltas(kernel32_idb):
+    # see the listing of CreateThread in `test_stack_change_points`.
+    CreateThread = idb.analysis.Function(kernel32_idb, 0x68901aea)
+    assert CreateThread.get_spd(0x68901aea) == 0
+    assert CreateThread.get_spd(0x68901aec) == 0
+    assert CreateThread.get_spd(0x68901aed) == -4
+    assert CreateThread.get_spd(0x68901aef) == -4
+    assert CreateThread.get_spd(0x68901b0b) == -36
+    assert CreateThread.get_spd(0x68901b11) == -4
+    assert CreateThread.get_spd(0x68901b12) == 0
+
+    assert CreateThread.get_sp_delta(0x68901aed) == -4
+    assert CreateThread.get_sp_delta(0x68901b11) == 32
+    assert CreateThread.get_sp_delta(0x68901aef) == 0
+
+    spds = CreateThread.get_stack_deltas().get_spds([0x68901aea, 0x68901aed, 0x68901b0b, 0x68901b12])
+    assert list(spds) == [0, -4, -36, 0]
+
+    GetCurrentProcess = idb.analysis.Function(kernel32_idb, 0x68901493)
+    assert GetCurrentProcess.get_spd(0x68901496) == 0
+    assert GetCurrentProcess.get_sp_delta(0x68901496) == 0
+
+
 def pluck(prop, s):
     '''
     generate the values from the given attribute with name `prop` from the given sequence of items `s`.
@@ -248,14 +275,412 @@ def test_fixups(kernel32_idb):
     assert fixups[0x68901023 + 2].get_fixup_length() == 0x4
 
 
+def test_fixup_index(kernel32_idb):
+    fixups = idb.analysis.get_fixup_index(kernel32_idb)
+    assert len(fixups) == 31608
+
+    # .text:68901022 020 57                                      push    edi
+    # .text:68901023 024 8B 3D 98 B1 9D 68                       mov     edi, dword_689DB198
+    # .text:68901029 024 85 FF                                   test    edi, edi
+    assert fixups.next_fixup(0x68901023) == 0x68901025
+    assert fixups.prev_fixup(0x68901026) == 0x68901025
+    assert fixups.fixups_in_range(0x68901023, 6) == [0x68901025]
+    assert fixups.contains_fixups(0x68901023, 2) is False
+    assert fixups.contains_fixups(0x68901023, 3) is True
+
+    assert fixups.get_mask(0x68901023, 8) == bytearray(b'\xFF\xFF\x00\x00\x00\x00\xFF\xFF')
+    buf = b'\x8B\x3D\x98\xB1\x9D\x68'
+    assert fixups.mask_fixups(0x68901023, buf) == b'\x8B\x3D\x00\x00\x00\x00'
+    assert fixups.mask_fixups(0x68901026, buf[3:]) == b'\x00\x00\x00'
+
+
+def test_fixup_types():
+    # type, offset, and unknown fields of a FIXUP_OFF16 with the FIXUP_REL flag.
+    fixup = idb.analysis.Fixup()
+    fixup.vsParse(b'\x11' + b'\x00' * 0xA)
+    assert fixup.get_fixup_length() == 2
+
+    # FIXUP_PTR32 with the FIXUP_EXTDEF flag.
+    fixup = idb.analysis.Fixup()
+    fixup.vsParse(b'\x25' + b'\x00' * 0xA)
+    assert fixup.get_fixup_length() == 6
+
+    fixup = idb.analysis.Fixup()
+    fixup.vsParse(b'\x00' + b'\x00' * 0xA)
+    assert fixup.get_fixup_length() == 1
+
+    # the masks of fixups blank exactly the bytes they patch.
+    fixups = idb.analysis.FixupIndex.__new__(idb.analysis.FixupIndex)
+    fixups.starts = array.array('I', [0x10, 0x14])
+    fixups.lengths = array.array('B', [idb.analysis.FIXUP_LENGTHS[0x1], idb.analysis.FIXUP_LENGTHS[0x5]])
+    assert fixups.get_mask(0x10, 0xC) == bytearray(b'\x00\x00\xFF\xFF\x00\x00\x00\x00\x00\x00\xFF\xFF')
+
+
 def test_segments(kernel32_idb):
     segs = idb.analysis.Segments(kernel32_idb).segments
     assert list(sorted(map(lambda s: s.startEA, segs.values()))) == [0x68901000, 0x689db000, 0x689dd000]
     assert list(sorted(map(lambda s: s.endEA, segs.values()))) == [0x689db000, 0x689dd000, 0x689de230]
 
 
+def test_segment_table(kernel32_idb):
+    segs = idb.analysis.get_segment_table(kernel32_idb)
+    assert list(segs.starts) == [0x68901000, 0x689db000, 0x689dd000]
+    assert list(segs.ends) == [0x689db000, 0x689dd000, 0x689de230]
+    assert segs.names == ['.text', '.data', '.idata']
+
+    assert segs.get(0x68901000).startEA == 0x68901000
+    assert segs.get(0x689dafff).startEA == 0x68901000
+    assert segs.get(0x689db000).startEA == 0x689db000
+    assert segs.get_name(0x689dd010) == '.idata'
+    assert segs.get_next(0x68901000).startEA == 0x689db000
+
+    with pytest.raises(KeyError):
+        segs.get(0x689de230)
+
+    with pytest.raises(KeyError):
+        segs.get_next(0x689dd000)
+
+
+def test_segment_table_small(small_idb):
+    segs = idb.analysis.get_segment_table(small_idb)
+    assert len(segs) == 1
+    assert segs.get(0x0).endEA == 0xD
+    assert segs.find(0xC) == 0
+
+    with pytest.raises(KeyError):
+        segs.find(0xD)
+
+
 def test_segstrings(kernel32_idb):
     strs = idb.analysis.SegStrings(kernel32_idb).strings
 
     # the first string is some binary data.
     assert strs[1:] == ['.text', 'CODE', '.data', 'DATA', '.idata']
+
+
+def test_analysis_cache(small_idb):
+    cache = idb.analysis.get_cache(small_idb)
+    cache.clear()
+
+    segs = idb.analysis.Segments(small_idb).segments
+    assert ('$ segs', 'segments') in cache
+    assert cache.get_memory_usage(nodeid='$ segs') > 0
+
+    # a different analyzer instance shares the memoized value.
+    assert idb.analysis.Segments(small_idb).segments is segs
+    assert cache.hits == 1
+
+    assert idb.analysis.Segments(small_idb).invalidate() == 1
+    assert ('$ segs', 'segments') not in cache
+    assert idb.analysis.Segments(small_idb).segments is not segs
+
+    assert cache.invalidate() == 1
+    assert len(cache) == 0
+    assert cache.get_memory_usage() == 0
+
+    # a size provided by the builder is used as-is.
+    cache.set('$ test', 'value', [1, 2, 3], size=0x100)
+    assert cache.get_memory_usage(nodeid='$ test') == 0x100
+    assert cache.invalidate(nodeid='$ test') == 1
+
+
+def test_analysis_cache_released():
+    path = os.path.join(CD, 'data', 'small', 'small-colored.idb')
+    for use_mmap in (False, True):
+        with idb.from_file(path, use_mmap=use_mmap) as db:
+            # populate the cache with analyzers that refer back to the database.
+            idb.analysis.get_segment_table(db)
+            idb.analysis.get_name_index(db)
+            ref = weakref.ref(db)
+        del db
+        gc.collect()
+        assert ref() is None
+
+
+def test_processor(small_idb):
+    # the idainfo structure names the processor module, and its flags set the flat 32-bit memory model.
+    assert bytes(idb.analysis.Root(small_idb).idainfo)[:13] == b'IDA\xb7\x02metapc\x00\x00'
+    assert idb.analysis.get_processor(small_idb) == ('metapc', 32)
+
+
+def test_unpack_dds():
+    # 0x01:             0x1
+    # 0x81 0x02:        0x102
+    # 0xC1 0x02 0x03 0x04: 0x1020304
+    # 0xFF 0x12 0x34 0x56 0x78: 0x12345678
+    buf = b'\x01\x81\x02\xC1\x02\x03\x04\xFF\x12\x34\x56\x78'
+    assert list(idb.analysis.unpack_dds(buf)) == [0x1, 0x102, 0x1020304, 0x12345678]
+
+    values, offsets = idb.analysis.unpack_dds_array(buf)
+    assert list(values) == [0x1, 0x102, 0x1020304, 0x12345678]
+    assert list(offsets) == [0x0, 0x1, 0x3, 0x7]
+
+    assert idb.analysis.unpack_dd(buf, offset=0x3) == (0x1020304, 4)
+    assert idb.analysis.unpack_dq(buf, offset=0x3) == (0x12345678 << 32) + 0x1020304
+
+    values, offsets, indices = idb.analysis.unpack_dds_batch([buf, b'', b'\x05'])
+    assert list(indices) == [0, 4, 4, 5]
+    assert list(values[indices[2]:indices[3]]) == [0x5]
+
+    with pytest.raises(IndexError):
+        idb.analysis.unpack_dds_array(b'\x81')
+
+
+def test_function_table(kernel32_idb):
+    funcs = idb.analysis.Functions(kernel32_idb).functions
+    table = idb.analysis.FunctionTable(kernel32_idb)
+    assert len(table) == len(funcs)
+    assert list(table.starts) == list(sorted(funcs.keys()))
+
+    for view in table:
+        func = funcs[view.startEA]
+        assert view.endEA == func.endEA
+        assert view.flags == func.flags
+        assert view.frame == func.frame
+        assert view.argsize == func.argsize
+        assert view.owner == func.owner
+
+    DllEntryPoint = table.get(0x68901695)
+    assert DllEntryPoint.endEA == 0x689016B0
+    assert DllEntryPoint.frame == 0x75
+    assert DllEntryPoint.frregs == 0x4
+    assert DllEntryPoint.argsize == 0xC
+
+    with pytest.raises(KeyError):
+        table.get(0x68901695 + 1)
+
+
+def test_xref_index(kernel32_idb):
+    xrefs = idb.analysis.get_xref_index(kernel32_idb)
+    assert idb.analysis.get_xref_index(kernel32_idb) is xrefs
+
+    for ea in (0x68901695, 0x6890169E, 0x68906156, 0x689016C0, 0x689DB370):
+        assert list(xrefs.get_crefs_from(ea)) == list(idb.analysis.get_crefs_from(kernel32_idb, ea))
+        assert list(xrefs.get_crefs_to(ea)) == list(idb.analysis.get_crefs_to(kernel32_idb, ea))
+        assert list(xrefs.get_drefs_from(ea)) == list(idb.analysis.get_drefs_from(kernel32_idb, ea))
+        assert list(xrefs.get_drefs_to(ea)) == list(idb.analysis.get_drefs_to(kernel32_idb, ea))
+
+    targets, types = xrefs.crefs_from.get(0x6890169E)
+    assert list(targets) == [0x68906156]
+
+
+def test_call_graph(kernel32_idb):
+    cg = idb.analysis.get_call_graph(kernel32_idb)
+    assert len(cg) > 0
+
+    # .text:68901B0B FF 15 00 D8 9D 68                       call    ds:CreateRemoteThreadEx_0
+    # this is a call to an import, so its not part of the graph.
+    assert 0x68901aea not in cg.get_reaching(0x68901aea)
+
+    for fva in cg.starts[:100]:
+        for callee in cg.get_callees(fva):
+            assert fva in cg.get_callers(callee)
+            assert cg.can_reach(fva, callee)
+            assert callee in cg.get_reachable(fva, max_depth=1)
+            assert set(cg.get_reachable(callee)) <= set(cg.get_reachable(fva))
+
+    # find a caller -> callee -> callee chain whose last function is not called directly by the first.
+    chains = [(fva, callee, indirect)
+              for fva in cg.starts
+              for callee in cg.get_callees(fva)
+              for indirect in cg.get_callees(callee)
+              if indirect != fva and indirect not in cg.get_callees(fva)]
+    assert len(chains) > 0
+    for fva, callee, indirect in chains[:100]:
+        assert cg.can_reach(fva, indirect)
+        assert indirect in cg.get_reachable(fva)
+        assert indirect in cg.get_reachable(fva, max_depth=2)
+        assert indirect not in cg.get_reachable(fva, max_depth=1)
+        assert fva in cg.get_reaching(indirect)
+        assert fva in cg.get_reaching(indirect, max_depth=2)
+
+    # by default, the graph is built over the cached function table.
+    assert idb.analysis.CallGraph(kernel32_idb).functions is idb.analysis.get_function_table(kernel32_idb)
+
+
+def test_struct_loader(kernel32_idb):
+    struc = idb.analysis.Struct(kernel32_idb, 0xFF000075)
+    members = struc.load_members()
+    assert struc.load_members() is members
+
+    assert list(map(lambda m: m.name, members)) == [' s',
+                                                    ' r',
+                                                    'hinstDLL',
+                                                    'fdwReason',
+                                                    'lpReserved',]
+    assert members[2].type == 'HINSTANCE'
+
+    for member, slow in zip(members, struc.get_members()):
+        assert member.nodeid == slow.nodeid
+        assert member.name == slow.get_name()
+
+
+def test_name_index(small_idb):
+    names = idb.analysis.get_name_index(small_idb)
+    assert names.get('$ funcs') == 0xFF000022
+    assert names.get_name(0xFF000022) == '$ funcs'
+    assert 'Root Node' in names
+    assert 'Root' not in names
+
+    with pytest.raises(KeyError):
+        names.get('Root')
+
+    assert names.find_prefix('$ seg') == ['$ segs', '$ segstrings']
+    assert names.search('$ seg*') == ['$ segs', '$ segstrings']
+    assert names.search('?oot Node') == ['Root Node']
+    assert names.search('Root Node') == ['Root Node']
+    # without wildcards, only the exact name matches, not the longer names that it prefixes.
+    assert names.search('$ segs') == ['$ segs']
+    assert names.search('$ seg') == []
+    assert names.find_substring('View') == ['Hex View-1', 'IDA View-A']
+    assert names.find_substring('Vi') == ['Hex View-1', 'IDA View-A']
+    assert names.find_substring('xyzzy') == []
+
+
+def test_pack_bits():
+    assert idb.analysis.pack_bits(b'') == b''
+    assert idb.analysis.pack_bits(bytes([1, 0, 0, 0, 0, 0, 0, 0, 1])) == bytes([1, 1])
+    assert idb.analysis.pack_bits(bytes([0, 1, 1, 0, 0, 0, 0, 1])) == bytes([0x86])
+
+
+def test_export_image(small_idb, empty_idb, tmpdir):
+    path = str(tmpdir.join('small.bin'))
+    bitmap_path = str(tmpdir.join('small.undef'))
+    base = idb.analysis.export_image(small_idb, path, bitmap_path=bitmap_path, chunk_size=8)
+    assert base == 0x0
+    with open(path, 'rb') as f:
+        assert f.read() == b'hello world!\n'
+
+    with idb.analysis.MappedImage(path, base, bitmap_path=bitmap_path) as image:
+        assert len(image) == 0xD
+        assert image.get_bytes(0x6, 0x5) == b'world'
+        assert image.is_defined(0xC) is True
+
+        with pytest.raises(IndexError):
+            image.get_bytes(0xC, 0x2)
+
+    # the single byte of the empty database is undefined.
+    path = str(tmpdir.join('empty.bin'))
+    bitmap_path = str(tmpdir.join('empty.undef'))
+    base = idb.analysis.export_image(empty_idb, path, bitmap_path=bitmap_path)
+    with idb.analysis.MappedImage(path, base, bitmap_path=bitmap_path) as image:
+        assert image.is_defined(0x0) is False
+
+
+def test_block_boundaries(small_idb):
+    # the heads are 0x0, 0x1, 0x4, and 0xC, and they are all data items.
+    # so, only the first head of the segment starts a block, and each data item ends the preceding block.
+    blocks = idb.analysis.get_block_boundaries(small_idb)
+    assert list(blocks.starts) == [0x0]
+    assert list(blocks.ends) == [0x0, 0x1, 0x4, 0xC]
+
+    assert blocks.find_block_start(0x5) == 0x0
+    assert blocks.find_block_end(0x2) == 0x4
+    assert list(blocks.get_block_starts(0x1, 0xC)) == []
+    assert list(blocks.get_block_ends(0x0, 0x4)) == [0x0, 0x1]
+
+
+def test_build_cfgs(tmpdir):
+    path = os.path.join(CD, 'data', 'small', 'small-colored.idb')
+
+    # there are no functions in this database, so treat some data items as functions.
+    store, failed = idb.analysis.build_cfgs(path, functions=[0x4, 0x1, 0x100], processes=2, shard_size=1)
+    assert list(store.functions) == [0x1, 0x4]
+    # 0x100 is not in a segment, so it fails, rather than being stored as an empty graph.
+    assert failed == [0x100]
+    assert store.get_blocks(0x4) == [(0x4, 0x4)]
+    assert store.get_succs(0x4, 0x4) == []
+    assert store.get_preds(0x4, 0x4) == []
+
+    with pytest.raises(KeyError):
+        store.get_blocks(0x0)
+
+    cfgpath = str(tmpdir.join('small.cfg'))
+    store.save(cfgpath)
+    loaded = idb.analysis.CFGStore.load(cfgpath)
+    for name in idb.analysis.CFGStore.ARRAYS:
+        assert getattr(loaded, name) == getattr(store, name)
+
+    store, failed = idb.analysis.build_cfgs(path)
+    assert len(store) == 0
+    assert failed == []
+
+
+def test_cfg_store():
+    store = idb.analysis.CFGStore()
+    store._add_function(0x10, [(0x10, 0x12), (0x14, 0x14), (0x18, 0x1A)],
+                        [(0x10, 0x14), (0x10, 0x18), (0x14, 0x18)])
+    store._add_function(0x20, [(0x20, 0x20)], [(0x20, 0x20)])
+
+    assert 0x10 in store
+    assert 0x14 not in store
+    assert list(store.edge_indptr) == [0, 2, 3, 3, 4]
+    assert store.get_succs(0x10, 0x10) == [0x14, 0x18]
+    assert store.get_preds(0x10, 0x18) == [0x10, 0x14]
+    assert store.get_preds(0x10, 0x10) == []
+    assert store.get_preds(0x20, 0x20) == [0x20]
+    assert store.get_succs(0x20, 0x20) == [0x20]
+
+    with pytest.raises(KeyError):
+        store.get_succs(0x10, 0x12)
+
+
+def test_altval_index(small_idb):
+    altvals = idb.analysis.get_altval_index(small_idb, 'A')
+    # the first byte is colored 0x888888, which is stored plus one.
+    assert altvals.get(0x0, 0x14) == 0x888889
+    assert altvals.get(0x1, 0x14, default=0) == 0
+    assert altvals.get(0x1, 0x14, default=None) is None
+
+    with pytest.raises(KeyError):
+        altvals.get(0x1, 0x14)
+
+    addresses, values = altvals.get_range(0x8, 0x0, 0xD)
+    assert list(addresses) == [0x0]
+    assert altvals.find_flagged(0x8, 0x40000) == [0x0]
+    assert altvals.find_flagged(0x8, 0x40000, start=0x1) == []
+    assert altvals.find_flagged(0x8, 0x40000 | (1 << 40)) == []
+    assert altvals.find_flagged(0x8, 0x0, end=0xD) == [0x0]
+    assert list(altvals.get_values(0x1234)[0]) == []
+
+
+def test_index_sidecar(tmpdir):
+    path = os.path.join(CD, 'data', 'small', 'small-colored.idb')
+    cache_dir = str(tmpdir.join('cache'))
+
+    with idb.from_file(path, index_sidecar=True, cache_dir=cache_dir) as db:
+        names = list(idb.analysis.get_name_index(db))
+        heads = list(idb.analysis.get_head_index(db))
+    sidecar_path = idb.analysis.get_sidecar_path(path, cache_dir=cache_dir)
+    assert os.path.exists(sidecar_path)
+
+    with idb.from_file(path, index_sidecar=True, cache_dir=cache_dir) as db:
+        cache = idb.analysis.get_cache(db)
+        assert ('ID0', 'names') in cache
+        assert ('ID1', 'heads') in cache
+        assert list(idb.analysis.get_name_index(db)) == names
+        assert list(idb.analysis.get_head_index(db)) == heads
+        assert idb.analysis.get_head_index(db).next_head(0x1) == 0x4
+
+        # there are no functions in this database.
+        keys = idb.analysis.save_indexes(db, sidecar_path)
+        assert ('$ funcs', 'table') not in keys
+        assert ('$ segs', 'table') in keys
+
+    # the sidecar of one database doesn't apply to another.
+    with idb.from_file(os.path.join(CD, 'data', 'empty', 'empty.idb')) as db:
+        with pytest.raises(ValueError):
+            idb.analysis.load_indexes(db, sidecar_path)
+
+
+def test_flat_id0(small_idb, tmpdir):
+    path = os.path.join(CD, 'data', 'small', 'small-colored.idb')
+    flat_path = str(tmpdir.join('small.id0'))
+    idb.fileformat.write_flat_index(small_idb.id0, flat_path)
+
+    with idb.from_file(path, flat_id0=flat_path) as db:
+        assert isinstance(db.id0, idb.fileformat.FlatIndex)
+        assert idb.netnode.Netnode(db, 'Root Node').supstr(1303) == '6.95'
+        assert list(idb.netnode.Netnode(db, 0x0).alts()) == [0x8, 0x14]
+        assert list(idb.analysis.get_name_index(db)) == list(idb.analysis.get_name_index(small_idb))
+        assert idb.analysis.get_altval_index(db, 'A').get(0x0, 0x14) == 0x888889
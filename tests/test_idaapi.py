@@ -238,6 +238,12 @@ def test_colors(small_idb):
     # this is what i set it to via IDAPython when creating the idb.
     assert api.idc.GetColor(0, api.idc.CIC_ITEM) == 0x888888
 
+    assert api.ida_nalt.get_aflags(0x1) == 0
+    assert api.ida_nalt.is_colored_item(0x1) == False
+    assert api.idc.GetColor(0x1, api.idc.CIC_ITEM) == api.idc.DEFCOLOR
+    assert api.ida_nalt.find_aflags(idb.idapython.AFLAGS.AFL_COLORED) == [0x0]
+    assert api.ida_nalt.find_aflags(idb.idapython.AFLAGS.AFL_COLORED, start=0x1) == []
+
 
 def test_func_t(kernel32_idb):
     api = idb.IDAPython(kernel32_idb)
@@ -416,6 +422,8 @@ def test_fixups(kernel32_idb):
     assert api.idaapi.get_next_fixup_ea(0x68901025) == 0x68901025
     assert api.idaapi.get_next_fixup_ea(0x68901025 + 1) == 0x68901034
 
+    assert api.idaapi.get_prev_fixup_ea(0x68901034) == 0x68901025
+
 
 def test_input_md5(kernel32_idb):
     api = idb.IDAPython(kernel32_idb)
@@ -429,6 +437,11 @@ def test_segments(kernel32_idb):
     assert api.idc.FirstSeg() == 0x68901000
     assert api.idc.NextSeg(0x68901000) == 0x689db000
     assert api.idc.NextSeg(0x689db000) == 0x689dd000
+    # not within a segment.
+    assert api.idc.NextSeg(0x68900000) is None
+    with pytest.raises(IndexError):
+        # within the last segment.
+        api.idc.NextSeg(0x689dd000)
 
     assert api.idc.SegName(0x68901000) == '.text'
     assert api.idc.SegName(0x689db000) == '.data'
@@ -466,3 +479,151 @@ def test_functions(kernel32_idb):
     assert len(funcs) == 4776
     assert funcs[0] == 0x68901010
     assert funcs[-1] == 0x689ce1cf
+
+
+def test_registry(small_idb):
+    api1 = idb.IDAPython(small_idb)
+    api2 = idb.IDAPython(small_idb)
+
+    # analyzers and derived indexes are built once per database.
+    assert api1.registry.segments is api2.registry.segments
+    assert api1.registry.get_segments() is api2.registry.get_segments()
+    assert api1.registry.get_netnode('$ segs') is api2.registry.get_netnode('$ segs')
+
+    assert api1.idautils.Segments() == [0x0]
+    assert api2.idc.SegEnd(0x0) == 0xD
+    assert api2.idc.LocByName('$ segs') == api1.registry.get_netnode('$ segs').nodeid
+
+
+def test_heads(small_idb):
+    api = idb.IDAPython(small_idb)
+
+    assert list(api.registry.get_head_index()) == [0x0, 0x1, 0x4, 0xC]
+    assert api.idc.Head(0x3) == 0x1
+    assert api.idc.Head(0x4) == 0x4
+    assert api.idc.NextHead(0x1) == 0x4
+    assert api.idc.NextHead(0x5) == 0xC
+    assert api.idc.PrevHead(0x5) == 0x1
+    assert api.idc.PrevHead(0x4) == 0x1
+    assert api.idc.ItemSize(0x1) == 3
+    # the last item is bounded by the end of the segment.
+    assert api.idc.ItemSize(0xC) == 1
+
+    with pytest.raises(ValueError):
+        api.idc.ItemSize(0x2)
+
+    with pytest.raises(KeyError):
+        api.idc.NextHead(0xC)
+
+    with pytest.raises(KeyError):
+        api.idc.PrevHead(0x0)
+
+    with pytest.raises(KeyError):
+        api.idc.Head(0xD)
+
+
+def test_many_bytes(small_idb, empty_idb):
+    api = idb.IDAPython(small_idb)
+    assert api.idc.GetManyBytes(0x0, 0xD) == b'hello world!\n'
+    assert api.idc.GetManyBytes(0x6, 0x5) == b'world'
+
+    view = api.registry.get_byte_view()
+    assert view.get_bytes(0x6, 0x5) == b'world'
+    assert view.has_value(0xC) is True
+
+    with pytest.raises(IndexError):
+        api.idc.GetManyBytes(0x6, 0x10)
+
+    # the single byte of the empty database has no value.
+    api = idb.IDAPython(empty_idb)
+    with pytest.raises(KeyError):
+        api.idc.GetManyBytes(0x0, 0x1)
+
+
+def test_disassembler(small_idb):
+    api = idb.IDAPython(small_idb)
+
+    # the string "hello world!" disassembled as x86.
+    assert api.idc.GetMnem(0x4) == 'outsd'
+    assert api.idc.GetOpnd(0x4, 0) == 'dx'
+    assert api.idc.GetOpnd(0x4, 1) == 'dword ptr [esi]'
+    assert api.idc.GetOpnd(0x4, 2) == ''
+
+    # commas within memory operands don't separate operands.
+    assert idb.idapython._split_operands('') == []
+    assert idb.idapython._split_operands('dword ptr fs:[eax], ecx') == ['dword ptr fs:[eax]', 'ecx']
+    assert idb.idapython._split_operands('r0, [r1, #4]') == ['r0', '[r1, #4]']
+    assert idb.idapython._split_operands('{r4, lr}') == ['{r4, lr}']
+    assert api.idc._disassemble(0x4).size == 1
+
+    # the whole item is swept at once.
+    dis = api.registry.get_disassembler()
+    assert 0x5 in dis.lite_insns
+
+    with pytest.raises(RuntimeError):
+        # push imm32 is truncated by the end of the item.
+        api.idc.GetMnem(0x0)
+
+
+def test_lru_cache():
+    cache = idb.idapython.LRUCache(2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    assert cache.get(1) == 'a'
+    cache.set(3, 'c')
+    assert 2 not in cache
+    assert len(cache) == 2
+
+    with pytest.raises(KeyError):
+        cache.get(2)
+
+
+def test_flowchart_cache(small_idb):
+    api = idb.IDAPython(small_idb)
+
+    class Func:
+        startEA = 0x4
+
+    # there is no code in this database, so the "function" is a single data item.
+    fc = api.idaapi.FlowChart(Func())
+    assert lpluck('startEA', fc) == [0x4]
+    assert lpluck('endEA', fc) == [0x4]
+
+    # flowcharts are built once per function start, and shared.
+    assert idb.IDAPython(small_idb).idaapi.FlowChart(Func()) is fc
+
+
+def test_function_attrs(kernel32_idb):
+    api = idb.IDAPython(kernel32_idb)
+
+    # inside the function tail of DllEntryPoint.
+    ea = 0x68906156 + 1
+    assert api.idc.GetFunctionAttr(ea, api.idc.FUNCATTR_START) == 0x68901695
+    assert api.idc.GetFunctionAttr(ea, api.idc.FUNCATTR_END) == 0x689016B0
+    assert api.idc.GetFunctionAttr(ea, api.idc.FUNCATTR_FRAME) == 0x75
+    assert api.idc.GetFunctionAttr(ea, api.idc.FUNCATTR_ARGSIZE) == 0xC
+
+    with pytest.raises(KeyError):
+        # .text:68901000 is before the first function.
+        api.ida_funcs.get_func(0x68901000)
+
+
+def test_stack_deltas(kernel32_idb):
+    idc = idb.IDAPython(kernel32_idb).idc
+
+    # see the listing of CreateThread in `test_analysis.test_stack_change_points`.
+    assert idc.GetSpd(0x68901aec) == 0
+    assert idc.GetSpd(0x68901aed) == -4
+    assert idc.GetSpd(0x68901b12) == 0
+
+    # .text:68901AEC 55                                      push    ebp
+    assert idc.GetSpDiff(0x68901aec) == -4
+    # .text:68901AED 8B EC                                   mov     ebp, esp
+    assert idc.GetSpDiff(0x68901aed) == 0
+    # .text:68901B0B FF 15 00 D8 9D 68                       call    ds:CreateRemoteThreadEx_0
+    assert idc.GetSpDiff(0x68901b0b) == 32
+    # .text:68901B11 5D                                      pop     ebp
+    assert idc.GetSpDiff(0x68901b11) == 4
+    # the last instruction, whose following address is the end of the function.
+    # .text:68901B12 C2 18 00                                retn    18h
+    assert idc.GetSpDiff(0x68901b12) == 0
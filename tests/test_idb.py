@@ -309,3 +309,57 @@ def test_nam(kernel32_idb):
     assert len(names) == 14252
     assert names[0] == 0x68901010
     assert names[-1] == 0x689DE228
+
+
+def test_flat_index(small_idb, tmpdir):
+    path = str(tmpdir.join('small.id0'))
+    count = idb.fileformat.write_flat_index(small_idb.id0, path)
+    assert count == 273
+
+    with idb.fileformat.FlatIndex(path) as index:
+        assert len(index) == count
+        assert [(k, bytes(v)) for k, v in index.iter_entries(start=b'N', end=b'O')] == \
+               [(k, bytes(v)) for k, v in small_idb.id0.iter_entries(start=b'N', end=b'O')]
+
+        cursor = index.find(b'NRoot Node')
+        assert bytes(cursor.value) == bytes(small_idb.id0.find(b'NRoot Node').value)
+        assert index.find_prefix(b'N$ ').key.startswith(b'N$ ')
+        assert index.get_min().key == bytes(small_idb.id0.get_min().key)
+        assert index.get_max().key == bytes(small_idb.id0.get_max().key)
+
+        cursor.next()
+        cursor.prev()
+        assert cursor.key == b'NRoot Node'
+
+        with pytest.raises(KeyError):
+            index.find(b'Nnot a name')
+
+        held = index.find(b'NRoot Node').value
+
+    # values are copied out of the map, so they outlive it, and don't prevent closing it.
+    assert held == bytes(small_idb.id0.find(b'NRoot Node').value)
+
+
+def test_verify(small_idb, empty_idb):
+    assert small_idb.verify() is True
+    assert empty_idb.verify() is True
+    assert [s.checksum for s in small_idb.sections if s is not None] == \
+           [0x4BC29F5, 0xB62CA166, 0x829348BA, 0x404C336F]
+
+    path = os.path.join(CD, 'data', 'small', 'small-colored.idb')
+    with open(path, 'rb') as f:
+        buf = f.read()
+
+    # truncated in the middle of a section.
+    with pytest.raises(ValueError):
+        db = idb.fileformat.IDB(buf[:-0x10])
+        db.vsParse(db.buf)
+
+    # a flipped bit in the ID1 flags.
+    corrupt = bytearray(buf)
+    corrupt[0x8105 + 0x2100] ^= 0x1
+    db = idb.fileformat.IDB(bytes(corrupt))
+    db.vsParse(db.buf)
+    assert db.verify(checksums=False) is True
+    with pytest.raises(ValueError):
+        db.verify_checksums()